@@ -1,3 +1,329 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from typing import Optional, List, Dict, Any, Iterable
+import hashlib
+import json
+import gzip
+import os
+import re
 
-router = APIRouter() 
\ No newline at end of file
+from ..config import settings
+from ..models.theme import Theme
+from ..services.metrics import metrics
+from ..storage.elements import ElementCache
+from ..storage.files import write_atomic
+from ..storage.shards import ShardSessions, get_shards
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+router = APIRouter(tags=["Themes"])
+
+# Hot in-memory LRU of theme_hash -> theme settings. Themes are immutable once
+# stored (the key is the hash of the content), so entries never go stale.
+_theme_cache = ElementCache(settings.THEME_CACHE_SIZE)
+
+# Bump when the generated CSS changes so bundle URLs change with it
+THEME_CSS_VERSION = 1
+
+# One year, the conventional maximum for immutable assets
+THEME_CSS_MAX_AGE = 31536000
+
+# Hot in-memory LRU of bundle name -> {content encoding: bytes}
+_css_bundle_cache = ElementCache(settings.THEME_CACHE_SIZE)
+
+# File suffix of each precompressed variant on disk
+_DISK_SUFFIXES = {"identity": "", "gzip": ".gz", "br": ".br"}
+
+_BUNDLE_NAME_RE = re.compile(r"^([0-9a-f]{64})\.v(\d+)\.css$")
+_UNSAFE_CSS_CHARS_RE = re.compile(r"[;{}<>\\\n\r]")
+
+class FormTheme(BaseModel):
+    primaryColor: str
+    backgroundColor: str
+    textColor: str
+    borderRadius: str
+    fontFamily: str
+    layout: str
+    style: str
+
+def canonical_theme_json(theme: Dict[str, Any]) -> str:
+    """Serialize a theme so that equal themes always produce identical text."""
+    return json.dumps(theme, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+def compute_theme_hash(theme: Dict[str, Any]) -> str:
+    """Return the content hash used as the theme's key."""
+    return hashlib.sha256(canonical_theme_json(theme).encode("utf-8")).hexdigest()
+
+def intern_theme(db: Session, theme: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Store a theme once and return its hash.
+    The insert is flushed but not committed, so it becomes part of the caller's transaction.
+    """
+    if theme is None:
+        return None
+
+    digest = compute_theme_hash(theme)
+    # The cache is per worker, not per shard: with shards, a theme cached from one shard
+    # may still be missing on the shard being written, so check that shard every time
+    if digest in _theme_cache and not settings.shard_urls:
+        return digest
+
+    if db.get(Theme, digest) is not None:
+        _theme_cache.put_many({digest: theme})
+        return digest
+
+    try:
+        # Savepoint so a concurrent insert of the same theme does not
+        # abort the caller's transaction
+        with db.begin_nested():
+            db.add(Theme(theme_hash=digest, theme_data=theme))
+    except IntegrityError:
+        pass
+
+    # The new row is only cached once a later lookup finds it committed,
+    # so a rolled back transaction can never leave a dangling hash in memory
+    return digest
+
+def get_themes(db: Session, theme_hashes: Iterable[Optional[str]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Resolve theme hashes to theme settings.
+    Hashes missing from the in-memory map are loaded with a single query.
+    """
+    wanted = {theme_hash for theme_hash in theme_hashes if theme_hash}
+    found = _theme_cache.get_many(wanted)
+    missing = [theme_hash for theme_hash in wanted if theme_hash not in found]
+    metrics.cache_hit("themes", len(found))
+    metrics.cache_miss("themes", len(missing))
+
+    if missing:
+        loaded = {
+            theme.theme_hash: theme.theme_data
+            for theme in db.query(Theme).filter(Theme.theme_hash.in_(missing)).all()
+        }
+        _theme_cache.put_many(loaded)
+        found.update(loaded)
+
+    return found
+
+def get_theme(db: Session, theme_hash: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Resolve a single theme hash, returning None when it is unknown."""
+    if not theme_hash:
+        return None
+    return get_themes(db, [theme_hash]).get(theme_hash)
+
+def css_bundle_name(theme_hash: str) -> str:
+    """Return the immutable file name of a theme's CSS bundle."""
+    return f"{theme_hash}.v{THEME_CSS_VERSION}.css"
+
+def css_bundle_url(theme_hash: Optional[str]) -> Optional[str]:
+    """Return the URL a theme's CSS bundle is served from."""
+    if not theme_hash:
+        return None
+    return f"/api/themes/css/{css_bundle_name(theme_hash)}"
+
+def _css_value(theme: Dict[str, Any], key: str, default: str) -> str:
+    """Read a theme value, dropping characters that could break out of a declaration."""
+    value = theme.get(key)
+    if not isinstance(value, str) or not value.strip():
+        return default
+    return _UNSAFE_CSS_CHARS_RE.sub("", value).strip()
+
+def compile_theme_css(theme: Dict[str, Any]) -> str:
+    """
+    Compile a theme into minified CSS.
+    Mirrors getThemeStyles, getFieldStyles and getButtonStyles in the frontend's FormPreviewUtils.
+    """
+    primary = _css_value(theme, "primaryColor", "#3b82f6")
+    radius = _css_value(theme, "borderRadius", "0.5rem")
+    style = theme.get("style")
+    layout = theme.get("layout")
+
+    padding = {"compact": "0.75rem", "spacious": "2rem"}.get(layout, "1.5rem")
+    shadow = (
+        "0 4px 6px -1px rgba(0,0,0,.1),0 2px 4px -1px rgba(0,0,0,.06)"
+        if style == "shadow" else "none"
+    )
+
+    rules = {
+        ".fb-form": {
+            "background-color": _css_value(theme, "backgroundColor", "white"),
+            "color": _css_value(theme, "textColor", "#111827"),
+            "font-family": _css_value(theme, "fontFamily", "Inter, sans-serif"),
+            "border-radius": radius,
+            "box-shadow": shadow,
+            "border-style": "solid",
+            "border-width": "2px" if style == "outline" else "1px",
+            "border-color": primary if style == "outline" else "#e5e7eb",
+            "padding": padding,
+        },
+        ".fb-field:focus-within,.fb-field.is-active": {
+            "border-color": primary,
+            "background-color": f"{primary}10",
+        },
+        ".fb-button": {
+            "background-color": primary,
+            "border-radius": _css_value(theme, "borderRadius", "0.375rem"),
+        },
+    }
+
+    return "".join(
+        selector + "{" + ";".join(f"{prop}:{value}" for prop, value in declarations.items()) + "}"
+        for selector, declarations in rules.items()
+    )
+
+def _encode_css_variants(css: str) -> Dict[str, bytes]:
+    """Precompress a bundle once for every supported content encoding."""
+    raw = css.encode("utf-8")
+    variants = {"identity": raw, "gzip": gzip.compress(raw, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(raw, quality=11)
+    return variants
+
+def _load_css_bundle_from_disk(bundle_name: str) -> Optional[Dict[str, bytes]]:
+    base_path = os.path.join(settings.THEME_CSS_DIR, bundle_name)
+    variants = {}
+    for encoding, suffix in _DISK_SUFFIXES.items():
+        try:
+            with open(base_path + suffix, "rb") as f:
+                variants[encoding] = f.read()
+        except FileNotFoundError:
+            continue
+    return variants if "identity" in variants else None
+
+def _save_css_bundle_to_disk(bundle_name: str, variants: Dict[str, bytes]):
+    try:
+        os.makedirs(settings.THEME_CSS_DIR, exist_ok=True)
+        base_path = os.path.join(settings.THEME_CSS_DIR, bundle_name)
+        for encoding, data in variants.items():
+            write_atomic(base_path + _DISK_SUFFIXES[encoding], data)
+    except OSError as e:
+        # The in-memory copy still serves this worker; disk is only a warm start cache
+        print(f"Error writing theme CSS bundle {bundle_name}: {e}")
+
+def get_css_bundle(db: Session, theme_hash: str) -> Optional[Dict[str, bytes]]:
+    """
+    Return every encoded variant of a theme's CSS bundle, compiling it at most once.
+    Lookups go memory, then disk, then the theme registry.
+    """
+    bundle_name = css_bundle_name(theme_hash)
+
+    variants = _css_bundle_cache.get_many([bundle_name]).get(bundle_name)
+    if variants is not None:
+        metrics.cache_hit("theme_css")
+        return variants
+    metrics.cache_miss("theme_css")
+
+    variants = _load_css_bundle_from_disk(bundle_name)
+    if variants is None:
+        theme = get_theme(db, theme_hash)
+        if theme is None:
+            return None
+        variants = _encode_css_variants(compile_theme_css(theme))
+        _save_css_bundle_to_disk(bundle_name, variants)
+
+    _css_bundle_cache.put_many({bundle_name: variants})
+    return variants
+
+def _choose_encoding(accept_encoding: str, available: Iterable[str]) -> str:
+    """Pick the smallest acceptable precompressed variant."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(coding.strip().lower())
+
+    for encoding in ("br", "gzip"):
+        if encoding in available and (encoding in accepted or "*" in accepted):
+            return encoding
+    return "identity"
+
+@router.post("/themes", status_code=status.HTTP_201_CREATED)
+async def create_theme(form_theme: FormTheme, shards: ShardSessions = Depends(get_shards)):
+    """
+    Register a theme and return its content hash.
+    Registering an existing theme is a no-op that returns the same hash.
+    """
+    # Themes are content-addressed, so a theme that belongs to no user can live on any shard
+    theme = form_theme.dict()
+    db = shards.shard(0)
+    try:
+        theme_hash = intern_theme(db, theme)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+    return {"theme_hash": theme_hash, "theme": theme, "css_url": css_bundle_url(theme_hash)}
+
+@router.get("/themes", response_model=List[Dict[str, Any]])
+async def list_themes(shards: ShardSessions = Depends(get_shards)):
+    """
+    List all registered themes.
+    """
+    # Shards each store the themes their users' forms reference, so drop duplicates.
+    # The listing is not cached; only themes that forms actually resolve belong in the LRU.
+    themes = list({theme.theme_hash: theme for db in shards.all() for theme in db.query(Theme).all()}.values())
+
+    return [
+        {"theme_hash": theme.theme_hash, "theme": theme.theme_data, "css_url": css_bundle_url(theme.theme_hash)}
+        for theme in themes
+    ]
+
+@router.get("/themes/css/{bundle_name}")
+async def get_theme_css(bundle_name: str, request: Request, shards: ShardSessions = Depends(get_shards)):
+    """
+    Serve a theme's precompiled CSS bundle.
+    The URL embeds the theme hash and compiler version, so responses are cacheable forever.
+    """
+    match = _BUNDLE_NAME_RE.match(bundle_name)
+    if not match or int(match.group(2)) != THEME_CSS_VERSION:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Theme bundle {bundle_name} not found"
+        )
+
+    variants = shards.first(lambda db: get_css_bundle(db, match.group(1)))
+    if variants is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Theme bundle {bundle_name} not found"
+        )
+
+    etag = f'"{match.group(1)[:32]}.v{THEME_CSS_VERSION}"'
+    headers = {
+        "Cache-Control": f"public, max-age={THEME_CSS_MAX_AGE}, immutable",
+        "ETag": etag,
+        "Vary": "Accept-Encoding",
+    }
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    encoding = _choose_encoding(request.headers.get("accept-encoding", ""), variants)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+
+    return Response(content=variants[encoding], media_type="text/css", headers=headers)
+
+@router.get("/themes/{theme_hash}")
+async def get_theme_by_hash(theme_hash: str, shards: ShardSessions = Depends(get_shards)):
+    """
+    Get a theme by its content hash.
+    """
+    theme = shards.first(lambda db: get_theme(db, theme_hash))
+    if theme is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Theme {theme_hash} not found"
+        )
+
+    return {"theme_hash": theme_hash, "theme": theme, "css_url": css_bundle_url(theme_hash)}
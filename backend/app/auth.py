@@ -1,16 +1,15 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt
-from .config import settings
+from .security import decode_access_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_access_token(token)
         user_id = payload.get("sub")
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid JWT token")
         return {"id": user_id}
-    except jwt.JWTError:
-        raise HTTPException(status_code=401, detail="Invalid JWT token") 
\ No newline at end of file
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid JWT token")
\ No newline at end of file
@@ -1,9 +1,168 @@
 import os
-from pydantic_settings import BaseSettings
+import urllib.parse
+from typing import List, Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+# backend/.env, regardless of the working directory the server is started from
+ENV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env")
 
 class Settings(BaseSettings):
-    DATABASE_URL: str = os.getenv("DATABASE_URL")
-    SECRET_KEY: str = os.getenv("SECRET_KEY")
+    """
+    Application settings, read once from the environment and backend/.env.
+    Every module shares this object instead of calling load_dotenv() itself.
+    """
+    model_config = SettingsConfigDict(env_file=ENV_FILE, extra="ignore")
+
+    # Database
+    DB_BACKEND: str = "mysql"  # "mysql", or "sqlite" for single-node and test deployments
+    DATABASE_URL: Optional[str] = None
+    DB_HOST: str = "localhost"
+    DB_USER: str = "root"
+    DB_PASSWORD: str = ""
+    DB_NAME: str = "login"
+    DB_PORT: int = 3306
+
+    # SQLite backend
+    SQLITE_PATH: str = "formbuilder.db"  # ":memory:" for a throwaway in-process database
+    SQLITE_POOL_SIZE: int = 10
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KB: int = 65536
+    SQLITE_MMAP_SIZE_BYTES: int = 256 * 1024 * 1024
+
+    # Read replicas, as comma-separated SQLAlchemy URLs; GET requests read from them
+    DB_REPLICA_URLS: str = ""
+    REPLICA_MAX_LAG_SECONDS: float = 5  # Replicas further behind leave the rotation until they catch up
+    REPLICA_CHECK_INTERVAL_SECONDS: float = 2
+    READ_YOUR_WRITES_SECONDS: float = 10  # How long a client's reads stay on the primary after it writes
+
+    # Sharding of form storage by user_id, as comma-separated SQLAlchemy URLs; empty keeps it on the primary
+    SHARD_URLS: str = ""
+    SHARD_ID_BLOCK: int = 100_000_000  # Autoincrement ids on shard N start above N * SHARD_ID_BLOCK
+    SHARD_MAP_TTL_SECONDS: float = 5  # How long workers cache a user's shard assignment
+    SHARD_MAP_CACHE_SIZE: int = 100000  # Users whose assignment a worker remembers
+    SHARD_LOCATOR_CACHE_SIZE: int = 100000  # Remembered shards of forms looked up by id
+
+    # JWT
+    SECRET_KEY: str = "your_super_secret_key_change_this_in_production"
     ALGORITHM: str = "HS256"
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    BCRYPT_WORKERS: int = 4  # Threads dedicated to password hashing
+
+    THEME_CSS_DIR: str = "static/themes"
+    THEME_CACHE_SIZE: int = 5000  # Themes, and separately compiled CSS bundles, kept in memory per worker
+    ELEMENT_STORE_ENABLED: bool = False
+    ELEMENT_CACHE_SIZE: int = 50000
+    REVISION_SNAPSHOT_INTERVAL: int = 20
+    SEARCH_INDEX_TTL_SECONDS: int = 300
+    SEARCH_MAX_CACHED_USERS: int = 1000
+    PUBLISH_DIR: str = "static/published"
+
+    # Collaborative editing over /api/collab; sessions write their operations back in one save per interval
+    COLLAB_FLUSH_INTERVAL_SECONDS: float = 2
+    COLLAB_MAX_MESSAGE_BYTES: int = 64 * 1024
+
+    # Change feed at /api/events/forms, through an event log shared by the workers on this host
+    EVENTS_DB_PATH: str = "events.db"
+    EVENTS_RETENTION_SECONDS: float = 3600  # How far back a reconnecting client can resume
+    EVENTS_POLL_INTERVAL_SECONDS: float = 0.5  # How soon events published by other workers are sent
+    EVENTS_HEARTBEAT_SECONDS: float = 15  # Comment lines that keep idle streams open through proxies
+    EVENTS_MAX_STREAM_SECONDS: float = 300  # Streams end after this long and the client reconnects
+    EVENTS_RETRY_MS: int = 2000  # Reconnect delay sent to clients
+    EVENTS_SUBSCRIBER_QUEUE_SIZE: int = 1000  # Undelivered events before a stalled stream is dropped
+
+    # Compressed storage of forms.form_data and formdata.form_elements/form_theme; run compress_json.py --prepare first
+    JSON_COMPRESSION_ENABLED: bool = False
+    JSON_COMPRESSION_CODEC: str = "zlib"  # "zlib", or "zstd" with the zstandard package installed
+    JSON_COMPRESSION_LEVEL: int = 6
+    JSON_COMPRESSION_MIN_BYTES: int = 128  # Smaller documents are stored uncompressed
+    JSON_COMPRESSION_DICTIONARY: str = ""  # Dictionary files from compress_json.py --train, newest first; empty uses the built-in one
+
+    # Archival of cold form history into compressed archive tables (archive_cold.py)
+    ARCHIVE_AFTER_DAYS: float = 28  # Superseded rows and old revisions untouched this long are archived
+    ARCHIVE_BATCH_SIZE: int = 500  # Rows moved per transaction
+    ARCHIVE_COMPRESSION_LEVEL: int = 6  # zlib level, 1 (fastest) to 9 (smallest)
+    ARCHIVE_BATCH_PAUSE_SECONDS: float = 0.05  # Sleep between batches, leaving room for live traffic
+
+    # Background jobs, queued in a SQLite file shared by the workers on this host
+    JOBS_ENABLED: bool = True  # Run queued jobs in this process; jobs can be queued either way
+    JOBS_DB_PATH: str = "jobs.db"
+    JOBS_WORKER_THREADS: int = 2  # Jobs run at once per worker process; job types also cap their own concurrency
+    JOBS_POLL_INTERVAL_SECONDS: float = 1
+    JOBS_STALE_SECONDS: float = 60  # Running jobs without a heartbeat this long are retried elsewhere
+    JOBS_RETRY_BASE_SECONDS: float = 5  # Backoff before the first retry, doubled for each further attempt
+    JOBS_RETRY_MAX_SECONDS: float = 600
+    JOBS_SHUTDOWN_GRACE_SECONDS: float = 10  # How long shutdown waits for running jobs to stop
+    JOBS_RETENTION_DAYS: float = 7  # Finished jobs are deleted after this long
+    JOBS_ADMIN_TOKEN: str = ""  # Required in X-Admin-Token to queue or cancel jobs over HTTP; empty disables both
+
+    # Server and worker lifecycle
+    PORT: int = 8000
+    WEB_CONCURRENCY: Optional[int] = None  # Worker processes; defaults to one per CPU core
+    KEEP_ALIVE_SECONDS: int = 75  # Longer than typical load balancer idle timeouts
+    BACKLOG: int = 2048
+    GRACEFUL_TIMEOUT_SECONDS: int = 30
+    WARM_POOL_ON_STARTUP: bool = True
+    WORKER_STATS_DIR: str = ""  # Defaults to a directory under the system temp dir
+    WORKER_STATS_INTERVAL_SECONDS: int = 5
+
+    # SQL instrumentation
+    SLOW_QUERY_MS: float = 200
+    N_PLUS_ONE_THRESHOLD: int = 5  # Executions of one statement per request that get flagged
+    SERVER_TIMING_ENABLED: bool = True
+
+    # Rate limiting; limits are COUNT/PERIOD[:BURST], an empty value disables that bucket
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" (per worker) or "redis" (shared by all workers)
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
+    RATE_LIMIT_REDIS_TIMEOUT_SECONDS: float = 0.25  # Slower answers count as Redis being down
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False  # Only behind a proxy that sets X-Forwarded-For
+    RATE_LIMIT_TRUSTED_PROXIES: int = 1  # Proxies in front of the API that append to X-Forwarded-For
+    RATE_LIMIT_AUTO_SAVE_PER_USER: str = "60/minute:20"
+    RATE_LIMIT_AUTO_SAVE_PER_IP: str = "300/minute:60"
+    RATE_LIMIT_LOGIN_PER_USER: str = "5/minute:5"
+    RATE_LIMIT_LOGIN_PER_IP: str = "20/minute:10"
+
+    # Adaptive concurrency limit for DB-backed routes; queued requests past their timeout get 503
+    CONCURRENCY_LIMIT_ENABLED: bool = True
+    CONCURRENCY_INITIAL_LIMIT: int = 20
+    CONCURRENCY_MIN_LIMIT: int = 4
+    CONCURRENCY_MAX_LIMIT: int = 200
+    CONCURRENCY_TOLERANCE: float = 1.5  # How far short-term latency may exceed the long-term average before the limit shrinks
+    CONCURRENCY_MAX_QUEUE: int = 500
+    CONCURRENCY_QUEUE_TIMEOUT_SAVE_MS: float = 2000
+    CONCURRENCY_QUEUE_TIMEOUT_LISTING_MS: float = 1000
+    CONCURRENCY_QUEUE_TIMEOUT_INTROSPECTION_MS: float = 250
+
+    # Request profiling; the middleware is not installed at all unless enabled
+    PROFILING_ENABLED: bool = False
+    PROFILE_TOKEN: str = ""  # Requests sending this in X-Profile-Token are profiled; empty disables the header
+    PROFILE_SAMPLE_RATE: float = 0.0  # Share of other requests profiled at random
+    PROFILE_INTERVAL_MS: float = 5
+    PROFILE_DIR: str = "profiles"
+    PROFILE_MAX_FILES: int = 200
+    PROFILE_MAX_BYTES: int = 50 * 1024 * 1024
+
+    @property
+    def is_sqlite(self) -> bool:
+        return self.DB_BACKEND.lower() == "sqlite"
+
+    @property
+    def replica_urls(self) -> List[str]:
+        return [url.strip() for url in self.DB_REPLICA_URLS.split(",") if url.strip()]
+
+    @property
+    def shard_urls(self) -> List[str]:
+        return [url.strip() for url in self.SHARD_URLS.split(",") if url.strip()]
+
+    @property
+    def sqlalchemy_database_url(self) -> str:
+        """Connection string for the configured backend, built from the DB_* or SQLITE_* settings."""
+        if self.is_sqlite:
+            return "sqlite://" if self.SQLITE_PATH == ":memory:" else f"sqlite:///{self.SQLITE_PATH}"
+        if self.DB_PASSWORD:
+            escaped_password = urllib.parse.quote_plus(self.DB_PASSWORD)
+            return f"mysql+pymysql://{self.DB_USER}:{escaped_password}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+        return f"mysql+pymysql://{self.DB_USER}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
-settings = Settings() 
\ No newline at end of file
+settings = Settings()
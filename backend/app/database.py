@@ -1,62 +1,206 @@
-import os
-from dotenv import load_dotenv
-from sqlalchemy import create_engine
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
 from sqlalchemy.sql import text
-import pymysql
-import urllib.parse
-
-# Load environment variables from .env
-load_dotenv()
-
-# MySQL connection configuration
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_USER = os.getenv("DB_USER", "root")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "")
-DB_NAME = os.getenv("DB_NAME", "login")
-DB_PORT = os.getenv("DB_PORT", "3306")
-
-# Escape the password for URL
-escaped_password = urllib.parse.quote_plus(DB_PASSWORD) if DB_PASSWORD else ""
-
-# Construct MySQL connection string
-if escaped_password:
-    DATABASE_URL = f"mysql+pymysql://{DB_USER}:{escaped_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-else:
-    DATABASE_URL = f"mysql+pymysql://{DB_USER}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-
-print(f"Connecting to database: {DB_HOST}:{DB_PORT}/{DB_NAME} as {DB_USER}")
-
-# Create engine with proper connection settings for MySQL
-engine = create_engine(
-    DATABASE_URL,
-    pool_size=5,
-    max_overflow=10,
-    pool_timeout=30,
-    pool_recycle=1800,
-    pool_pre_ping=True,  # Helps detect and recover from stale connections
-)
-
-# SessionLocal class for database sessions
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from .config import settings
+from .services.metrics import metrics
+from .services.querytrace import record_query
+from .storage.raw import RawConnection, apply_sqlite_pragmas, connect_mysql, sqlite_begin_statement
+
+# The engine (and with it the database driver) is created on first use or in the
+# application's lifespan hook, never at import time
+_engine = None
+_engine_lock = threading.Lock()
+
+# Read replicas, created with the primary engine. Which of them are in rotation
+# is decided by the lag probe in app.services.replicas.
+_replicas: List["Replica"] = []
+_replica_turn = itertools.count()
+
+# Set per request by ReadRoutingMiddleware: whether this request may read from a replica
+read_from_replica: ContextVar[bool] = ContextVar("read_from_replica", default=False)
+
+# SessionLocal class for database sessions, bound to the engine once it exists
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 
 # Base class for all models
 Base = declarative_base()
 
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe_pool_wait(time.perf_counter() - start)
+
+def _instrument_queries(engine):
+    """Report every statement's duration to the per-request query trace."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start_time"].pop()
+        record_query(statement, parameters, time.perf_counter() - start)
+
+def _register_pool_gauges(pool):
+    if not isinstance(pool, QueuePool):
+        # The single shared connection of an in-memory SQLite database has nothing to report
+        return
+    metrics.register_gauge("db_pool_size", "Connections the pool keeps open.", pool.size)
+    metrics.register_gauge("db_pool_checked_out", "Connections currently checked out of the pool.", pool.checkedout)
+    metrics.register_gauge("db_pool_checked_in", "Idle connections in the pool.", pool.checkedin)
+    # Negative until the base pool has been filled, so report only connections above pool_size
+    metrics.register_gauge("db_pool_overflow", "Connections open beyond pool_size.", lambda: max(pool.overflow(), 0))
+
+def _create_sqlite_engine(url: str):
+    in_memory = make_url(url).database in (None, "", ":memory:")
+    print(f"Opening SQLite database: {make_url(url).database or ':memory:'}")
+
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000},
+        # Every connection to an in-memory database is a separate database, so share one
+        **({"poolclass": StaticPool} if in_memory else {
+            "poolclass": TimedQueuePool,
+            "pool_size": settings.SQLITE_POOL_SIZE,
+            "max_overflow": settings.SQLITE_POOL_SIZE * 2,
+            "pool_timeout": 30,
+        }),
+    )
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        # Stop pysqlite from managing transactions itself; it mishandles SAVEPOINT
+        dbapi_connection.isolation_level = None
+        apply_sqlite_pragmas(dbapi_connection)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def begin_lazily(conn, cursor, statement, parameters, context, executemany):
+        # Open the SQLite transaction at its first statement, which decides the lock it needs
+        if conn.in_transaction() and not cursor.connection.in_transaction:
+            cursor.execute(sqlite_begin_statement(statement))
+
+    return engine
+
+def _create_mysql_engine():
+    print(f"Connecting to database: {settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME} as {settings.DB_USER}")
+
+    # Create engine with proper connection settings for MySQL
+    return create_engine(
+        settings.sqlalchemy_database_url,
+        pool_size=5,
+        max_overflow=10,
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_pre_ping=True,  # Helps detect and recover from stale connections
+        poolclass=TimedQueuePool,
+    )
+
+def create_engine_for_url(url: str):
+    """An instrumented engine for a replica or shard, configured like the primary for its dialect."""
+    if url.startswith("sqlite"):
+        engine = _create_sqlite_engine(url)
+    else:
+        print(f"Connecting to database: {make_url(url).render_as_string(hide_password=True)}")
+        engine = create_engine(
+            url,
+            pool_size=5,
+            max_overflow=10,
+            pool_timeout=30,
+            pool_recycle=1800,
+            pool_pre_ping=True,
+            poolclass=TimedQueuePool,
+        )
+    _instrument_queries(engine)
+    return engine
+
+class Replica:
+    """A read replica's engine and its last measured replication lag."""
+
+    def __init__(self, url: str):
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine = create_engine_for_url(url)
+        self.lag_seconds: Optional[float] = None
+        # Replicas join the rotation once a lag check has found them current
+        self.in_rotation = False
+
+def get_engine():
+    """Return the shared engine, creating it on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _create_sqlite_engine(settings.sqlalchemy_database_url) if settings.is_sqlite else _create_mysql_engine()
+                _instrument_queries(_engine)
+                SessionLocal.configure(bind=_engine)
+                _register_pool_gauges(_engine.pool)
+                _replicas.extend(Replica(url) for url in settings.replica_urls)
+    return _engine
+
+def get_replicas() -> List[Replica]:
+    get_engine()
+    return _replicas
+
+def get_read_engine():
+    """The next replica in rotation, round-robin, or None when reads must go to the primary."""
+    candidates = [replica for replica in _replicas if replica.in_rotation]
+    if not candidates:
+        return None
+    return candidates[next(_replica_turn) % len(candidates)].engine
+
+def dispose_engines():
+    if _engine is not None:
+        _engine.dispose()
+    for replica in _replicas:
+        replica.engine.dispose()
+
+def __getattr__(name):
+    # Keeps `from app.database import engine` working without creating the engine at import time
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def open_session():
+    """A session on the primary, or on a replica for GET requests from clients that have not written recently."""
+    get_engine()
+    read_engine = get_read_engine() if read_from_replica.get() else None
+    return SessionLocal(bind=read_engine) if read_engine is not None else SessionLocal()
+
 # Dependency to get SQLAlchemy DB session
 def get_db():
-    db = SessionLocal()
+    db = open_session()
     try:
         yield db
     finally:
         db.close()
 
+def get_raw_connection() -> RawConnection:
+    """
+    Open a DB-API connection returning rows as dicts, for the routers that use raw SQL.
+    The caller is responsible for closing it.
+    """
+    if settings.is_sqlite:
+        return RawConnection(get_engine().raw_connection(), "sqlite")
+    return connect_mysql()
+
 # Function to test database connection
 def test_db_connection():
     try:
         # Create a connection
-        with engine.connect() as connection:
+        with get_engine().connect() as connection:
             # Execute a simple query
             result = connection.execute(text("SELECT 1"))
             # Fetch the result
@@ -1,55 +1,60 @@
-import sys
-import os
-from dotenv import load_dotenv
-import pymysql
-from passlib.context import CryptContext
+from .config import settings
+from .database import Base, get_engine, get_raw_connection
+from .security import hash_password
 
-# Load environment variables
-load_dotenv()
+def get_password_hash(password):
+    return hash_password(password)
 
-# Get database configuration from environment variables
-DB_HOST = os.getenv("DB_HOST", "127.0.0.1")
-DB_USER = os.getenv("DB_USER", "root")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "")
-DB_NAME = os.getenv("DB_NAME", "form_builder")
-DB_PORT = int(os.getenv("DB_PORT", "3306"))
+def create_sqlite_tables():
+    """Create every table from the models; the DDL in init_db() is MySQL specific."""
+    from .models import user, usercred, form, formdata, theme, element, revision, replication_heartbeat, shard_assignment, archived_formdata, archived_revision, element_facet, element_option  # noqa: F401
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    Base.metadata.create_all(get_engine())
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def create_model_tables():
+    """
+    On MySQL, create the tables no table script creates: forms, and the archive and element
+    facet tables, which every save writes to. init_formdata_table.py creates the others.
+    """
+    from .models.form import Form
+    from .storage.shards import ARCHIVE_TABLES, FACET_TABLES
+
+    Base.metadata.create_all(get_engine(), tables=[Form.__table__, *ARCHIVE_TABLES, *FACET_TABLES], checkfirst=True)
 
 def init_db():
     """Initialize the database with tables and default users."""
     try:
-        # Connect to the MySQL server
-        connection = pymysql.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            port=DB_PORT,
-            database=DB_NAME
-        )
+        if settings.is_sqlite:
+            create_sqlite_tables()
+        else:
+            create_model_tables()
+        if settings.shard_urls:
+            from .storage.shards import init_shards
+
+            init_shards()
+
+        # Connect to the database server
+        connection = get_raw_connection()
         
         # Create a cursor
         with connection.cursor() as cursor:
             # Create users table if it doesn't exist
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(50) UNIQUE NOT NULL,
-                email VARCHAR(100) UNIQUE NOT NULL,
-                password VARCHAR(255) NOT NULL,
-                is_active BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-            )
-            """)
+            if connection.dialect == "mysql":
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    username VARCHAR(50) UNIQUE NOT NULL,
+                    email VARCHAR(100) UNIQUE NOT NULL,
+                    password VARCHAR(255) NOT NULL,
+                    is_active BOOLEAN DEFAULT TRUE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+                )
+                """)
             
             # Check if we already have users
-            cursor.execute("SELECT COUNT(*) FROM users")
-            user_count = cursor.fetchone()[0]
+            cursor.execute("SELECT COUNT(*) AS user_count FROM users")
+            user_count = cursor.fetchone()["user_count"]
             
             if user_count == 0:
                 print("Creating default users...")
@@ -80,12 +85,12 @@ def init_db():
                     # Create user
                     try:
                         cursor.execute(
-                            "INSERT INTO users (username, email, password) VALUES (%s, %s, %s)",
-                            (user_data["username"], user_data["email"], hashed_password)
+                            "INSERT INTO users (username, email, password, is_active) VALUES (%s, %s, %s, %s)",
+                            (user_data["username"], user_data["email"], hashed_password, True)
                         )
                         connection.commit()
                         print(f"Created user: {user_data['username']}")
-                    except pymysql.err.IntegrityError:
+                    except connection.IntegrityError:
                         connection.rollback()
                         print(f"User {user_data['username']} already exists")
             else:
@@ -0,0 +1,64 @@
+"""
+Job types that can be queued through POST /api/jobs or job_queue.enqueue().
+Each runs on every shard in turn and reports progress after every batch.
+"""
+from typing import Any, Dict
+
+from .config import settings
+from .database import Base
+from .services.jobs import JobContext, JobError, job_queue
+from .storage.archive import archive_cold_rows, archive_cutoff
+from .storage.facets import SOURCES, rebuild_facets
+from .storage.shards import ARCHIVE_TABLES, FACET_TABLES, shard_router
+
+def at_least_one(payload: Dict[str, Any], key: str, default: float, whole: bool = False) -> float:
+    """A payload number of at least 1; anything else fails the job without retries."""
+    value = payload.get(key, default)
+    kinds = int if whole else (int, float)
+    if isinstance(value, bool) or not isinstance(value, kinds) or value < 1:
+        raise JobError(f"{key} must be {'an integer' if whole else 'a number'} of at least 1")
+    return value
+
+@job_queue.register("archive_cold", concurrency=1, max_attempts=3)
+def archive_cold(context: JobContext, payload: Dict[str, Any]):
+    """Payload: days and batch_size, defaulting to ARCHIVE_AFTER_DAYS and ARCHIVE_BATCH_SIZE."""
+    cutoff = archive_cutoff(at_least_one(payload, "days", settings.ARCHIVE_AFTER_DAYS))
+    batch_size = at_least_one(payload, "batch_size", settings.ARCHIVE_BATCH_SIZE, whole=True)
+    totals = {"formdata": 0, "form_revisions": 0}
+    for index in range(shard_router.count):
+        def report(moved, index=index):
+            context.progress(index / shard_router.count,
+                             f"Shard {index}: {moved['formdata']} form data rows and {moved['form_revisions']} revisions archived")
+
+        report({"formdata": 0, "form_revisions": 0})
+        Base.metadata.create_all(shard_router.engines()[index], tables=list(ARCHIVE_TABLES), checkfirst=True)
+        db = shard_router.open_session(index)
+        try:
+            moved = archive_cold_rows(db, cutoff, batch_size, settings.ARCHIVE_BATCH_PAUSE_SECONDS, report)
+        finally:
+            db.close()
+        for table, count in moved.items():
+            totals[table] += count
+    return totals
+
+@job_queue.register("reindex_facets", concurrency=1, max_attempts=3)
+def reindex_facets(context: JobContext, payload: Dict[str, Any]):
+    """Payload: sources (default both) and batch_size."""
+    sources = payload.get("sources") or list(SOURCES)
+    if any(source not in SOURCES for source in sources):
+        raise JobError(f"sources must be among {', '.join(SOURCES)}")
+    batch_size = at_least_one(payload, "batch_size", 500, whole=True)
+    steps = shard_router.count * len(sources)
+    indexed = {source: 0 for source in sources}
+    for index in range(shard_router.count):
+        Base.metadata.create_all(shard_router.engines()[index], tables=list(FACET_TABLES), checkfirst=True)
+        db = shard_router.open_session(index)
+        try:
+            for position, source in enumerate(sources):
+                step = index * len(sources) + position
+                report = lambda count: context.progress(step / steps, f"Shard {index}: {count} forms indexed from {source}")
+                report(0)
+                indexed[source] += rebuild_facets(db, source, batch_size, report)
+        finally:
+            db.close()
+    return indexed
@@ -0,0 +1,217 @@
+import asyncio
+import inspect
+import json
+import os
+import signal
+import tempfile
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Union
+from sqlalchemy.pool import QueuePool
+from starlette.concurrency import run_in_threadpool
+from .config import settings
+from .database import dispose_engines, get_engine
+from .models.custom_types import check_codec
+from .services.collab import collab_hub
+from .services.events import event_hub
+from .services.metrics import metrics
+from .storage.files import write_atomic
+from .storage.shards import shard_router
+from . import security
+
+# Callbacks run when the worker shuts down, after in-flight requests have drained.
+# Subsystems that buffer writes register a flush here.
+_shutdown_hooks: List[Callable[[], Union[None, Awaitable[None]]]] = []
+
+def on_shutdown(hook: Callable[[], Union[None, Awaitable[None]]]):
+    """Register a sync or async callback to run on graceful shutdown."""
+    _shutdown_hooks.append(hook)
+    return hook
+
+async def run_shutdown_hooks():
+    for hook in _shutdown_hooks:
+        try:
+            result = hook()
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            print(f"Error in shutdown hook {getattr(hook, '__name__', hook)}: {e}")
+
+def on_drain_signal(callback: Callable[[], None]):
+    """
+    Run callback on the event loop as soon as SIGTERM or SIGINT arrives, before the server starts
+    waiting for open connections; shutdown hooks only run after they have closed. The server's own
+    handling still runs. Nothing is installed when no server handles the signals (e.g. in tests).
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(callback)
+            previous(signum, frame)
+
+        signal.signal(sig, handler)
+
+def begin_draining():
+    worker_stats.draining = True
+    # Long-lived responses would otherwise hold up the restart until the graceful timeout
+    event_hub.close_streams()
+
+def warm_pool():
+    """Open the engine's base pool connections up front so the first requests don't pay for them."""
+    engine = get_engine()
+    if not isinstance(engine.pool, QueuePool):
+        return 0
+    connections = []
+    try:
+        for _ in range(engine.pool.size()):
+            # A DB-API connection runs the check without opening a transaction
+            connection = engine.raw_connection()
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            connections.append(connection)
+    except Exception as e:
+        print(f"Could not warm the connection pool: {e}")
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+class WorkerStats:
+    """Request counters for this worker process, shared with sibling workers through small files."""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.started_at = time.time()
+        self.requests_total = 0
+        self.in_flight = 0
+        self.draining = False
+        self.pool_connections_warmed = 0
+
+    def start(self):
+        """Reset identity in each worker; with a preloaded app this object was created in the master."""
+        self.pid = os.getpid()
+        self.started_at = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "pid": self.pid,
+            "started_at": self.started_at,
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "requests_total": self.requests_total,
+            "in_flight": self.in_flight,
+            "draining": self.draining,
+            "pool_connections_warmed": self.pool_connections_warmed,
+        }
+
+    @property
+    def stats_dir(self) -> str:
+        return settings.WORKER_STATS_DIR or os.path.join(tempfile.gettempdir(), "formbuilder-workers")
+
+    @property
+    def stats_path(self) -> str:
+        return os.path.join(self.stats_dir, f"{self.pid}.json")
+
+    def publish(self):
+        """Write this worker's snapshot where the other workers can read it."""
+        try:
+            os.makedirs(self.stats_dir, exist_ok=True)
+            write_atomic(self.stats_path, json.dumps(self.snapshot()).encode("utf-8"))
+        except OSError as e:
+            print(f"Error writing worker stats: {e}")
+
+    def unpublish(self):
+        try:
+            os.remove(self.stats_path)
+        except FileNotFoundError:
+            pass
+
+    def read_all(self) -> List[Dict[str, Any]]:
+        """Return the latest snapshot of every live worker, including this one."""
+        workers = {self.pid: self.snapshot()}
+        try:
+            names = os.listdir(self.stats_dir)
+        except FileNotFoundError:
+            names = []
+
+        stale_after = settings.WORKER_STATS_INTERVAL_SECONDS * 3
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.stats_dir, name)
+            try:
+                if time.time() - os.stat(path).st_mtime > stale_after:
+                    continue
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            workers.setdefault(snapshot["pid"], snapshot)
+        return sorted(workers.values(), key=lambda snapshot: snapshot["pid"])
+
+worker_stats = WorkerStats()
+
+class WorkerStatsMiddleware:
+    """Pure ASGI middleware counting requests; cheaper than BaseHTTPMiddleware."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        worker_stats.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            worker_stats.in_flight -= 1
+            worker_stats.requests_total += 1
+
+async def _publish_stats_periodically():
+    while True:
+        worker_stats.publish()
+        await asyncio.sleep(settings.WORKER_STATS_INTERVAL_SECONDS)
+
+async def startup():
+    """Per-worker initialisation, run from the application's lifespan hook."""
+    worker_stats.start()
+    metrics.started_at = worker_stats.started_at
+    await run_in_threadpool(get_engine)
+    check_codec()
+    await run_in_threadpool(security.warm_up)
+    if settings.WARM_POOL_ON_STARTUP:
+        worker_stats.pool_connections_warmed = await run_in_threadpool(warm_pool)
+    if settings.replica_urls:
+        from .services.replicas import probe_lag_periodically
+
+        on_shutdown(asyncio.create_task(probe_lag_periodically()).cancel)
+    await event_hub.start()
+    on_drain_signal(begin_draining)
+    collab_hub.start()
+    on_shutdown(collab_hub.stop)
+    on_shutdown(event_hub.stop)
+    if settings.JOBS_ENABLED:
+        from .services.jobs import job_queue
+
+        job_queue.start()
+        on_shutdown(job_queue.stop)
+    return asyncio.create_task(_publish_stats_periodically())
+
+async def shutdown(stats_task: "asyncio.Task"):
+    """
+    Per-worker teardown. By the time the lifespan hook exits, the server has stopped
+    accepting connections and waited for in-flight requests, so buffered writes can be flushed.
+    """
+    worker_stats.draining = True
+    stats_task.cancel()
+    await run_shutdown_hooks()
+    worker_stats.unpublish()
+    await run_in_threadpool(dispose_engines)
+    await run_in_threadpool(shard_router.dispose)
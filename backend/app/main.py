@@ -1,8 +1,27 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import forms, auth, query, auth_db, formdata
+from fastapi.responses import PlainTextResponse
+from . import lifecycle
+from .config import settings
+from .services.metrics import metrics, MetricsMiddleware
+from .services.querytrace import QueryTraceMiddleware
+from .services.concurrency import ConcurrencyLimitMiddleware
+from .routers import forms, auth, query, auth_db, formdata, revisions, publish, facets, jobs, collab, events
+from .api import themes
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Heavy subsystems are initialised once per worker here instead of at import time
+    stats_task = await lifecycle.startup()
+    yield
+    await lifecycle.shutdown(stats_task)
+
+app = FastAPI(lifespan=lifespan)
+
+if settings.CONCURRENCY_LIMIT_ENABLED:
+    # Added before CORS so that 503 responses still carry the CORS headers
+    app.add_middleware(ConcurrencyLimitMiddleware)
 
 # Configure CORS
 app.add_middleware(
@@ -11,16 +30,52 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all methods
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Primary-Until"],  # Echoed back by clients that do not send cookies, see services/replicas.py
 )
 
+app.add_middleware(lifecycle.WorkerStatsMiddleware)
+app.add_middleware(QueryTraceMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+if settings.replica_urls:
+    from .services.replicas import ReadRoutingMiddleware
+
+    app.add_middleware(ReadRoutingMiddleware)
+
+if settings.PROFILING_ENABLED:
+    from .services.profiler import ProfilingMiddleware
+
+    app.add_middleware(ProfilingMiddleware)
+
 # Include routers
 app.include_router(forms.router, prefix="/api")
 app.include_router(auth.router, prefix="/api/auth")
 app.include_router(auth_db.router, prefix="/api/auth_db")
 app.include_router(query.router, prefix="/api/query")
 app.include_router(formdata.router, prefix="/api/formdata")
+app.include_router(themes.router, prefix="/api")
+app.include_router(revisions.router, prefix="/api")
+app.include_router(publish.router, prefix="/api")
+app.include_router(facets.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
+app.include_router(collab.router, prefix="/api")
+app.include_router(events.router, prefix="/api")
 
 # Root endpoint
 @app.get("/")
 async def root():
-    return {"message": "Welcome to the Form Builder API"}
\ No newline at end of file
+    return {"message": "Welcome to the Form Builder API"}
+
+@app.get("/api/workers/stats")
+async def get_worker_stats():
+    """
+    Request counters of every worker process on this host.
+    """
+    return {"served_by": lifecycle.worker_stats.pid, "workers": lifecycle.worker_stats.read_all()}
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    """
+    Metrics of the worker that serves the request, in Prometheus text format.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String, func
+from sqlalchemy.dialects import mysql
+from ..database import Base
+
+# Compressed payloads can outgrow MySQL's 64 KB BLOB
+ArchivePayload = LargeBinary().with_variant(mysql.LONGBLOB(), "mysql")
+
+class ArchivedFormData(Base):
+    """
+    Model for superseded form data rows moved out of formdata by the archival job.
+    The row keeps its id; its name, description, resolved elements and legacy inline
+    theme are stored as zlib-compressed JSON.
+    """
+    __tablename__ = "archived_formdata"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    form_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    theme_hash = Column(String(64), nullable=True)  # References themes.theme_hash
+    created_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, server_default=func.now())
+    payload = Column(ArchivePayload, nullable=False)
+
+    def __repr__(self):
+        return f"<ArchivedFormData(id={self.id}, form_id={self.form_id})>"
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, DateTime, Integer, func
+from ..database import Base
+from .archived_formdata import ArchivePayload
+
+class ArchivedRevisionBatch(Base):
+    """
+    Model for a run of a form's oldest revisions moved out of form_revisions by the
+    archival job, stored together as one zlib-compressed JSON list.
+    """
+    __tablename__ = "archived_form_revisions"
+
+    form_id = Column(Integer, primary_key=True)
+    first_version = Column(Integer, primary_key=True)
+    last_version = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False, index=True)
+    archived_at = Column(DateTime, server_default=func.now())
+    payload = Column(ArchivePayload, nullable=False)
+
+    def __repr__(self):
+        return f"<ArchivedRevisionBatch(form_id={self.form_id}, versions={self.first_version}-{self.last_version})>"
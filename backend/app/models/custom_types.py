@@ -1,4 +1,16 @@
+from typing import Any, Dict, Optional
 from uuid import UUID as BaseUUID
+import json
+import struct
+import threading
+import zlib
+
+from sqlalchemy import JSON, LargeBinary, Text
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import synonym
+from sqlalchemy.types import TypeDecorator
+
+from ..config import settings
 
 class UUID(BaseUUID):
     @classmethod
@@ -13,4 +25,192 @@ class UUID(BaseUUID):
 
     @classmethod
     def __modify_schema__(cls, field_schema):
-        field_schema.update(type='string', format='uuid') 
\ No newline at end of file
+        field_schema.update(type='string', format='uuid')
+
+class JSONEncodedDict(TypeDecorator):
+    """Represents a JSON-encoded structure as a Text column."""
+    impl = Text
+
+    def process_bind_param(self, value, dialect):
+        if value is not None:
+            return json.dumps(value)
+        return None
+
+    def process_result_value(self, value, dialect):
+        if value is not None:
+            return json.loads(value)
+        return None
+
+# Compressed values start with a NUL byte, which JSON text never does, then the codec
+# and the CRC-32 of the dictionary they were compressed with (0 for none)
+MAGIC = b"\x00"
+HEADER = struct.Struct(">cI")
+CODEC_RAW, CODEC_ZLIB, CODEC_ZSTD = b"j", b"z", b"s"
+
+# Fragments every form element and theme repeats; the preset dictionary when none is configured
+BUILTIN_DICTIONARY = (
+    b'"validation":{"required":false},"value":"","size":"normal"},{"id":"'
+    b'"type":"text","label":"","placeholder":"","options":[],"required":false,'
+    b'"type":"email","type":"select","type":"checkbox","type":"radio","type":"textarea",'
+    b'"type":"number","type":"date","type":"file","caption":null,"placeholder":null,'
+    b'"required":true,"validation":{"required":true},"validation":null,"size":"large",'
+    b'{"primaryColor":"#","backgroundColor":"#ffffff","textColor":"#","borderRadius":"px",'
+    b'"fontFamily":"Inter, sans-serif","layout":"vertical","style":"modern"}'
+)
+
+class _Dictionaries:
+    """Preset dictionaries by id: the built-in one and the configured files, loaded on first use."""
+
+    def __init__(self):
+        self._by_id: Dict[int, bytes] = {}
+        self._current: Optional[bytes] = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._current is not None:
+                return
+            self._by_id[zlib.crc32(BUILTIN_DICTIONARY)] = BUILTIN_DICTIONARY
+            # The first file compresses new values; the others stay readable
+            loaded = []
+            for path in settings.JSON_COMPRESSION_DICTIONARY.split(","):
+                if path.strip():
+                    with open(path.strip(), "rb") as f:
+                        loaded.append(f.read())
+            for dictionary in loaded:
+                self._by_id[zlib.crc32(dictionary)] = dictionary
+            self._current = loaded[0] if loaded else BUILTIN_DICTIONARY
+
+    def current(self) -> bytes:
+        if self._current is None:
+            self._load()
+        return self._current
+
+    def get(self, dictionary_id: int) -> bytes:
+        if self._current is None:
+            self._load()
+        dictionary = self._by_id.get(dictionary_id)
+        if dictionary is None:
+            raise ValueError(f"Compressed JSON needs dictionary {dictionary_id:08x}, which is not configured")
+        return dictionary
+
+dictionaries = _Dictionaries()
+
+_zstd = None
+
+def _zstandard():
+    """The zstandard module, or None when the optional package is not installed."""
+    global _zstd
+    if _zstd is None:
+        try:
+            import zstandard
+            _zstd = zstandard
+        except ImportError:
+            _zstd = False
+    return _zstd or None
+
+def check_codec():
+    """Warn once per worker, at startup, when zstd is configured but cannot be used."""
+    if settings.JSON_COMPRESSION_CODEC == "zstd" and _zstandard() is None:
+        print("Compressed JSON: the zstandard package is not installed, using zlib")
+
+def encode_json(value: Any) -> bytes:
+    """Compact JSON, compressed with the configured codec and preset dictionary."""
+    text = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if len(text) < settings.JSON_COMPRESSION_MIN_BYTES:
+        return MAGIC + HEADER.pack(CODEC_RAW, 0) + text
+
+    dictionary = dictionaries.current()
+    dictionary_id = zlib.crc32(dictionary)
+    zstandard = _zstandard() if settings.JSON_COMPRESSION_CODEC == "zstd" else None
+    if zstandard is not None:
+        compressor = zstandard.ZstdCompressor(
+            level=settings.JSON_COMPRESSION_LEVEL, dict_data=zstandard.ZstdCompressionDict(dictionary)
+        )
+        return MAGIC + HEADER.pack(CODEC_ZSTD, dictionary_id) + compressor.compress(text)
+
+    compressor = zlib.compressobj(min(settings.JSON_COMPRESSION_LEVEL, 9), zdict=dictionary)
+    return MAGIC + HEADER.pack(CODEC_ZLIB, dictionary_id) + compressor.compress(text) + compressor.flush()
+
+def decode_json(value: Any) -> Any:
+    """
+    Decode a stored value: compressed bytes, JSON text written before compression was
+    enabled, or an already decoded value.
+    """
+    if isinstance(value, memoryview):
+        value = value.tobytes()
+    if isinstance(value, (bytes, bytearray)):
+        if not value.startswith(MAGIC):
+            return json.loads(value)
+        codec, dictionary_id = HEADER.unpack_from(value, 1)
+        body = value[1 + HEADER.size:]
+        if codec == CODEC_ZLIB:
+            decompressor = zlib.decompressobj(zdict=dictionaries.get(dictionary_id))
+            body = decompressor.decompress(body) + decompressor.flush()
+        elif codec == CODEC_ZSTD:
+            zstandard = _zstandard()
+            if zstandard is None:
+                raise ValueError("Compressed JSON: a zstd value was read but the zstandard package is not installed")
+            body = zstandard.ZstdDecompressor(
+                dict_data=zstandard.ZstdCompressionDict(dictionaries.get(dictionary_id))
+            ).decompress(body)
+        return json.loads(body)
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+class CompressedJSON(TypeDecorator):
+    """
+    A JSON document stored as compressed binary when JSON_COMPRESSION_ENABLED is set,
+    and as a plain JSON column otherwise. Results are returned undecoded; map the
+    column through lazy_json() so documents are only decompressed when accessed.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if not settings.JSON_COMPRESSION_ENABLED:
+            return dialect.type_descriptor(JSON())
+        # Compressed documents can outgrow MySQL's 64 KB BLOB
+        return dialect.type_descriptor(mysql.LONGBLOB() if dialect.name == "mysql" else LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or not settings.JSON_COMPRESSION_ENABLED:
+            return value
+        # Raw values copied between databases are stored as they are
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return value
+        if isinstance(value, str):
+            return value.encode("utf-8")
+        return encode_json(value)
+
+    def process_result_value(self, value, dialect):
+        return value
+
+class _LazyJSON:
+    """Decodes a CompressedJSON attribute on first access and caches it until the stored value changes."""
+
+    def __init__(self, stored_attribute: str):
+        self.stored_attribute = stored_attribute
+        self.cache_key = f"_decoded{stored_attribute}"
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        stored = getattr(instance, self.stored_attribute)
+        cached = instance.__dict__.get(self.cache_key)
+        if cached is not None and cached[0] is stored:
+            return cached[1]
+        value = decode_json(stored)
+        instance.__dict__[self.cache_key] = (stored, value)
+        return value
+
+    def __set__(self, instance, value):
+        setattr(instance, self.stored_attribute, value)
+
+def lazy_json(stored_attribute: str):
+    """
+    The public attribute for a CompressedJSON column mapped under stored_attribute.
+    Usable in queries and constructors like the column itself.
+    """
+    return synonym(stored_attribute, descriptor=_LazyJSON(stored_attribute))
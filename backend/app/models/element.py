@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, DateTime, func, JSON
+from ..database import Base
+
+class FormElementBlob(Base):
+    """
+    Model for storing each distinct form element once, keyed by the hash of its canonical JSON.
+    Form revisions reference their elements as an ordered list of element hashes.
+    """
+    __tablename__ = "form_element_blobs"
+
+    element_hash = Column(String(64), primary_key=True)
+    element_data = Column(JSON, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    def __repr__(self):
+        return f"<FormElementBlob(element_hash='{self.element_hash}')>"
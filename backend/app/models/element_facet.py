@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Index, Integer, String
+from ..database import Base
+
+class FormElementFacet(Base):
+    """
+    Model for the element counts of a form's current version, one row per element type
+    plus a "*" row with the totals. Maintained on every save so element queries read
+    these indexed rows instead of parsing form JSON.
+    """
+    __tablename__ = "form_element_facets"
+    __table_args__ = (
+        Index("ix_form_element_facets_type_count", "source", "element_type", "element_count"),
+        Index("ix_form_element_facets_type_required", "source", "element_type", "required_count"),
+    )
+
+    source = Column(String(16), primary_key=True)  # "formdata" or "forms"
+    form_id = Column(Integer, primary_key=True)
+    element_type = Column(String(64), primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    element_count = Column(Integer, nullable=False)
+    required_count = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<FormElementFacet(source='{self.source}', form_id={self.form_id}, element_type='{self.element_type}')>"
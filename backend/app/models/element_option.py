@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Index, Integer, String
+from ..database import Base
+
+class FormElementOption(Base):
+    """
+    Model for the distinct choice options offered by a form's current version.
+    Maintained on every save alongside form_element_facets.
+    """
+    __tablename__ = "form_element_options"
+    __table_args__ = (Index("ix_form_element_options_value", "source", "option_value"),)
+
+    source = Column(String(16), primary_key=True)  # "formdata" or "forms"
+    form_id = Column(Integer, primary_key=True)
+    option_value = Column(String(255), primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<FormElementOption(source='{self.source}', form_id={self.form_id}, option_value='{self.option_value}')>"
@@ -2,26 +2,11 @@
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any, Union
 from ..database import Base
-from sqlalchemy import Column, String, DateTime, func, Integer, JSON, Text
-from sqlalchemy.types import TypeDecorator
-import json
+from .custom_types import CompressedJSON, JSONEncodedDict, lazy_json  # noqa: F401
+from sqlalchemy import Column, String, DateTime, func, Integer, JSON
 from sqlalchemy.ext.declarative import declarative_base
 import datetime
 
-class JSONEncodedDict(TypeDecorator):
-    """Represents a JSON-encoded structure as a Text column."""
-    impl = Text
-    
-    def process_bind_param(self, value, dialect):
-        if value is not None:
-            return json.dumps(value)
-        return None
-        
-    def process_result_value(self, value, dialect):
-        if value is not None:
-            return json.loads(value)
-        return None
-
 class FormField(BaseModel):
     id: str
     type: str
@@ -43,7 +28,9 @@ class Form(Base):
 
     form_id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     form_name = Column(String(255), nullable=False)
-    form_data = Column(JSON)  # MySQL 5.7+ supports JSON type
+    _form_data = Column("form_data", CompressedJSON)  # JSON, or compressed binary with JSON_COMPRESSION_ENABLED
+    form_data = lazy_json("_form_data")
+    element_hashes = Column(JSON, nullable=True)  # Ordered element hashes when the element store is enabled
     user_id = Column(Integer, nullable=False)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, nullable=True, onupdate=func.now())
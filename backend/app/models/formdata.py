@@ -1,6 +1,7 @@
 from sqlalchemy import Column, Integer, String, Text, DateTime, func, JSON, ForeignKey
 from sqlalchemy.orm import relationship
 from ..database import Base
+from .custom_types import CompressedJSON, lazy_json
 import json
 
 class FormData(Base):
@@ -14,8 +15,12 @@ class FormData(Base):
     form_id = Column(Integer, nullable=False, index=True)
     form_name = Column(String(255), nullable=False)
     form_description = Column(Text, nullable=True)
-    form_elements = Column(JSON, nullable=False)  # Stores the form elements as JSON
-    form_theme = Column(JSON, nullable=True)  # Stores the theme settings as JSON
+    _form_elements = Column("form_elements", CompressedJSON, nullable=False)  # Stores the form elements as JSON
+    form_elements = lazy_json("_form_elements")
+    element_hashes = Column(JSON, nullable=True)  # Ordered element hashes when the element store is enabled
+    _form_theme = Column("form_theme", CompressedJSON, nullable=True)  # Legacy inline theme settings, superseded by theme_hash
+    form_theme = lazy_json("_form_theme")
+    theme_hash = Column(String(64), nullable=True, index=True)  # References themes.theme_hash
     user_id = Column(Integer, nullable=False, index=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, nullable=True, onupdate=func.now())
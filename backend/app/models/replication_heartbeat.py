@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Float, Integer
+from ..database import Base
+
+class ReplicationHeartbeat(Base):
+    """
+    A single row the primary updates every few seconds. Reading it back from a
+    replica shows how far that replica is behind.
+    """
+    __tablename__ = "replication_heartbeat"
+
+    id = Column(Integer, primary_key=True)
+    beat_at = Column(Float, nullable=False)  # Unix time of the primary's last beat
+
+    def __repr__(self):
+        return f"<ReplicationHeartbeat(beat_at={self.beat_at})>"
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, func, JSON, UniqueConstraint
+from ..database import Base
+
+class FormRevision(Base):
+    """
+    Model for a form's version history.
+    Every REVISION_SNAPSHOT_INTERVAL-th revision stores a full snapshot of the form;
+    the ones in between store the structural diff from the previous revision.
+    """
+    __tablename__ = "form_revisions"
+    __table_args__ = (UniqueConstraint("form_id", "version", name="uq_form_revisions_form_version"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    form_id = Column(Integer, nullable=False, index=True)
+    version = Column(Integer, nullable=False)
+    kind = Column(String(16), nullable=False)  # "snapshot" or "delta"
+    payload = Column(JSON, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    def __repr__(self):
+        return f"<FormRevision(form_id={self.form_id}, version={self.version}, kind='{self.kind}')>"
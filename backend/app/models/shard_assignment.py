@@ -0,0 +1,17 @@
+from sqlalchemy import Column, DateTime, Integer, func
+from ..database import Base
+
+class ShardAssignment(Base):
+    """
+    The shard holding a user's forms, kept on the primary database.
+    Recorded at the user's first write and changed only when the user is resharded.
+    """
+    __tablename__ = "shard_assignments"
+
+    user_id = Column(Integer, primary_key=True)
+    shard = Column(Integer, nullable=False)
+    moving_to = Column(Integer, nullable=True)  # Target shard while a move is in progress; writes wait
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<ShardAssignment(user_id={self.user_id}, shard={self.shard}, moving_to={self.moving_to})>"
@@ -0,0 +1,16 @@
+from sqlalchemy import BigInteger, Column, String
+from ..database import Base
+
+class ShardIdSequence(Base):
+    """
+    The last id a shard allocated for one of its tables. Ids come from here rather
+    than autoincrement, which would follow the largest id present, including ids of
+    rows moved in from other shards.
+    """
+    __tablename__ = "shard_id_sequences"
+
+    table_name = Column(String(64), primary_key=True)
+    last_id = Column(BigInteger, nullable=False)
+
+    def __repr__(self):
+        return f"<ShardIdSequence(table_name='{self.table_name}', last_id={self.last_id})>"
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, DateTime, func, JSON
+from ..database import Base
+
+class Theme(Base):
+    """
+    Model for storing form themes once, keyed by the hash of their canonical JSON.
+    Form data rows reference a theme through its theme_hash.
+    """
+    __tablename__ = "themes"
+
+    theme_hash = Column(String(64), primary_key=True)
+    theme_data = Column(JSON, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    def __repr__(self):
+        return f"<Theme(theme_hash='{self.theme_hash}')>"
@@ -1,10 +1,7 @@
 from sqlalchemy import Column, Integer, String, Boolean, DateTime
 from sqlalchemy.sql import func
 from ..database import Base
-from passlib.context import CryptContext
-
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from .. import security
 
 class UserCred(Base):
     __tablename__ = "usercred"
@@ -18,8 +15,8 @@ class UserCred(Base):
 
     @staticmethod
     def verify_password(plain_password, hashed_password):
-        return pwd_context.verify(plain_password, hashed_password)
+        return security.verify_password(plain_password, hashed_password)
 
     @staticmethod
     def get_password_hash(password):
-        return pwd_context.hash(password) 
\ No newline at end of file
+        return security.hash_password(password) 
\ No newline at end of file
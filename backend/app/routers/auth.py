@@ -1,14 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from jose import jwt
 from datetime import datetime, timedelta
 from typing import Optional
 from pydantic import BaseModel, EmailStr, Field
 
 from ..database import get_db
 from ..models.user import User
-from ..config import settings
+from ..security import create_access_token, hash_password_async, verify_password_async
+from ..services.ratelimit import rate_limiter
 
 router = APIRouter(tags=["Authentication"])
 
@@ -33,14 +33,6 @@ class Token(BaseModel):
     token_type: str
     user: UserResponse
 
-# JWT token functions
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=30))
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
-
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
     # Check if username already exists
@@ -60,7 +52,7 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = User.get_password_hash(user_data.password)
+    hashed_password = await hash_password_async(user_data.password)
     new_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -74,12 +66,13 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
     return new_user
 
 @router.post("/login", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    await rate_limiter.check(request, "login", user=form_data.username)
     # Find user by username
     user = db.query(User).filter(User.username == form_data.username).first()
     
     # Verify user exists and password is correct
-    if not user or not User.verify_password(form_data.password, user.password):
+    if not user or not await verify_password_async(form_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -100,12 +93,13 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     }
 
 @router.post("/token", response_model=Token)
-async def login_with_credentials(username: str, password: str, db: Session = Depends(get_db)):
+async def login_with_credentials(username: str, password: str, request: Request, db: Session = Depends(get_db)):
+    await rate_limiter.check(request, "login", user=username)
     # Find user by username
     user = db.query(User).filter(User.username == username).first()
     
     # Verify user exists and password is correct
-    if not user or not User.verify_password(password, user.password):
+    if not user or not await verify_password_async(password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
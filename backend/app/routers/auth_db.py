@@ -1,32 +1,13 @@
-from fastapi import APIRouter, HTTPException, status, Body
+from fastapi import APIRouter, HTTPException, status, Body, Request
 from pydantic import BaseModel, EmailStr, Field, validator
 from typing import Optional, Dict, Any
-import pymysql
-import os
-from dotenv import load_dotenv
-import urllib.parse
 from datetime import datetime, timedelta
-from jose import jwt
-from passlib.context import CryptContext
 import traceback
 
-# Load environment variables
-load_dotenv()
-
-# Get database configuration from environment variables
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_USER = os.getenv("DB_USER", "root")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "")
-DB_NAME = os.getenv("DB_NAME", "login")
-DB_PORT = int(os.getenv("DB_PORT", "3306"))
-
-# JWT settings
-SECRET_KEY = os.getenv("SECRET_KEY", "your_super_secret_key_change_this_in_production")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
-
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from ..config import settings
+from ..database import get_raw_connection
+from .. import security
+from ..services.ratelimit import rate_limiter
 
 router = APIRouter(tags=["Authentication DB"])
 
@@ -63,43 +44,31 @@ class Token(BaseModel):
 def get_connection():
     """Create and return a database connection."""
     try:
-        connection = pymysql.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            port=DB_PORT,
-            database=DB_NAME,
-            cursorclass=pymysql.cursors.DictCursor
-        )
-        return connection
-    except pymysql.Error as e:
-        print(f"Error connecting to MySQL: {e}")
+        return get_raw_connection()
+    except Exception as e:
+        print(f"Error connecting to the database: {e}")
         raise HTTPException(status_code=500, detail=f"Database connection error: {str(e)}")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    return await security.verify_password_async(plain_password, hashed_password)
 
-def get_password_hash(password):
+async def get_password_hash(password):
     try:
-        return pwd_context.hash(password)
+        return await security.hash_password_async(password)
     except Exception as e:
         print(f"Error hashing password: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error hashing password: {str(e)}")
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return security.create_access_token(data, expires_delta)
 
 def generate_sequential_id(connection):
     """Generate a sequential ID in the format '001', '002', etc."""
     try:
         with connection.cursor() as cursor:
             # Get the highest UserId
-            cursor.execute("SELECT MAX(CAST(UserId AS UNSIGNED)) as max_id FROM usercred")
+            cursor.execute(f"SELECT MAX({connection.cast_integer('UserId')}) as max_id FROM usercred")
             result = cursor.fetchone()
             
             # If no users exist, start with 1
@@ -147,7 +116,7 @@ async def register_user(user_data: UserCreate = Body(...)):
                 user_id = generate_sequential_id(connection)
                 
                 # Hash the password
-                hashed_password = get_password_hash(user_data.password)
+                hashed_password = await get_password_hash(user_data.password)
                 
                 # Get current datetime
                 now = datetime.now()
@@ -202,10 +171,11 @@ async def register_user(user_data: UserCreate = Body(...)):
             connection.close()
 
 @router.post("/login")
-async def login_user(user_data: UserLogin = Body(...)):
+async def login_user(request: Request, user_data: UserLogin = Body(...)):
     """
     Authenticate a user and return a JWT token.
     """
+    await rate_limiter.check(request, "login", user=user_data.username)
     connection = None
     try:
         connection = get_connection()
@@ -217,14 +187,14 @@ async def login_user(user_data: UserLogin = Body(...)):
             user = cursor.fetchone()
             
             # Verify user exists and password is correct
-            if not user or not verify_password(user_data.password, user["password"]):
+            if not user or not await verify_password(user_data.password, user["password"]):
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Incorrect username or password"
                 )
             
             # Create access token
-            access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+            access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
             access_token = create_access_token(
                 data={"sub": str(user["UserId"])},
                 expires_delta=access_token_expires
@@ -261,9 +231,9 @@ async def login_user(user_data: UserLogin = Body(...)):
             connection.close()
 
 @router.post("/token")
-async def login_with_credentials(username: str = Body(...), password: str = Body(...)):
+async def login_with_credentials(request: Request, username: str = Body(...), password: str = Body(...)):
     """
     Authenticate a user with username and password and return a JWT token.
     """
     user_data = UserLogin(username=username, password=password)
-    return await login_user(user_data) 
\ No newline at end of file
+    return await login_user(request, user_data) 
\ No newline at end of file
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, Field, ValidationError
+from typing import Any, Dict, Optional
+from ..config import settings
+from ..services.collab import OPERATIONS, collab_hub
+from .forms import FormFieldBase
+
+router = APIRouter(tags=["Collaboration"])
+
+class CollabOperation(BaseModel):
+    op: str = Field(pattern=f"^({'|'.join(OPERATIONS)})$")
+    op_id: Optional[str] = Field(None, max_length=64)  # Echoed back in the ack or rejection
+    id: Optional[str] = None  # The field an update, style, delete or reorder applies to
+    field: Optional[FormFieldBase] = None  # The new field of an add
+    changes: Optional[Dict[str, Any]] = None
+    index: Optional[int] = Field(None, ge=0)  # Position for add and reorder
+
+@router.websocket("/collab/forms/{form_id}")
+async def edit_form_together(websocket: WebSocket, form_id: int, user_id: int):
+    """
+    Element-level editing of a builder form, shared live with its other editors.
+    The server first sends a snapshot of the form, then an "op" message for every
+    change made by someone else. Each operation sent is answered with "ack" or "rejected".
+    """
+    await websocket.accept()
+    try:
+        session = await collab_hub.join(form_id, user_id, websocket)
+    except HTTPException as e:
+        await websocket.close(code=4000 + e.status_code, reason=e.detail)
+        return
+
+    try:
+        await websocket.send_json(session.snapshot())
+        await session.send({"type": "editors", "editors": len(session.editors)}, skip=websocket)
+        while True:
+            message = await websocket.receive_text()
+            if len(message) > settings.COLLAB_MAX_MESSAGE_BYTES:
+                await websocket.send_json({"type": "rejected", "op_id": None, "detail": "Message too large"})
+                continue
+            try:
+                operation = CollabOperation.model_validate_json(message)
+            except ValidationError as e:
+                await websocket.send_json({"type": "rejected", "op_id": None, "detail": str(e.errors()[0]["msg"])})
+                continue
+            data = operation.dict(exclude_none=True)
+            if operation.field is not None:
+                data["field"] = operation.field.dict(exclude_unset=True)
+            await collab_hub.apply(session, websocket, data)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await collab_hub.leave(session, websocket)
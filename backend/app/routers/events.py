@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Header
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import AsyncIterator, Optional
+import asyncio
+import time
+from ..config import settings
+from ..services.events import event_hub
+
+router = APIRouter(tags=["Events"])
+
+def format_event(event_id: int, event: str, data: str) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+async def form_events(user_id: int, last_event_id: Optional[str]) -> AsyncIterator[str]:
+    queue = event_hub.subscribe(user_id)
+    try:
+        yield f"retry: {settings.EVENTS_RETRY_MS}\n\n"
+        replay = None
+        if last_event_id is not None and last_event_id.strip().isdigit():
+            last = int(last_event_id)
+            replay = await run_in_threadpool(event_hub.since, user_id, last)
+        if replay is None:
+            # A fresh stream, or one resuming from events no longer kept
+            last = await run_in_threadpool(event_hub.latest_id)
+            yield format_event(last, "ready" if last_event_id is None else "reset", "{}")
+        else:
+            for event_id, event, data in replay:
+                last = event_id
+                yield format_event(event_id, event, data)
+
+        # Streams also end now and then, so proxies and load balancers rebalance them; clients resume seamlessly
+        deadline = time.monotonic() + settings.EVENTS_MAX_STREAM_SECONDS
+        while time.monotonic() < deadline and not event_hub.closing:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=settings.EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if item is None:
+                break
+            event_id, event, data = item
+            if event_id <= last:
+                continue
+            last = event_id
+            yield format_event(event_id, event, data)
+    finally:
+        event_hub.unsubscribe(user_id, queue)
+
+@router.get("/events/forms")
+async def stream_form_events(user_id: int, last_event_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events stream of a user's form changes: form.created, form.updated and
+    form.deleted, for both the builder's forms ("source": "forms") and saved form data
+    ("source": "formdata"). Reconnecting with Last-Event-ID replays what was missed.
+    """
+    return StreamingResponse(
+        form_events(user_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
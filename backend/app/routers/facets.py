@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Any, Dict, List, Optional
+from ..storage.facets import element_types_of, find_forms, summarize_element_types
+from ..storage.shards import ShardSessions, get_shards
+
+router = APIRouter(tags=["Facets"])
+
+SOURCE_PATTERN = "^(formdata|forms)$"
+
+@router.get("/facets/forms", response_model=List[Dict[str, Any]])
+async def find_forms_by_elements(
+    source: str = Query("formdata", pattern=SOURCE_PATTERN),
+    element_type: Optional[str] = Query(None, min_length=1, max_length=64),
+    min_count: int = Query(1, ge=1),
+    max_count: Optional[int] = Query(None, ge=1),
+    min_required: Optional[int] = Query(None, ge=0),
+    option: Optional[str] = Query(None, min_length=1, max_length=255),
+    user_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    shards: ShardSessions = Depends(get_shards)
+):
+    """
+    Find forms by their elements, e.g. ?element_type=file, ?min_required=5 or ?option=Yes.
+    Conditions combine; element_type takes min_count and max_count. Reads only the
+    indexed facet tables, never the forms' JSON.
+    """
+    if user_id is not None:
+        sessions = [(shards.router.shard_for_user(user_id), shards.for_user(user_id))]
+    else:
+        sessions = list(enumerate(shards.all()))
+
+    results = []
+    for index, db in sessions:
+        matches = [
+            row for row in find_forms(db, source, element_type, min_count, max_count, min_required, option, user_id, limit)
+            if shards.owns(index, row.user_id)
+        ]
+        types = element_types_of(db, source, [row.form_id for row in matches])
+        results += [
+            {
+                "form_id": row.form_id,
+                "user_id": row.user_id,
+                "elements": row.element_count,
+                "required": row.required_count,
+                "element_types": types[row.form_id]
+            }
+            for row in matches
+        ]
+
+    results.sort(key=lambda result: result["form_id"])
+    return results[:limit]
+
+@router.get("/facets/element-types", response_model=List[Dict[str, Any]])
+async def get_element_type_summary(
+    source: str = Query("formdata", pattern=SOURCE_PATTERN),
+    user_id: Optional[int] = None,
+    shards: ShardSessions = Depends(get_shards)
+):
+    """
+    How many forms use each element type, with element and required counts, most used first.
+    """
+    sessions = [shards.for_user(user_id)] if user_id is not None else shards.all()
+
+    summary: Dict[str, Dict[str, int]] = {}
+    for db in sessions:
+        for element_type, forms, elements, required in summarize_element_types(db, source, user_id):
+            totals = summary.setdefault(element_type, {"element_type": element_type, "forms": 0, "elements": 0, "required": 0})
+            totals["forms"] += int(forms)
+            totals["elements"] += int(elements or 0)
+            totals["required"] += int(required or 0)
+
+    return sorted(summary.values(), key=lambda totals: (-totals["forms"], totals["element_type"]))
@@ -1,25 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, ConfigDict, validator
 from typing import Optional, List, Dict, Any, Union
-from ..database import get_db
 from ..models.formdata import FormData
+from ..models.archived_formdata import ArchivedFormData
+from ..api.themes import FormTheme, intern_theme, get_themes, css_bundle_url
+from ..storage.elements import pack_elements, remember_elements, load_element_lists
+from ..storage.revisions import build_state, record_revision
+from ..storage.facets import index_form_elements, is_latest_formdata, reindex_latest_formdata
+from ..storage.archive import load_archived_formdata, unpack_archived_formdata, restore_formdata, restore_newest_formdata
+from ..storage.shards import ShardSessions, get_shards
+from ..services.search import search_indexes, UserSearchIndex
+from ..services.publisher import publisher
+from ..services.events import event_hub
+from ..responses import TrustedJSONResponse
 import json
 from datetime import datetime
 
 router = APIRouter()
 
 # Pydantic models for request/response
-class FormTheme(BaseModel):
-    primaryColor: str
-    backgroundColor: str
-    textColor: str
-    borderRadius: str
-    fontFamily: str
-    layout: str
-    style: str
-
 class FormElement(BaseModel):
     id: str
     type: str
@@ -46,39 +48,157 @@ class FormDataResponse(BaseModel):
     form_description: Optional[str] = None
     form_elements: List[Dict[str, Any]]
     form_theme: Optional[Dict[str, Any]] = None
+    theme_hash: Optional[str] = None
+    theme_css_url: Optional[str] = None
     user_id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+def serialize_form_data(db: Session, rows: List[FormData]) -> List[Dict[str, Any]]:
+    """
+    Build response dictionaries for form data rows, resolving theme hashes
+    through the theme registry with a single batched lookup.
+    """
+    themes = get_themes(db, [row.theme_hash for row in rows if row.form_theme is None])
+    stored_elements = load_element_lists(db, [row.element_hashes for row in rows])
+
+    return [
+        {
+            "id": row.id,
+            "form_id": row.form_id,
+            "form_name": row.form_name,
+            "form_description": row.form_description,
+            "form_elements": row.form_elements if elements is None else elements,
+            "form_theme": row.form_theme if row.form_theme is not None else themes.get(row.theme_hash),
+            "theme_hash": row.theme_hash,
+            "theme_css_url": css_bundle_url(row.theme_hash),
+            "user_id": row.user_id,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at
+        }
+        for row, elements in zip(rows, stored_elements)
+    ]
+
+def serialize_archived_form_data(db: Session, records: List[ArchivedFormData]) -> List[Dict[str, Any]]:
+    """Build response dictionaries for archived rows, whose elements are stored resolved."""
+    rows = [unpack_archived_formdata(record) for record in records]
+    themes = get_themes(db, [row["theme_hash"] for row in rows if row["form_theme"] is None])
+
+    return [
+        {
+            "id": row["id"],
+            "form_id": row["form_id"],
+            "form_name": row["form_name"],
+            "form_description": row["form_description"],
+            "form_elements": row["form_elements"],
+            "form_theme": row["form_theme"] if row["form_theme"] is not None else themes.get(row["theme_hash"]),
+            "theme_hash": row["theme_hash"],
+            "theme_css_url": css_bundle_url(row["theme_hash"]),
+            "user_id": row["user_id"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+        for row in rows
+    ]
+
+def find_form_data_row(shards: ShardSessions, id: int):
+    """
+    Find a form data row by id for writing. An archived row is moved back into
+    formdata first, within the session's pending transaction.
+    """
+    db, row = shards.find(("formdata.id", id), lambda db: db.query(FormData).filter(FormData.id == id).first())
+    if row is None:
+        db, record = shards.find(("archived_formdata.id", id), lambda db: (
+            db.query(ArchivedFormData).filter(ArchivedFormData.id == id).first()
+        ))
+        if record is not None:
+            shards.for_user(record.user_id, writing=True)
+            row = restore_formdata(db, record)
+    return db, row
+
+def latest_form_data(db: Session, form_id: int) -> Optional[FormData]:
+    """The form's latest row: the one with the highest id."""
+    return db.query(FormData).filter(FormData.form_id == form_id).order_by(FormData.id.desc()).first()
+
+def republish_latest(db: Session, form_id: int):
+    """After a delete, publish the row that is now the form's latest, or unpublish a form with none left."""
+    if not publisher.is_published(form_id):
+        return
+    row = latest_form_data(db, form_id)
+    if row is None:
+        publisher.unpublish(form_id)
+    else:
+        # publish() rather than republish_if_published(), which keeps a newer row's bundles
+        publisher.publish(serialize_form_data(db, [row])[0])
+
+def build_search_index(db: Session, user_id: int) -> UserSearchIndex:
+    """
+    Index the latest revision of each of a user's forms.
+    """
+    latest_ids = db.query(func.max(FormData.id)).filter(FormData.user_id == user_id).group_by(FormData.form_id)
+    rows = db.query(FormData).filter(FormData.id.in_(latest_ids)).all()
+
+    index = UserSearchIndex()
+    for row in serialize_form_data(db, rows):
+        index.upsert(row["form_id"], row["id"], row["form_name"], row["form_description"],
+                     row["form_elements"], row["updated_at"] or row["created_at"])
+    return index
+
+def index_for_search(db_form_data: FormData, form_elements: List[Dict[str, Any]]):
+    """Keep the user's search index current after a write."""
+    search_indexes.index_form(
+        db_form_data.user_id, db_form_data.form_id, db_form_data.id, db_form_data.form_name,
+        db_form_data.form_description, form_elements, db_form_data.updated_at or db_form_data.created_at
+    )
 
 @router.post("/formdata", response_model=FormDataResponse, status_code=status.HTTP_201_CREATED)
-async def create_form_data(form_data: FormDataCreate, db: Session = Depends(get_db)):
+async def create_form_data(form_data: FormDataCreate, shards: ShardSessions = Depends(get_shards)):
     """
     Create a new form data entry from session storage data.
     """
+    db = shards.for_user(form_data.user_id, writing=True)
     try:
         # Convert Pydantic models to dictionaries for JSON storage
         form_elements_json = [element.dict() for element in form_data.form_elements]
         form_theme_json = form_data.form_theme.dict() if form_data.form_theme else None
         
-        # Create new FormData object
+        inline_elements, element_hashes = pack_elements(db, form_elements_json)
+        theme_hash = intern_theme(db, form_theme_json)
+        
+        # Create new FormData object, referencing the theme by its hash
         db_form_data = FormData(
             form_id=form_data.form_id,
             form_name=form_data.form_name,
             form_description=form_data.form_description,
-            form_elements=form_elements_json,
-            form_theme=form_theme_json,
+            form_elements=inline_elements,
+            element_hashes=element_hashes,
+            theme_hash=theme_hash,
             user_id=form_data.user_id
         )
         
+        # Append to the form's version history in the same transaction
+        record_revision(db, form_data.form_id, form_data.user_id, build_state(
+            form_data.form_name, form_data.form_description, theme_hash, form_elements_json
+        ))
+        
+        # The new row is the form's latest, so it defines the form's element facets
+        index_form_elements(db, "formdata", form_data.form_id, form_data.user_id, form_elements_json)
+        
         # Add to database
         db.add(db_form_data)
         db.commit()
         db.refresh(db_form_data)
+        remember_elements(element_hashes, form_elements_json)
+        index_for_search(db_form_data, form_elements_json)
+        event_hub.publish(db_form_data.user_id, "form.created", "formdata", db_form_data.form_id, id=db_form_data.id)
+        
+        response = serialize_form_data(db, [db_form_data])[0]
+        # Published forms are re-rendered only when they change
+        publisher.republish_if_published(response)
         
-        return db_form_data
+        return TrustedJSONResponse(response, status_code=status.HTTP_201_CREATED)
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(
@@ -87,12 +207,12 @@ async def create_form_data(form_data: FormDataCreate, db: Session = Depends(get_
         )
 
 @router.get("/formdata/{form_id}", response_model=FormDataResponse)
-async def get_form_data(form_id: int, db: Session = Depends(get_db)):
+async def get_form_data(form_id: int, shards: ShardSessions = Depends(get_shards)):
     """
     Get form data by form ID.
     """
     # Get the latest form data for the given form_id
-    form_data = db.query(FormData).filter(FormData.form_id == form_id).order_by(FormData.created_at.desc()).first()
+    db, form_data = shards.find(("formdata.form_id", form_id), lambda db: latest_form_data(db, form_id))
     
     if not form_data:
         raise HTTPException(
@@ -100,26 +220,54 @@ async def get_form_data(form_id: int, db: Session = Depends(get_db)):
             detail=f"Form data with ID {form_id} not found"
         )
     
-    return form_data
+    return TrustedJSONResponse(serialize_form_data(db, [form_data])[0])
 
 @router.get("/formdata/user/{user_id}", response_model=List[FormDataResponse])
-async def get_user_form_data(user_id: int, db: Session = Depends(get_db)):
+async def get_user_form_data(
+    user_id: int,
+    include_archived: bool = Query(False),
+    shards: ShardSessions = Depends(get_shards)
+):
     """
-    Get all form data for a specific user.
+    Get all form data for a specific user. Archived history is only included when asked for.
     """
+    db = shards.for_user(user_id)
     form_data = db.query(FormData).filter(FormData.user_id == user_id).all()
+    archived = load_archived_formdata(db, user_id) if include_archived else []
     
-    if not form_data:
+    if not form_data and not archived:
         return []
     
-    return form_data
+    # Rows were validated on write, so skip re-validating every element against FormDataResponse
+    rows = serialize_form_data(db, form_data)
+    if archived:
+        rows = sorted(rows + serialize_archived_form_data(db, archived), key=lambda row: row["id"])
+    return TrustedJSONResponse(rows)
+
+@router.get("/formdata/user/{user_id}/search")
+async def search_user_form_data(
+    user_id: int,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    shards: ShardSessions = Depends(get_shards)
+):
+    """
+    Search a user's forms by name, description and field labels, placeholders and options.
+    Every word must match, either exactly or as a prefix.
+    """
+    results = search_indexes.search(user_id, q, limit)
+    if results is None:
+        search_indexes.put(user_id, build_search_index(shards.for_user(user_id), user_id))
+        results = search_indexes.search(user_id, q, limit) or []
+
+    return {"query": q, "results": results}
 
 @router.put("/formdata/{id}", response_model=FormDataResponse)
-async def update_form_data(id: int, form_data: FormDataCreate, db: Session = Depends(get_db)):
+async def update_form_data(id: int, form_data: FormDataCreate, shards: ShardSessions = Depends(get_shards)):
     """
     Update existing form data.
     """
-    db_form_data = db.query(FormData).filter(FormData.id == id).first()
+    db, db_form_data = find_form_data_row(shards, id)
     
     if not db_form_data:
         raise HTTPException(
@@ -127,22 +275,45 @@ async def update_form_data(id: int, form_data: FormDataCreate, db: Session = Dep
             detail=f"Form data with ID {id} not found"
         )
     
+    # Waits out a move of the owner's rows to another shard
+    shards.for_user(db_form_data.user_id, writing=True)
     try:
         # Convert Pydantic models to dictionaries for JSON storage
         form_elements_json = [element.dict() for element in form_data.form_elements]
         form_theme_json = form_data.form_theme.dict() if form_data.form_theme else None
         
+        inline_elements, element_hashes = pack_elements(db, form_elements_json)
+        
         # Update fields
         db_form_data.form_name = form_data.form_name
         db_form_data.form_description = form_data.form_description
-        db_form_data.form_elements = form_elements_json
-        db_form_data.form_theme = form_theme_json
+        db_form_data.form_elements = inline_elements
+        db_form_data.element_hashes = element_hashes
+        db_form_data.form_theme = None
+        db_form_data.theme_hash = intern_theme(db, form_theme_json)
+        
+        # Append to the form's version history in the same transaction
+        record_revision(db, db_form_data.form_id, db_form_data.user_id, build_state(
+            form_data.form_name, form_data.form_description, db_form_data.theme_hash, form_elements_json
+        ))
+        # Editing an older row changes neither the form's facets nor what search finds for it
+        latest = is_latest_formdata(db, db_form_data)
+        if latest:
+            index_form_elements(db, "formdata", db_form_data.form_id, db_form_data.user_id, form_elements_json)
         
         # Commit changes
         db.commit()
         db.refresh(db_form_data)
+        remember_elements(element_hashes, form_elements_json)
+        if latest:
+            index_for_search(db_form_data, form_elements_json)
+        event_hub.publish(db_form_data.user_id, "form.updated", "formdata", db_form_data.form_id, id=db_form_data.id)
+        
+        response = serialize_form_data(db, [db_form_data])[0]
+        # Published forms are re-rendered only when they change
+        publisher.republish_if_published(response)
         
-        return db_form_data
+        return TrustedJSONResponse(response)
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(
@@ -151,11 +322,11 @@ async def update_form_data(id: int, form_data: FormDataCreate, db: Session = Dep
         )
 
 @router.delete("/formdata/{id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_form_data(id: int, db: Session = Depends(get_db)):
+async def delete_form_data(id: int, shards: ShardSessions = Depends(get_shards)):
     """
     Delete form data by ID.
     """
-    db_form_data = db.query(FormData).filter(FormData.id == id).first()
+    db, db_form_data = find_form_data_row(shards, id)
     
     if not db_form_data:
         raise HTTPException(
@@ -163,9 +334,16 @@ async def delete_form_data(id: int, db: Session = Depends(get_db)):
             detail=f"Form data with ID {id} not found"
         )
     
+    shards.for_user(db_form_data.user_id, writing=True)
     try:
         db.delete(db_form_data)
+        restore_newest_formdata(db, db_form_data.form_id)
+        reindex_latest_formdata(db, db_form_data.form_id)
         db.commit()
+        # The form may now be represented by an older revision, so rebuild on next search
+        search_indexes.invalidate(db_form_data.user_id)
+        event_hub.publish(db_form_data.user_id, "form.deleted", "formdata", db_form_data.form_id, id=id)
+        republish_latest(db, db_form_data.form_id)
         return None
     except SQLAlchemyError as e:
         db.rollback()
@@ -1,10 +1,14 @@
 from typing import List, Optional, Union
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import BaseModel, validator
-from ..database import SessionLocal
 from ..models.form import Form
+from ..storage.elements import pack_elements, remember_elements, load_element_lists
+from ..storage.facets import index_form_elements
+from ..storage.shards import ShardSessions, get_shards
+from ..services.events import event_hub
+from ..services.ratelimit import rate_limiter
 import json
 from sqlalchemy import func
 import uuid
@@ -12,13 +16,15 @@ from datetime import datetime
 
 router = APIRouter()
 
-# Add this dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def resolve_form_fields(db: Session, forms: List[Form]) -> List[Optional[list]]:
+    """
+    Return each form's fields, reassembling element store revisions with one batched lookup.
+    """
+    stored_fields = load_element_lists(db, [form.element_hashes for form in forms])
+    return [
+        form.form_data if fields is None else fields
+        for form, fields in zip(forms, stored_fields)
+    ]
 
 class FormFieldBase(BaseModel):
     id: str
@@ -63,23 +69,33 @@ class FormUpdateRequest(BaseModel):
         return v.strip()
 
 @router.post("/forms/auto-save", status_code=status.HTTP_201_CREATED)
-async def auto_save_form(form_data: FormCreateRequest, db: Session = Depends(get_db)):
+async def auto_save_form(form_data: FormCreateRequest, request: Request, shards: ShardSessions = Depends(get_shards)):
+    # Checked before touching the database, so a runaway client cannot drain the pool
+    await rate_limiter.check(request, "auto_save", user=str(form_data.user_id))
+    db = shards.for_user(form_data.user_id, writing=True)
     try:
         # Convert fields to dict for storage
         form_fields = [field.dict(exclude_unset=True) for field in form_data.fields]
 
-        # Create new form
-        db_form = Form(
-            form_name=form_data.form_name,
-            form_data=form_fields,
-            user_id=form_data.user_id,
-            updated_at=datetime.utcnow()
-        )
-
         try:
+            inline_fields, element_hashes = pack_elements(db, form_fields)
+
+            # Create new form
+            db_form = Form(
+                form_name=form_data.form_name,
+                form_data=inline_fields,
+                element_hashes=element_hashes,
+                user_id=form_data.user_id,
+                updated_at=datetime.utcnow()
+            )
+
             db.add(db_form)
+            db.flush()  # Assigns form_id
+            index_form_elements(db, "forms", db_form.form_id, db_form.user_id, form_fields)
             db.commit()
             db.refresh(db_form)
+            remember_elements(element_hashes, form_fields)
+            event_hub.publish(db_form.user_id, "form.created", "forms", db_form.form_id)
         except SQLAlchemyError as e:
             db.rollback()
             raise HTTPException(
@@ -92,7 +108,7 @@ async def auto_save_form(form_data: FormCreateRequest, db: Session = Depends(get
             "form_id": db_form.form_id,
             "form_name": db_form.form_name,
             "user_id": db_form.user_id,
-            "fields": db_form.form_data,
+            "fields": form_fields,
             "updated_at": db_form.updated_at.isoformat() if db_form.updated_at else None
         }
 
@@ -108,21 +124,38 @@ async def auto_save_form(form_data: FormCreateRequest, db: Session = Depends(get
         )
 
 @router.get("/forms/get-data")
-async def get_form_data(db: Session = Depends(get_db)):
+async def get_form_data(shards: ShardSessions = Depends(get_shards)):
     try:
-        forms = db.query(Form).all()
-        return forms
+        # Every user's forms, so every shard is asked
+        results = []
+        for index, db in enumerate(shards.all()):
+            forms = [form for form in db.query(Form).all() if shards.owns(index, form.user_id)]
+            results += [
+                {
+                    "form_id": form.form_id,
+                    "form_name": form.form_name,
+                    "form_data": fields,
+                    "user_id": form.user_id,
+                    "created_at": form.created_at,
+                    "updated_at": form.updated_at
+                }
+                for form, fields in zip(forms, resolve_form_fields(db, forms))
+            ]
+        return results
     except Exception as e:
         print(f"Error fetching form data: {e}")
-        db.rollback()  # Rollback the transaction
         raise HTTPException(status_code=500, detail="Error fetching form data from the database")
     finally:
-        db.close()  # Close the database connection
+        shards.close()  # Close the database connections
 
 @router.put("/forms/update", response_model=None)
-async def update_form(form_update: FormUpdateRequest, db: Session = Depends(get_db)):
+async def update_form(form_update: FormUpdateRequest, request: Request, shards: ShardSessions = Depends(get_shards)):
+    # The builder saves through both endpoints, so they share one budget
+    await rate_limiter.check(request, "auto_save", user=str(form_update.user_id))
     try:
-        db_form = db.query(Form).filter(Form.form_id == form_update.form_id).first()
+        db, db_form = shards.find(("forms.form_id", form_update.form_id), lambda db: (
+            db.query(Form).filter(Form.form_id == form_update.form_id).first()
+        ))
         if not db_form:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -135,17 +168,26 @@ async def update_form(form_update: FormUpdateRequest, db: Session = Depends(get_
                 detail="Not authorized to update this form"
             )
 
+        # Waits out a move of the owner's rows to another shard
+        shards.for_user(db_form.user_id, writing=True)
+
         # Convert fields to dict for storage
         form_fields = [field.dict(exclude_unset=True) for field in form_update.fields]
 
-        # Update form fields
-        db_form.form_name = form_update.form_name
-        db_form.form_data = form_fields
-        db_form.updated_at = datetime.utcnow()
-
         try:
+            inline_fields, element_hashes = pack_elements(db, form_fields)
+
+            # Update form fields
+            db_form.form_name = form_update.form_name
+            db_form.form_data = inline_fields
+            db_form.element_hashes = element_hashes
+            db_form.updated_at = datetime.utcnow()
+            index_form_elements(db, "forms", db_form.form_id, db_form.user_id, form_fields)
+
             db.commit()
             db.refresh(db_form)
+            remember_elements(element_hashes, form_fields)
+            event_hub.publish(db_form.user_id, "form.updated", "forms", db_form.form_id)
         except SQLAlchemyError as e:
             db.rollback()
             raise HTTPException(
@@ -159,7 +201,7 @@ async def update_form(form_update: FormUpdateRequest, db: Session = Depends(get_
             "form_name": db_form.form_name,
             "user_id": db_form.user_id,
             "updated_at": db_form.updated_at.isoformat() if db_form.updated_at else None,
-            "fields": db_form.form_data
+            "fields": form_fields
         }
 
     except HTTPException:
@@ -171,9 +213,9 @@ async def update_form(form_update: FormUpdateRequest, db: Session = Depends(get_
         )
 
 @router.get("/forms/{form_id}")
-async def get_form_by_id(form_id: int, db: Session = Depends(get_db)):
+async def get_form_by_id(form_id: int, shards: ShardSessions = Depends(get_shards)):
     try:
-        form = db.query(Form).filter(Form.form_id == form_id).first()
+        db, form = shards.find(("forms.form_id", form_id), lambda db: db.query(Form).filter(Form.form_id == form_id).first())
         if not form:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -183,7 +225,7 @@ async def get_form_by_id(form_id: int, db: Session = Depends(get_db)):
         return {
             "form_id": form.form_id,
             "form_name": form.form_name,
-            "fields": form.form_data,
+            "fields": resolve_form_fields(db, [form])[0],
             "user_id": form.user_id,
             "updated_at": form.updated_at.isoformat() if form.updated_at else None
         }
@@ -196,4 +238,4 @@ async def get_form_by_id(form_id: int, db: Session = Depends(get_db)):
             detail=f"Error fetching form: {str(e)}"
         )
     finally:
-        db.close()
\ No newline at end of file
+        shards.close()
\ No newline at end of file
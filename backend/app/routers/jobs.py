@@ -0,0 +1,82 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, List, Optional
+import hmac
+from ..config import settings
+from ..services.jobs import FINISHED, job_queue
+from .. import jobs  # noqa: F401, registers the job types
+
+router = APIRouter(tags=["Jobs"])
+
+STATUS_PATTERN = "^(queued|running|succeeded|failed|cancelled)$"
+
+class JobCreate(BaseModel):
+    job_type: str
+    payload: Dict[str, Any] = {}
+    max_attempts: Optional[int] = Field(None, ge=1, le=20)
+    delay_seconds: float = Field(0, ge=0)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Queuing and cancelling jobs touches every shard, so it needs JOBS_ADMIN_TOKEN in X-Admin-Token."""
+    if not settings.JOBS_ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Managing jobs over HTTP is disabled")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode("latin-1", "replace"),
+                                                        settings.JOBS_ADMIN_TOKEN.encode("latin-1")):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
+
+def get_job_or_404(job_id: int) -> Dict[str, Any]:
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+@router.get("/jobs/types", response_model=List[Dict[str, Any]])
+async def list_job_types():
+    """
+    The job types that can be queued, with their concurrency and default attempts.
+    """
+    return [
+        {"job_type": job_type.name, "concurrency": job_type.concurrency, "max_attempts": job_type.max_attempts}
+        for job_type in job_queue.job_types.values()
+    ]
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED, response_model=Dict[str, Any],
+             dependencies=[Depends(require_admin)])
+async def enqueue_job(job: JobCreate):
+    """
+    Queue a background job and return it right away; poll GET /jobs/{id} for its progress.
+    """
+    if job.job_type not in job_queue.job_types:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown job type {job.job_type}")
+    job_id = await run_in_threadpool(job_queue.enqueue, job.job_type, job.payload, job.max_attempts, job.delay_seconds)
+    return await run_in_threadpool(job_queue.get, job_id)
+
+@router.get("/jobs", response_model=List[Dict[str, Any]])
+async def list_jobs(
+    job_status: Optional[str] = Query(None, alias="status", pattern=STATUS_PATTERN),
+    job_type: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500)
+):
+    """
+    Recent jobs, newest first.
+    """
+    return await run_in_threadpool(job_queue.list, job_status, job_type, limit)
+
+@router.get("/jobs/{job_id}", response_model=Dict[str, Any])
+async def get_job(job_id: int):
+    """
+    A job's status, progress, attempts and, once finished, its result or error.
+    """
+    return await run_in_threadpool(get_job_or_404, job_id)
+
+@router.post("/jobs/{job_id}/cancel", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
+async def cancel_job(job_id: int):
+    """
+    Cancel a job. A queued job is cancelled at once; a running one stops at its next progress report.
+    """
+    job = await run_in_threadpool(get_job_or_404, job_id)
+    if job["status"] in FINISHED:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job already {job['status']}")
+    await run_in_threadpool(job_queue.cancel, job_id)
+    return await run_in_threadpool(job_queue.get, job_id)
@@ -0,0 +1,101 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from typing import List, Dict, Any
+from ..services.publisher import publisher
+from ..storage.shards import ShardSessions, get_shards
+from .formdata import latest_form_data, serialize_form_data
+
+router = APIRouter(tags=["Publish"])
+
+# Bundle names contain a hash of their content, so they can be cached forever
+BUNDLE_MAX_AGE = 31536000
+
+def _published_urls(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **entry,
+        "page_url": f"/api/published/forms/{entry['form_id']}",
+        "html_url": f"/api/published/bundles/{entry['html']}",
+        "json_url": f"/api/published/bundles/{entry['json']}",
+    }
+
+def _bundle_response(request: Request, name: str, cache_control: str) -> Response:
+    content = publisher.read_bundle(name)
+    if content is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Published bundle {name} not found"
+        )
+
+    etag = f'"{name}"'
+    headers = {"Cache-Control": cache_control, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    media_type = "text/html" if name.endswith(".html") else "application/json"
+    return Response(content=content, media_type=media_type, headers=headers)
+
+def _entry_or_404(form_id: int) -> Dict[str, Any]:
+    entry = publisher.get_entry(form_id)
+    if entry is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Form {form_id} is not published"
+        )
+    return entry
+
+@router.post("/publish/forms/{form_id}", status_code=status.HTTP_201_CREATED)
+async def publish_form(form_id: int, shards: ShardSessions = Depends(get_shards)):
+    """
+    Render the latest version of a form into static bundles and publish it.
+    The form is re-rendered automatically whenever it is saved again.
+    """
+    db, form_data = shards.find(("formdata.form_id", form_id), lambda db: latest_form_data(db, form_id))
+    if not form_data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Form data with ID {form_id} not found"
+        )
+
+    entry = publisher.publish(serialize_form_data(db, [form_data])[0])
+    return _published_urls(entry)
+
+@router.delete("/publish/forms/{form_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def unpublish_form(form_id: int):
+    """
+    Stop serving a published form and remove its bundles.
+    """
+    if not publisher.unpublish(form_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Form {form_id} is not published"
+        )
+    return None
+
+@router.get("/publish/forms", response_model=List[Dict[str, Any]])
+async def list_published_forms():
+    """
+    List published forms and their bundle URLs.
+    """
+    return [_published_urls(entry) for entry in publisher.list_published()]
+
+@router.get("/published/forms/{form_id}")
+async def get_published_form_page(form_id: int, request: Request):
+    """
+    Serve the published HTML page of a form without touching the database.
+    """
+    entry = _entry_or_404(form_id)
+    return _bundle_response(request, entry["html"], "no-cache")
+
+@router.get("/published/forms/{form_id}/data")
+async def get_published_form_data(form_id: int, request: Request):
+    """
+    Serve the published JSON bundle of a form without touching the database.
+    """
+    entry = _entry_or_404(form_id)
+    return _bundle_response(request, entry["json"], "no-cache")
+
+@router.get("/published/bundles/{name}")
+async def get_published_bundle(name: str, request: Request):
+    """
+    Serve a published bundle by its content-hashed name.
+    """
+    return _bundle_response(request, name, f"public, max-age={BUNDLE_MAX_AGE}, immutable")
@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from typing import List, Dict, Any
+from ..models.revision import FormRevision
+from ..storage.revisions import list_revisions, get_revision_state, describe_diff
+from ..storage.shards import ShardSessions, get_shards
+
+router = APIRouter(tags=["Revisions"])
+
+def _revision_shard(shards: ShardSessions, form_id: int) -> Session:
+    """The session of the shard holding a form's history."""
+    db, _ = shards.find(("form_revisions.form_id", form_id), lambda db: (
+        db.query(FormRevision.user_id).filter(FormRevision.form_id == form_id).first()
+    ))
+    return db
+
+def _get_state_or_404(db: Session, form_id: int, version: int) -> Dict[str, Any]:
+    state = get_revision_state(db, form_id, version)
+    if state is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Version {version} of form {form_id} not found"
+        )
+    return state
+
+@router.get("/forms/{form_id}/revisions", response_model=List[Dict[str, Any]])
+async def get_form_revisions(form_id: int, shards: ShardSessions = Depends(get_shards)):
+    """
+    List the revisions of a form.
+    """
+    return list_revisions(_revision_shard(shards, form_id), form_id)
+
+@router.get("/forms/{form_id}/revisions/diff")
+async def diff_form_revisions(
+    form_id: int,
+    from_version: int = Query(..., ge=1),
+    to_version: int = Query(..., ge=1),
+    shards: ShardSessions = Depends(get_shards)
+):
+    """
+    Diff two versions of a form.
+    Each side is rebuilt from its nearest snapshot, never from the start of the history.
+    """
+    db = _revision_shard(shards, form_id)
+    old_state = _get_state_or_404(db, form_id, from_version)
+    new_state = _get_state_or_404(db, form_id, to_version)
+
+    return {
+        "form_id": form_id,
+        "from_version": from_version,
+        "to_version": to_version,
+        **describe_diff(old_state, new_state)
+    }
+
+@router.get("/forms/{form_id}/revisions/{version}")
+async def get_form_revision(form_id: int, version: int, shards: ShardSessions = Depends(get_shards)):
+    """
+    Get a form as it was at a given version.
+    """
+    state = _get_state_or_404(_revision_shard(shards, form_id), form_id, version)
+    return {"form_id": form_id, "version": version, **state}
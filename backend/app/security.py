@@ -0,0 +1,79 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+from .config import settings
+from .services.metrics import metrics
+
+# passlib/bcrypt and jose are imported on first use rather than at import time,
+# so worker startup does not pay for them until a request needs them
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """Return the shared password hashing context."""
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def warm_up():
+    """Build the hashing context and load the bcrypt backend ahead of the first login."""
+    get_pwd_context().handler("bcrypt").get_backend()
+
+def hash_password(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+# bcrypt is deliberately slow; async handlers hash on this dedicated pool so they
+# neither block the event loop nor starve the threadpool that serves DB work
+_bcrypt_executor = ThreadPoolExecutor(max_workers=settings.BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
+class _BcryptQueue:
+    """Counts hashing jobs waiting for a bcrypt thread and currently running on one."""
+
+    def __init__(self):
+        self.waiting = 0
+        self.running = 0
+
+    def run(self, func: Callable, *args):
+        self.waiting -= 1
+        self.running += 1
+        try:
+            return func(*args)
+        finally:
+            self.running -= 1
+
+bcrypt_queue = _BcryptQueue()
+metrics.register_gauge("bcrypt_queue_depth", "Password hashing jobs waiting for a bcrypt thread.", lambda: max(bcrypt_queue.waiting, 0))
+metrics.register_gauge("bcrypt_running", "Password hashing jobs currently running.", lambda: bcrypt_queue.running)
+
+async def _run_bcrypt(func: Callable, *args):
+    # waiting is incremented on the loop thread and decremented on a bcrypt thread;
+    # the counters are approximate under contention, which is fine for a gauge
+    bcrypt_queue.waiting += 1
+    return await asyncio.get_running_loop().run_in_executor(_bcrypt_executor, bcrypt_queue.run, func, *args)
+
+async def hash_password_async(password: str) -> str:
+    return await _run_bcrypt(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_bcrypt(verify_password, plain_password, hashed_password)
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    from jose import jwt
+
+    to_encode = data.copy()
+    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
+    to_encode.update({"exp": expire})
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+def decode_access_token(token: str) -> Dict[str, Any]:
+    """Decode and verify a JWT, raising ValueError if it is invalid or expired."""
+    from jose import jwt, JWTError
+
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError as e:
+        raise ValueError(str(e))
@@ -0,0 +1,292 @@
+"""
+Collaborative editing of builder forms over WebSockets.
+
+Editors of a form connect to /api/collab/forms/{form_id} and send element-level
+operations instead of the whole form. The worker applies them in arrival order,
+numbers them with the session's version, acknowledges them to the sender and
+broadcasts them to the other editors, so each edit costs about its own size on
+the wire. The form is written back to the forms table every
+COLLAB_FLUSH_INTERVAL_SECONDS, once for all operations since the last write,
+when the last editor leaves, and when the worker shuts down.
+
+A session belongs to one worker process. Before writing, a flush reads the
+form's current fields; if they changed since the session last wrote them (a
+REST save, or editors of the same form on another worker), the pending
+operations are replayed on top of them and the editors get a fresh snapshot.
+Idle sessions make the same check every interval, so every editor converges
+within one interval.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import copy
+from datetime import datetime
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from starlette.websockets import WebSocket
+
+from ..config import settings
+from ..models.form import Form, FormField
+from ..storage.elements import load_element_lists, pack_elements, remember_elements
+from ..storage.facets import index_form_elements
+from ..storage.shards import ShardSessions
+from .events import event_hub
+from .metrics import metrics
+
+OPERATIONS = ("add", "update", "style", "delete", "reorder")
+# Keys each operation may change; "id" is never changeable
+UPDATABLE_KEYS = ("label", "type", "required", "options", "placeholder", "caption", "value")
+STYLE_KEYS = ("size", "layout")
+SIZES = ("small", "normal", "large")
+
+class OperationRejected(Exception):
+    """An operation that does not apply to the form's current fields; the sender is told why."""
+
+def _position(fields: List[Dict[str, Any]], field_id: Any) -> int:
+    for index, field in enumerate(fields):
+        if field.get("id") == field_id:
+            return index
+    raise OperationRejected(f"No field with id {field_id}")
+
+def _validated(field: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        FormField(**field)
+    except ValidationError as e:
+        raise OperationRejected(f"Invalid field: {e.errors()[0]['msg']}")
+    return field
+
+def apply_operation(fields: List[Dict[str, Any]], operation: Dict[str, Any]):
+    """Apply one operation to a list of fields in place, or raise OperationRejected leaving it unchanged."""
+    kind = operation.get("op")
+    if kind == "add":
+        field = _validated(dict(operation.get("field") or {}))
+        if any(existing.get("id") == field["id"] for existing in fields):
+            raise OperationRejected(f"A field with id {field['id']} already exists")
+        index = operation.get("index")
+        fields.insert(len(fields) if index is None else index, field)
+    elif kind in ("update", "style"):
+        index = _position(fields, operation.get("id"))
+        changes = operation.get("changes") or {}
+        allowed = UPDATABLE_KEYS if kind == "update" else STYLE_KEYS
+        refused = [key for key in changes if key not in allowed]
+        if refused:
+            raise OperationRejected(f"{kind} cannot change {', '.join(refused)}")
+        if kind == "style" and changes.get("size", "normal") not in SIZES:
+            raise OperationRejected(f"size must be one of {', '.join(SIZES)}")
+        fields[index] = _validated({**fields[index], **changes})
+    elif kind == "delete":
+        index = _position(fields, operation.get("id"))
+        if len(fields) == 1:
+            raise OperationRejected("A form needs at least one field")
+        del fields[index]
+    elif kind == "reorder":
+        index = _position(fields, operation.get("id"))
+        target = operation.get("index")
+        if target is None:
+            raise OperationRejected("reorder needs the new index")
+        fields.insert(min(max(target, 0), len(fields) - 1), fields.pop(index))
+    else:
+        raise OperationRejected(f"Unknown operation {kind}")
+
+class FormSession:
+    """The fields of one form as its connected editors see them in this worker."""
+
+    def __init__(self, form_id: int, user_id: int, form_name: str, fields: List[Dict[str, Any]]):
+        self.form_id = form_id
+        self.user_id = user_id
+        self.form_name = form_name
+        self.fields = fields
+        self.saved_fields = copy.deepcopy(fields)  # As last read from or written to the database
+        self.pending: List[Dict[str, Any]] = []  # Operations applied since saved_fields
+        self.version = 0
+        self.editors: Dict[WebSocket, int] = {}
+        self.lock = asyncio.Lock()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "type": "snapshot",
+            "form_id": self.form_id,
+            "form_name": self.form_name,
+            "version": self.version,
+            "fields": self.fields,
+            "editors": len(self.editors),
+        }
+
+    async def send(self, message: Dict[str, Any], skip: Optional[WebSocket] = None):
+        for websocket in list(self.editors):
+            if websocket is skip:
+                continue
+            try:
+                await websocket.send_json(message)
+            except Exception:
+                # The editor's receive loop notices the closed connection and leaves
+                pass
+
+def _load_form(form_id: int) -> Optional[Tuple[int, str, List[Dict[str, Any]]]]:
+    shards = ShardSessions()
+    try:
+        db, form = shards.find(("forms.form_id", form_id), lambda db: db.query(Form).filter(Form.form_id == form_id).first())
+        if form is None:
+            return None
+        fields = load_element_lists(db, [form.element_hashes])[0]
+        return form.user_id, form.form_name, form.form_data if fields is None else fields
+    finally:
+        shards.close()
+
+def _write_form(session: FormSession, pending: List[Dict[str, Any]], fields: List[Dict[str, Any]],
+                saved: List[Dict[str, Any]]) -> Tuple[Optional[List[Dict[str, Any]]], bool]:
+    """
+    Write fields unless they are already stored; returns (stored fields, whether they changed elsewhere),
+    or (None, False) once the form is gone.
+    """
+    shards = ShardSessions()
+    try:
+        # Raises 503 while the owner's forms move to another shard; the flush is retried next interval
+        db = shards.for_user(session.user_id, writing=bool(pending))
+        query = db.query(Form).filter(Form.form_id == session.form_id)
+        form = (query.with_for_update() if pending else query).first()
+        if form is None:
+            return None, False
+        stored = load_element_lists(db, [form.element_hashes])[0]
+        current = form.form_data if stored is None else stored
+        changed_elsewhere = current != saved
+        if changed_elsewhere:
+            fields = copy.deepcopy(current)
+            for operation in pending:
+                try:
+                    apply_operation(fields, operation)
+                except OperationRejected:
+                    pass
+        if fields == current:
+            db.rollback()
+            return current, changed_elsewhere
+
+        inline_fields, element_hashes = pack_elements(db, fields)
+        form.form_data = inline_fields
+        form.element_hashes = element_hashes
+        form.updated_at = datetime.utcnow()
+        index_form_elements(db, "forms", form.form_id, form.user_id, fields)
+        db.commit()
+        remember_elements(element_hashes, fields)
+        event_hub.publish(form.user_id, "form.updated", "forms", form.form_id)
+        return fields, changed_elsewhere
+    finally:
+        shards.close()
+
+class CollabHub:
+    """The editing sessions of this worker, by form_id."""
+
+    def __init__(self):
+        self.sessions: Dict[int, FormSession] = {}
+        self._opening: Dict[int, asyncio.Lock] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def join(self, form_id: int, user_id: int, websocket: WebSocket) -> FormSession:
+        """Add an editor to the form's session, opening it if needed. Raises HTTPException for unknown or foreign forms."""
+        async with self._opening.setdefault(form_id, asyncio.Lock()):
+            session = self.sessions.get(form_id)
+            if session is None:
+                loaded = await run_in_threadpool(_load_form, form_id)
+                if loaded is None:
+                    raise HTTPException(status_code=404, detail=f"Form with ID {form_id} not found")
+                session = FormSession(form_id, *loaded)
+            if session.user_id != user_id:
+                raise HTTPException(status_code=403, detail="Not authorized to edit this form")
+            self.sessions[form_id] = session
+            session.editors[websocket] = user_id
+        return session
+
+    async def leave(self, session: FormSession, websocket: WebSocket):
+        session.editors.pop(websocket, None)
+        if session.editors:
+            await session.send({"type": "editors", "editors": len(session.editors)})
+            return
+        await self.flush(session)
+        if not session.editors and self.sessions.get(session.form_id) is session:
+            del self.sessions[session.form_id]
+
+    async def apply(self, session: FormSession, websocket: WebSocket, operation: Dict[str, Any]):
+        """Apply an editor's operation, acknowledge it and broadcast it to the other editors."""
+        op_id = operation.pop("op_id", None)
+        async with session.lock:
+            try:
+                apply_operation(session.fields, operation)
+            except OperationRejected as e:
+                await websocket.send_json({"type": "rejected", "op_id": op_id, "detail": str(e), "version": session.version})
+                return
+            session.pending.append(operation)
+            session.version += 1
+            version = session.version
+        await websocket.send_json({"type": "ack", "op_id": op_id, "version": version})
+        await session.send({"type": "op", "version": version, "user_id": session.editors.get(websocket), "op": operation},
+                           skip=websocket)
+
+    async def flush(self, session: FormSession):
+        """Write the session's pending operations, or pick up changes made elsewhere."""
+        async with session.lock:
+            pending, session.pending = session.pending, []
+            fields, saved = copy.deepcopy(session.fields), session.saved_fields
+        try:
+            stored, changed_elsewhere = await run_in_threadpool(_write_form, session, pending, fields, saved)
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else e
+            print(f"Error saving collaborative edits of form {session.form_id}: {detail}")
+            async with session.lock:
+                session.pending = pending + session.pending
+            return
+
+        async with session.lock:
+            if stored is None:
+                for websocket in list(session.editors):
+                    await websocket.close(code=4404, reason="Form deleted")
+                session.editors.clear()
+                self.sessions.pop(session.form_id, None)
+                return
+            session.saved_fields = copy.deepcopy(stored)
+            if changed_elsewhere:
+                # Operations that arrived during the write go on top of the merged fields
+                session.fields = copy.deepcopy(stored)
+                for operation in session.pending:
+                    try:
+                        apply_operation(session.fields, operation)
+                    except OperationRejected:
+                        pass
+                session.version += 1
+                await session.send(session.snapshot())
+
+    async def flush_all(self):
+        for session in list(self.sessions.values()):
+            await self.flush(session)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(settings.COLLAB_FLUSH_INTERVAL_SECONDS)
+            try:
+                await self.flush_all()
+            except Exception as e:
+                print(f"Error flushing collaborative edits: {e}")
+
+    def start(self):
+        """Start this worker's flush loop; called from the lifespan hook."""
+        self._task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        """Save every session and disconnect its editors, who reconnect to another worker."""
+        if self._task is not None:
+            self._task.cancel()
+        await self.flush_all()
+        for session in list(self.sessions.values()):
+            for websocket in list(session.editors):
+                try:
+                    await websocket.close(code=1012, reason="Server restarting")
+                except Exception:
+                    pass
+
+collab_hub = CollabHub()
+
+metrics.register_gauge("collab_sessions", "Forms with collaborative editors in this worker.", lambda: len(collab_hub.sessions))
+metrics.register_gauge(
+    "collab_editors", "Collaborative editors connected to this worker.",
+    lambda: sum(len(session.editors) for session in collab_hub.sessions.values())
+)
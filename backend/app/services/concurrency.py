@@ -0,0 +1,186 @@
+"""
+Adaptive concurrency limiting with priority queues and fast load shedding.
+
+The limit on concurrently executing DB-backed requests follows a gradient
+algorithm: it shrinks while the short-term average latency rises above the
+long-term average (requests are queueing somewhere, usually on the connection
+pool) and grows again while latency holds steady. Requests over the limit wait
+in one queue per priority class and are answered with 503 as soon as their
+expected wait exceeds the class's budget, rather than piling onto the pool.
+
+All state is touched from the event loop thread only, so no locking is needed.
+"""
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+import asyncio
+import json
+import math
+import time
+
+from ..config import settings
+from .metrics import metrics
+
+# Priority classes, most important first
+SAVE, LISTING, INTROSPECTION = 0, 1, 2
+PRIORITY_NAMES = ("save", "listing", "introspection")
+
+_WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# (path prefix, priority for writes, priority for reads); first match wins.
+# Paths that match nothing (health, metrics, docs) are never limited.
+ROUTE_CLASSES: List[Tuple[str, int, int]] = [
+    ("/api/query/", INTROSPECTION, INTROSPECTION),
+    ("/api/auth", SAVE, SAVE),
+    ("/api/forms", SAVE, LISTING),
+    ("/api/formdata/", SAVE, LISTING),
+    ("/api/themes", SAVE, LISTING),
+    ("/api/publish", SAVE, LISTING),
+    ("/api/facets", LISTING, LISTING),
+]
+
+def classify(method: str, path: str) -> Optional[int]:
+    for prefix, write_priority, read_priority in ROUTE_CLASSES:
+        if path.startswith(prefix):
+            return write_priority if method in _WRITE_METHODS else read_priority
+    return None
+
+class AdaptiveLimiter:
+    def __init__(self, initial_limit: float, min_limit: float, max_limit: float,
+                 queue_timeouts: Tuple[float, ...], max_queue: int):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_timeouts = queue_timeouts
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._waiters: List[Deque[asyncio.Future]] = [deque() for _ in PRIORITY_NAMES]
+        # Latency averages in seconds; None until the first sample
+        self.short_latency: Optional[float] = None
+        self.long_latency: Optional[float] = None
+
+    @property
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters)
+
+    def _expected_wait(self, priority: int) -> float:
+        """Rough time until a new request of this priority would start."""
+        ahead = sum(len(waiters) for waiters in self._waiters[:priority + 1])
+        return (ahead + 1) * (self.short_latency or 0.0) / max(self.limit, 1.0)
+
+    async def acquire(self, priority: int) -> bool:
+        """Wait for a slot. Returns False when the request should be shed instead."""
+        ahead = sum(len(waiters) for waiters in self._waiters[:priority + 1])
+        if ahead == 0 and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+
+        timeout = self.queue_timeouts[priority]
+        if ahead >= self.max_queue or self._expected_wait(priority) > timeout:
+            self._shed(priority)
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        try:
+            # _dispatch() counts the slot as taken before it resolves the future
+            return await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self._shed(priority)
+            return False
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self._waiters[priority].remove(waiter)
+                except ValueError:
+                    pass
+
+    def _shed(self, priority: int):
+        name = PRIORITY_NAMES[priority]
+        metrics.load_shed[name] = metrics.load_shed.get(name, 0) + 1
+
+    def release(self, latency: Optional[float]):
+        """Free a slot, feeding the request's latency to the limit (None for requests that failed early)."""
+        self.in_flight -= 1
+        if latency is not None:
+            self._update_limit(latency)
+        self._dispatch()
+
+    def _update_limit(self, latency: float):
+        if self.short_latency is None:
+            self.short_latency = self.long_latency = latency
+            return
+        self.short_latency += (latency - self.short_latency) * 0.1
+        self.long_latency += (latency - self.long_latency) * 0.01
+        # After a sustained shift the long-term average lags far behind; let it catch up
+        if self.long_latency > self.short_latency * 2:
+            self.long_latency *= 0.95
+
+        # 1.0 while latency is steady, down to 0.5 as requests start queueing
+        gradient = max(0.5, min(1.0, settings.CONCURRENCY_TOLERANCE * self.long_latency / self.short_latency))
+        new_limit = self.limit * gradient + math.sqrt(self.limit)
+        # Only grow when the current limit is actually being used
+        if new_limit > self.limit and self.in_flight < self.limit / 2:
+            return
+        self.limit = max(self.min_limit, min(self.max_limit, self.limit * 0.8 + new_limit * 0.2))
+
+    def _dispatch(self):
+        for waiters in self._waiters:
+            while waiters and self.in_flight < int(self.limit):
+                waiter = waiters.popleft()
+                if waiter.done():
+                    continue
+                self.in_flight += 1
+                waiter.set_result(True)
+            if waiters:
+                return
+
+limiter = AdaptiveLimiter(
+    settings.CONCURRENCY_INITIAL_LIMIT,
+    settings.CONCURRENCY_MIN_LIMIT,
+    settings.CONCURRENCY_MAX_LIMIT,
+    (
+        settings.CONCURRENCY_QUEUE_TIMEOUT_SAVE_MS / 1000,
+        settings.CONCURRENCY_QUEUE_TIMEOUT_LISTING_MS / 1000,
+        settings.CONCURRENCY_QUEUE_TIMEOUT_INTROSPECTION_MS / 1000,
+    ),
+    settings.CONCURRENCY_MAX_QUEUE,
+)
+metrics.register_gauge("concurrency_limit", "Current adaptive limit on concurrent DB-backed requests.", lambda: round(limiter.limit, 2))
+metrics.register_gauge("concurrency_in_flight", "DB-backed requests currently executing.", lambda: limiter.in_flight)
+metrics.register_gauge("concurrency_queued", "DB-backed requests waiting for a slot.", lambda: limiter.queued)
+
+_OVERLOADED_BODY = json.dumps({"detail": "Server is busy, please retry shortly"}).encode("utf-8")
+
+class ConcurrencyLimitMiddleware:
+    """Pure ASGI middleware admitting DB-backed requests through the adaptive limiter."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        priority = classify(scope["method"], scope["path"])
+        if priority is None:
+            return await self.app(scope, receive, send)
+
+        if not await limiter.acquire(priority):
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(_OVERLOADED_BODY)).encode("latin-1")),
+                    (b"retry-after", b"1"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": _OVERLOADED_BODY})
+            return
+
+        latency = None
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+            latency = time.perf_counter() - start
+        finally:
+            limiter.release(latency)
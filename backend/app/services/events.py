@@ -0,0 +1,188 @@
+"""
+Change events for a user's forms, pushed to clients over Server-Sent Events.
+
+The write paths publish an event after every commit that creates, updates or
+deletes a form or form data row. Events are appended to a small SQLite log
+(EVENTS_DB_PATH) shared by the workers on this host, which gives them one
+increasing id sequence: a client can resume from its Last-Event-ID on any
+worker, and sees writes served by every worker. Each worker tails the log and
+hands new events to its subscribers' queues in memory; a local publish wakes
+the tailer at once, others are picked up within EVENTS_POLL_INTERVAL_SECONDS.
+The log keeps EVENTS_RETENTION_SECONDS of events. A client resuming from
+further back gets a "reset" event and should refetch its forms once.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+from .metrics import metrics
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_events_user_id ON events (user_id, id);
+"""
+
+def _close(queue: asyncio.Queue):
+    """End a stream; events it had not sent yet are replayed when the client resumes."""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(None)
+
+class EventHub:
+    def __init__(self):
+        self._local = threading.local()
+        self._schema_ready = False
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._last_id: Optional[int] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self.closing = False
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(settings.EVENTS_DB_PATH, isolation_level=None, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            if not self._schema_ready:
+                connection.executescript(_SCHEMA)
+                self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    def publish(self, user_id: int, event: str, source: str, form_id: int, **data: Any):
+        """
+        Record that a form changed; call after the change is committed. Failures are logged,
+        never raised, so a write never fails because of its event.
+        """
+        payload = {"source": source, "form_id": form_id, **data, "at": datetime.utcnow().isoformat()}
+        try:
+            self._connect().execute(
+                "INSERT INTO events (user_id, event, data, created_at) VALUES (?, ?, ?, ?)",
+                (user_id, event, json.dumps(payload, default=str), time.time())
+            )
+        except sqlite3.Error as e:
+            print(f"Error publishing {event} of {source} {form_id}: {e}")
+            return
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def since(self, user_id: int, last_id: int) -> Optional[List[Tuple[int, str, str]]]:
+        """A user's events after last_id, oldest first, or None when the log no longer reaches back that far."""
+        connection = self._connect()
+        (oldest,) = connection.execute("SELECT MIN(id) FROM events").fetchone()
+        latest = self.latest_id()
+        first_kept = latest + 1 if oldest is None else oldest
+        if last_id + 1 < first_kept or last_id > latest:
+            return None
+        return connection.execute(
+            "SELECT id, event, data FROM events WHERE user_id = ? AND id > ? ORDER BY id", (user_id, last_id)
+        ).fetchall()
+
+    def latest_id(self) -> int:
+        """The id of the newest event ever published, including pruned ones."""
+        (latest,) = self._connect().execute("SELECT seq FROM sqlite_sequence WHERE name = 'events'").fetchone() or (0,)
+        return latest
+
+    def _read_new(self, after: int) -> List[Tuple[int, int, str, str]]:
+        return self._connect().execute(
+            "SELECT id, user_id, event, data FROM events WHERE id > ? ORDER BY id LIMIT 1000", (after,)
+        ).fetchall()
+
+    def _prune(self):
+        self._connect().execute("DELETE FROM events WHERE created_at < ?", (time.time() - settings.EVENTS_RETENTION_SECONDS,))
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.EVENTS_SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def _dispatch(self, rows: List[Tuple[int, int, str, str]]):
+        for event_id, user_id, event, data in rows:
+            for queue in list(self._subscribers.get(user_id, ())):
+                try:
+                    queue.put_nowait((event_id, event, data))
+                except asyncio.QueueFull:
+                    # A stalled client; it resumes from its Last-Event-ID after reconnecting
+                    self.unsubscribe(user_id, queue)
+                    _close(queue)
+
+    async def _tail(self):
+        last_pruned = 0.0
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.EVENTS_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                if self._last_id is None:
+                    self._last_id = await run_in_threadpool(self.latest_id)
+                while True:
+                    rows = await run_in_threadpool(self._read_new, self._last_id)
+                    if not rows:
+                        break
+                    self._last_id = rows[-1][0]
+                    self._dispatch(rows)
+                if time.time() - last_pruned > 60:
+                    await run_in_threadpool(self._prune)
+                    last_pruned = time.time()
+            except Exception as e:
+                print(f"Error reading the event log: {e}")
+
+    async def start(self):
+        """Start this worker's tailer from the newest event; called from the lifespan hook."""
+        self.closing = False
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        try:
+            self._last_id = await run_in_threadpool(self.latest_id)
+        except sqlite3.Error as e:
+            print(f"Error opening the event log: {e}")
+            self._last_id = None
+        self._task = asyncio.create_task(self._tail())
+
+    def close_streams(self):
+        """
+        End every open stream, and any opened from now on; clients reconnect elsewhere with their
+        Last-Event-ID. Called as soon as the worker starts draining, since the server waits for
+        open responses before running the shutdown hooks.
+        """
+        self.closing = True
+        for queues in list(self._subscribers.values()):
+            for queue in list(queues):
+                _close(queue)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        self.close_streams()
+        self._loop = None
+
+event_hub = EventHub()
+
+metrics.register_gauge(
+    "event_subscribers", "Change feed streams open on this worker.",
+    lambda: sum(len(queues) for queues in event_hub._subscribers.values())
+)
@@ -0,0 +1,336 @@
+"""
+Durable background jobs.
+
+Jobs are rows in a local SQLite file (JOBS_DB_PATH) shared by the workers on
+this host, so queued work survives restarts and deploys. Request handlers call
+job_queue.enqueue() and return right away. Every worker process runs a runner
+that claims due jobs and executes them on its own threads (JOBS_WORKER_THREADS).
+A job type's registered concurrency caps how many of its jobs run at once
+across all workers; claims take SQLite's write lock, so two workers never claim
+the same job or exceed the cap.
+
+A job that raises is retried after an exponential backoff until it has used its
+attempts, unless it raised JobError. Handlers report progress through their JobContext, which is also where
+cancellation and worker shutdown are noticed. Each runner keeps the heartbeat of
+its jobs fresh; a job whose worker died is claimed again once its heartbeat is
+older than JOBS_STALE_SECONDS.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+from .metrics import metrics
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_type TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_after REAL NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    progress_message TEXT,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status_run_after ON jobs (status, run_after);
+"""
+
+class JobError(Exception):
+    """Raised by a handler for a failure that retrying cannot fix, such as an invalid payload."""
+
+class JobCancelled(Exception):
+    """Raised by JobContext.progress() when the job has been cancelled."""
+
+class JobInterrupted(Exception):
+    """Raised by JobContext.progress() when the worker shuts down; the job is queued again."""
+
+class JobType(NamedTuple):
+    name: str
+    handler: Callable[["JobContext", Dict[str, Any]], Any]
+    concurrency: int
+    max_attempts: int
+
+class JobContext:
+    """Passed to a job's handler, which should call progress() between units of work."""
+
+    def __init__(self, queue: "JobQueue", job_id: int, attempt: int):
+        self.queue = queue
+        self.job_id = job_id
+        self.attempt = attempt
+
+    def progress(self, fraction: float, message: Optional[str] = None):
+        """Record progress (0 to 1). Raises JobCancelled or JobInterrupted when the job should stop."""
+        if self.queue.report_progress(self.job_id, min(max(fraction, 0.0), 1.0), message):
+            raise JobCancelled()
+        if self.queue.stopping:
+            raise JobInterrupted()
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(value).isoformat() if value is not None else None
+
+def _job_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "job_type": row["job_type"],
+        "status": row["status"],
+        "payload": json.loads(row["payload"]),
+        "attempts": row["attempts"],
+        "max_attempts": row["max_attempts"],
+        "progress": row["progress"],
+        "progress_message": row["progress_message"],
+        "result": json.loads(row["result"]) if row["result"] is not None else None,
+        "error": row["error"],
+        "cancel_requested": bool(row["cancel_requested"]),
+        "created_at": _timestamp(row["created_at"]),
+        "run_after": _timestamp(row["run_after"]),
+        "started_at": _timestamp(row["started_at"]),
+        "finished_at": _timestamp(row["finished_at"]),
+    }
+
+class JobQueue:
+    def __init__(self):
+        self.job_types: Dict[str, JobType] = {}
+        self.stopping = False
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._local = threading.local()
+        self._schema_ready = False
+        self._running: Dict[int, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, concurrency: int = 1, max_attempts: int = 3):
+        """Decorator registering handler(context, payload) as a job type; its return value is the job's result."""
+        def decorator(handler):
+            self.job_types[name] = JobType(name, handler, concurrency, max_attempts)
+            return handler
+        return decorator
+
+    def _connect(self) -> sqlite3.Connection:
+        """This thread's connection; transactions are explicit (autocommit otherwise)."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(settings.JOBS_DB_PATH, isolation_level=None, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            if not self._schema_ready:
+                connection.executescript(_SCHEMA)
+                self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    def enqueue(self, job_type: str, payload: Optional[Dict[str, Any]] = None, max_attempts: Optional[int] = None,
+                delay_seconds: float = 0) -> int:
+        """Queue a job and return its id. Cheap enough to call from a request handler."""
+        if job_type not in self.job_types:
+            raise ValueError(f"Unknown job type {job_type!r}")
+        now = time.time()
+        cursor = self._connect().execute(
+            "INSERT INTO jobs (job_type, payload, status, max_attempts, run_after, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_type, json.dumps(payload or {}), QUEUED,
+             max_attempts or self.job_types[job_type].max_attempts, now + delay_seconds, now)
+        )
+        return cursor.lastrowid
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_dict(row) if row else None
+
+    def list(self, status: Optional[str] = None, job_type: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """The newest jobs first."""
+        conditions, parameters = [], []
+        if status is not None:
+            conditions.append("status = ?")
+            parameters.append(status)
+        if job_type is not None:
+            conditions.append("job_type = ?")
+            parameters.append(job_type)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._connect().execute(f"SELECT * FROM jobs {where} ORDER BY id DESC LIMIT ?", (*parameters, limit))
+        return [_job_dict(row) for row in rows]
+
+    def cancel(self, job_id: int):
+        """A queued job is cancelled at once, a running one when its handler next reports progress."""
+        connection = self._connect()
+        cancelled = connection.execute(
+            "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+            (CANCELLED, time.time(), job_id, QUEUED)
+        ).rowcount
+        if not cancelled:
+            connection.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+
+    def report_progress(self, job_id: int, fraction: float, message: Optional[str]) -> bool:
+        """Store progress and refresh the heartbeat; returns whether cancellation was requested."""
+        connection = self._connect()
+        connection.execute(
+            "UPDATE jobs SET progress = ?, progress_message = COALESCE(?, progress_message), heartbeat_at = ? "
+            "WHERE id = ? AND worker = ?",
+            (fraction, message, time.time(), job_id, self.worker_id)
+        )
+        row = connection.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def _requeue_stale(self, connection: sqlite3.Connection, now: float):
+        """Jobs whose worker stopped sending heartbeats count as a failed attempt."""
+        stale_before = now - settings.JOBS_STALE_SECONDS
+        for row in connection.execute(
+            "SELECT id, job_type, attempts, max_attempts, worker FROM jobs WHERE status = ? AND heartbeat_at < ?",
+            (RUNNING, stale_before)
+        ).fetchall():
+            print(f"Job {row['id']} ({row['job_type']}) lost its worker {row['worker']}")
+            if row["attempts"] < row["max_attempts"]:
+                connection.execute("UPDATE jobs SET status = ?, run_after = ?, worker = NULL WHERE id = ?", (QUEUED, now, row["id"]))
+            else:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                    (FAILED, "The worker running the job stopped responding", now, row["id"])
+                )
+
+    def claim(self, slots: int) -> List[sqlite3.Row]:
+        """Mark up to slots due jobs as running on this worker, within each type's concurrency."""
+        now = time.time()
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._requeue_stale(connection, now)
+            running = dict(connection.execute(
+                "SELECT job_type, COUNT(*) FROM jobs WHERE status = ? GROUP BY job_type", (RUNNING,)
+            ).fetchall())
+            free = {name: job_type.concurrency - running.get(name, 0) for name, job_type in self.job_types.items()}
+            candidates = [name for name, count in free.items() if count > 0]
+
+            claimed = []
+            if candidates:
+                rows = connection.execute(
+                    f"SELECT * FROM jobs WHERE status = ? AND run_after <= ? AND job_type IN ({', '.join('?' * len(candidates))}) "
+                    "ORDER BY run_after, id LIMIT ?",
+                    (QUEUED, now, *candidates, slots * 4)
+                ).fetchall()
+                for row in rows:
+                    if len(claimed) == slots:
+                        break
+                    if free[row["job_type"]] <= 0:
+                        continue
+                    free[row["job_type"]] -= 1
+                    connection.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?, started_at = ?, heartbeat_at = ?, "
+                        "error = NULL WHERE id = ?",
+                        (RUNNING, self.worker_id, now, now, row["id"])
+                    )
+                    claimed.append(row)
+            connection.execute("COMMIT")
+            return claimed
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _heartbeat(self, job_ids: List[int]):
+        if job_ids:
+            self._connect().execute(
+                f"UPDATE jobs SET heartbeat_at = ? WHERE worker = ? AND id IN ({', '.join('?' * len(job_ids))})",
+                (time.time(), self.worker_id, *job_ids)
+            )
+
+    def _prune(self):
+        self._connect().execute(
+            f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) AND finished_at < ?",
+            (*FINISHED, time.time() - settings.JOBS_RETENTION_DAYS * 86400)
+        )
+
+    def _settle(self, job_id: int, status: str, **fields):
+        """Record a job's outcome, unless it was meanwhile handed to another worker."""
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._connect().execute(
+            f"UPDATE jobs SET status = ?{', ' + assignments if assignments else ''} WHERE id = ? AND worker = ? AND status = ?",
+            (status, *fields.values(), job_id, self.worker_id, RUNNING)
+        )
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(settings.JOBS_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.JOBS_RETRY_MAX_SECONDS)
+        # Jitter keeps jobs that failed together from retrying together
+        return delay * random.uniform(0.5, 1.0)
+
+    def _execute(self, job: sqlite3.Row):
+        job_type = self.job_types[job["job_type"]]
+        attempt = job["attempts"] + 1
+        context = JobContext(self, job["id"], attempt)
+        try:
+            result = job_type.handler(context, json.loads(job["payload"]))
+        except JobCancelled:
+            self._settle(job["id"], CANCELLED, finished_at=time.time())
+        except JobInterrupted:
+            # Shutting down is not the job's fault, so the attempt is given back
+            self._settle(job["id"], QUEUED, attempts=job["attempts"], run_after=time.time(), worker=None)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"Job {job['id']} ({job['job_type']}) failed on attempt {attempt} of {job['max_attempts']}: {error}")
+            if attempt < job["max_attempts"] and not isinstance(e, JobError):
+                self._settle(job["id"], QUEUED, error=error, run_after=time.time() + self._backoff(attempt), worker=None)
+            else:
+                self._settle(job["id"], FAILED, error=error, finished_at=time.time())
+        else:
+            self._settle(
+                job["id"], SUCCEEDED, result=json.dumps(result, default=str), progress=1.0, finished_at=time.time()
+            )
+
+    def start(self):
+        """Start this worker's runner; called from the lifespan hook."""
+        self.stopping = False
+        self._task = asyncio.create_task(self.run())
+
+    async def run(self):
+        """Claim and run jobs until stop() is called."""
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(settings.JOBS_WORKER_THREADS, thread_name_prefix="job")
+        last_pruned = 0.0
+        try:
+            while not self.stopping:
+                try:
+                    await run_in_threadpool(self._heartbeat, list(self._running))
+                    free = settings.JOBS_WORKER_THREADS - len(self._running)
+                    for job in (await run_in_threadpool(self.claim, free) if free > 0 else []):
+                        future = loop.run_in_executor(executor, self._execute, job)
+                        self._running[job["id"]] = future
+                        future.add_done_callback(lambda _, job_id=job["id"]: self._running.pop(job_id, None))
+                    if time.time() - last_pruned > 3600:
+                        await run_in_threadpool(self._prune)
+                        last_pruned = time.time()
+                except Exception as e:
+                    print(f"Error in the job runner: {e}")
+                await asyncio.sleep(settings.JOBS_POLL_INTERVAL_SECONDS)
+        finally:
+            executor.shutdown(wait=False)
+
+    async def stop(self):
+        """Stop claiming and give running jobs JOBS_SHUTDOWN_GRACE_SECONDS to finish or reach a checkpoint."""
+        self.stopping = True
+        if self._running:
+            await asyncio.wait(list(self._running.values()), timeout=settings.JOBS_SHUTDOWN_GRACE_SECONDS)
+        if self._task is not None:
+            self._task.cancel()
+
+job_queue = JobQueue()
+
+metrics.register_gauge("jobs_running", "Background jobs running in this worker.", lambda: len(job_queue._running))
@@ -0,0 +1,211 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format.
+
+Request metrics are updated from the event loop thread only, so they are plain
+dict and list updates with no locking. Observations that can come from worker
+threads (connection pool waits) take a short lock.
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+import threading
+import time
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds of the queries-per-request histogram buckets
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+class Histogram:
+    """Cumulative-on-render histogram: each observation touches a single bucket."""
+
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        separator = "," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{labels}{separator}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{separator}le="+Inf"}} {self.count}')
+        label_set = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{label_set} {self.total}")
+        lines.append(f"{name}_count{label_set} {self.count}")
+        return lines
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Metrics:
+    def __init__(self):
+        self.started_at = time.time()
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.in_flight = 0
+        self.cache_results: Dict[Tuple[str, str], int] = {}
+        self.pool_wait = Histogram()
+        self.request_queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.n_plus_one_detected = 0
+        self.rate_limited: Dict[str, int] = {}
+        self.load_shed: Dict[str, int] = {}
+        self._thread_lock = threading.Lock()
+        # Name -> callable returning the current value, evaluated at scrape time
+        self.gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+
+    def observe_request(self, method: str, route: str, status_code: int, seconds: float):
+        key = (method, route, status_code)
+        self.requests[key] = self.requests.get(key, 0) + 1
+
+        histogram = self.latency.get((method, route))
+        if histogram is None:
+            histogram = self.latency[(method, route)] = Histogram()
+        histogram.observe(seconds)
+
+    def observe_request_queries(self, count: int):
+        self.request_queries.observe(count)
+
+    def observe_pool_wait(self, seconds: float):
+        with self._thread_lock:
+            self.pool_wait.observe(seconds)
+
+    def cache_hit(self, cache: str, count: int = 1):
+        key = (cache, "hit")
+        self.cache_results[key] = self.cache_results.get(key, 0) + count
+
+    def cache_miss(self, cache: str, count: int = 1):
+        key = (cache, "miss")
+        self.cache_results[key] = self.cache_results.get(key, 0) + count
+
+    def register_gauge(self, name: str, help_text: str, read: Callable[[], float]):
+        """Expose a value that is read when /metrics is scraped."""
+        self.gauges[name] = (help_text, read)
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_total Requests handled, by method, route template and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status_code), count in sorted(self.requests.items()):
+            lines.append(
+                f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status_code}"}} {count}'
+            )
+
+        lines += [
+            "# HELP http_request_duration_seconds Request latency, by method and route template.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), histogram in sorted(self.latency.items()):
+            lines += histogram.render("http_request_duration_seconds", f'method="{method}",route="{_escape(route)}"')
+
+        lines += [
+            "# HELP http_requests_in_flight Requests currently being handled.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP db_pool_wait_seconds Time spent waiting to check a connection out of the pool.",
+            "# TYPE db_pool_wait_seconds histogram",
+        ]
+        with self._thread_lock:
+            lines += self.pool_wait.render("db_pool_wait_seconds", "")
+
+        lines += [
+            "# HELP db_queries_per_request SQL statements issued per request.",
+            "# TYPE db_queries_per_request histogram",
+        ]
+        lines += self.request_queries.render("db_queries_per_request", "")
+        lines += [
+            "# HELP db_n_plus_one_total Statements repeated often enough within one request to suggest N+1 access.",
+            "# TYPE db_n_plus_one_total counter",
+            f"db_n_plus_one_total {self.n_plus_one_detected}",
+        ]
+
+        lines += [
+            "# HELP rate_limited_total Requests rejected with 429, by rate limit rule.",
+            "# TYPE rate_limited_total counter",
+        ]
+        for rule, count in sorted(self.rate_limited.items()):
+            lines.append(f'rate_limited_total{{rule="{rule}"}} {count}')
+
+        lines += [
+            "# HELP load_shed_total Requests rejected with 503 by the concurrency limiter, by priority class.",
+            "# TYPE load_shed_total counter",
+        ]
+        for priority, count in sorted(self.load_shed.items()):
+            lines.append(f'load_shed_total{{priority="{priority}"}} {count}')
+
+        lines += [
+            "# HELP cache_requests_total Cache lookups, by cache and result.",
+            "# TYPE cache_requests_total counter",
+        ]
+        for (cache, result), count in sorted(self.cache_results.items()):
+            lines.append(f'cache_requests_total{{cache="{cache}",result="{result}"}} {count}')
+
+        lines += [
+            "# HELP cache_hit_ratio Share of cache lookups that were hits.",
+            "# TYPE cache_hit_ratio gauge",
+        ]
+        for cache in sorted({cache for cache, _ in self.cache_results}):
+            hits = self.cache_results.get((cache, "hit"), 0)
+            total = hits + self.cache_results.get((cache, "miss"), 0)
+            lines.append(f'cache_hit_ratio{{cache="{cache}"}} {hits / total if total else 0.0}')
+
+        for name, (help_text, read) in sorted(self.gauges.items()):
+            try:
+                value = read()
+            except Exception:
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+
+        lines += [
+            "# HELP process_start_time_seconds Start time of this worker since the epoch.",
+            "# TYPE process_start_time_seconds gauge",
+            f"process_start_time_seconds {self.started_at}",
+        ]
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording per-route counts and latency.
+    Routes are labelled by their template (e.g. /api/forms/{form_id}) to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_holder = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.in_flight -= 1
+            route = scope.get("route")
+            metrics.observe_request(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status_holder[0],
+                time.perf_counter() - start
+            )
@@ -0,0 +1,161 @@
+"""
+On-demand stack-sampling profiler for single requests.
+
+A request is profiled when it carries a valid X-Profile-Token header or is picked
+by PROFILE_SAMPLE_RATE. While it runs, a background thread samples the Python
+stacks of this worker's busy threads and the result is written to PROFILE_DIR in
+collapsed-stack format, ready for flamegraph.pl or speedscope.
+
+The middleware is only installed when PROFILING_ENABLED is set, so workers that
+do not profile pay nothing.
+"""
+from typing import Dict, List
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+from ..storage.files import write_atomic
+
+PROFILE_HEADER = b"x-profile-token"
+PROFILE_SUFFIX = ".collapsed"
+
+# Leaf frames of threads that are waiting for work rather than doing it
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+# Only one request per worker is profiled at a time, which bounds the overhead
+_active = threading.Lock()
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_LEAVES
+
+class StackSampler:
+    """Samples every thread except itself at a fixed interval and counts collapsed stacks."""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        thread_names = {}
+        while not self._stop.wait(self.interval_seconds):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or _is_idle(frame):
+                    continue
+                labels: List[str] = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                if thread_id not in thread_names:
+                    thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+                labels.append(thread_names.get(thread_id, str(thread_id)))
+                stack = ";".join(reversed(labels))
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+def profile_name(method: str, path: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{method}-{slug[:80]}-{random.randrange(16 ** 6):06x}{PROFILE_SUFFIX}"
+
+def rotate_profiles(directory: str, max_files: int, max_bytes: int):
+    """Delete the oldest profiles until the directory is within both caps."""
+    profiles = []
+    for name in os.listdir(directory):
+        if not name.endswith(PROFILE_SUFFIX):
+            continue
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except FileNotFoundError:
+            continue
+        profiles.append((stat.st_mtime, stat.st_size, name))
+
+    profiles.sort()
+    total_bytes = sum(size for _, size, _ in profiles)
+    while profiles and (len(profiles) > max_files or total_bytes > max_bytes):
+        _, size, name = profiles.pop(0)
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
+
+def save_profile(name: str, sampler: StackSampler):
+    try:
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        write_atomic(os.path.join(settings.PROFILE_DIR, name), sampler.collapsed().encode("utf-8"))
+        rotate_profiles(settings.PROFILE_DIR, settings.PROFILE_MAX_FILES, settings.PROFILE_MAX_BYTES)
+    except OSError as e:
+        print(f"Error writing profile {name}: {e}")
+
+def _has_valid_token(scope) -> bool:
+    if not settings.PROFILE_TOKEN:
+        return False
+    for key, value in scope["headers"]:
+        if key == PROFILE_HEADER:
+            return hmac.compare_digest(value, settings.PROFILE_TOKEN.encode("latin-1"))
+    return False
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling requests that ask for it with the shared token
+    or are sampled. Token-triggered responses name their profile in X-Profile-Id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        requested = _has_valid_token(scope)
+        sampled = not requested and random.random() < settings.PROFILE_SAMPLE_RATE
+        if not (requested or sampled) or not _active.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+
+        name = profile_name(scope["method"], scope["path"])
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start" and requested:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", name.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        sampler = StackSampler(settings.PROFILE_INTERVAL_MS / 1000)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop()
+            _active.release()
+            await run_in_threadpool(save_profile, name, sampler)
@@ -0,0 +1,272 @@
+"""
+Pre-rendered publishing of forms.
+
+Publishing renders a form's latest revision into a static HTML page and a JSON
+bundle with content-hashed file names under PUBLISH_DIR. A manifest maps each
+published form_id to its current bundles, so respondents are served from memory
+or disk without touching the database. Bundles are only re-rendered when the
+form is saved again.
+"""
+from collections import OrderedDict
+from datetime import datetime
+from html import escape
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; manifest updates are then per-process only
+    fcntl = None
+
+from ..config import settings
+from ..storage.files import write_atomic
+from .metrics import metrics
+
+MANIFEST_NAME = "manifest.json"
+
+# Number of rendered bundles kept in memory
+BUNDLE_CACHE_SIZE = 2048
+
+_INPUT_TYPES = {
+    "email": "email",
+    "phone-number": "tel",
+    "phone": "tel",
+    "url": "url",
+    "number": "number",
+    "date-picker": "date",
+    "date": "date",
+    "time-picker": "time",
+    "time": "time",
+}
+
+def _render_element(element: Dict[str, Any]) -> str:
+    element_id = escape(str(element.get("id", "")))
+    element_type = element.get("type", "text")
+    label = escape(str(element.get("label") or ""))
+    placeholder = escape(str(element.get("placeholder") or ""))
+    required = " required" if element.get("required") else ""
+    options = [escape(str(option)) for option in element.get("options") or []]
+
+    if element_type in ("paragraph", "textarea"):
+        control = f'<textarea id="{element_id}" name="{element_id}" placeholder="{placeholder}"{required}></textarea>'
+    elif element_type in ("dropdown", "select"):
+        choices = "".join(f'<option value="{option}">{option}</option>' for option in options)
+        control = f'<select id="{element_id}" name="{element_id}"{required}>{choices}</select>'
+    elif element_type in ("multiple-choice", "radio", "checkbox") and options:
+        input_type = "checkbox" if element_type == "checkbox" else "radio"
+        control = "".join(
+            f'<label><input type="{input_type}" name="{element_id}" value="{option}"> {option}</label>'
+            for option in options
+        )
+    elif element_type == "checkbox":
+        control = f'<input type="checkbox" id="{element_id}" name="{element_id}"{required}>'
+    elif element_type == "star-rating":
+        control = "".join(
+            f'<label><input type="radio" name="{element_id}" value="{stars}"> {stars}</label>'
+            for stars in range(1, 6)
+        )
+    else:
+        input_type = _INPUT_TYPES.get(element_type, "text")
+        control = (
+            f'<input type="{input_type}" id="{element_id}" name="{element_id}" '
+            f'placeholder="{placeholder}"{required}>'
+        )
+
+    return f'<div class="fb-field"><label for="{element_id}">{label}</label>{control}</div>'
+
+def render_form_json(form: Dict[str, Any]) -> bytes:
+    """Render the JSON bundle for a form."""
+    bundle = {
+        "form_id": form["form_id"],
+        "form_name": form["form_name"],
+        "form_description": form.get("form_description"),
+        "form_elements": form["form_elements"],
+        "form_theme": form.get("form_theme"),
+        "theme_css_url": form.get("theme_css_url"),
+    }
+    return json.dumps(bundle, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+def render_form_html(form: Dict[str, Any], form_json: bytes) -> bytes:
+    """Render a standalone HTML page for a form, embedding its JSON bundle for client scripts."""
+    stylesheet = ""
+    if form.get("theme_css_url"):
+        stylesheet = f'<link rel="stylesheet" href="{escape(form["theme_css_url"])}">'
+
+    description = ""
+    if form.get("form_description"):
+        description = f'<p>{escape(form["form_description"])}</p>'
+
+    fields = "".join(_render_element(element) for element in form["form_elements"])
+    # "</" would end the script element early
+    embedded = form_json.decode("utf-8").replace("</", "<\\/")
+
+    page = (
+        "<!DOCTYPE html>"
+        '<html><head><meta charset="utf-8">'
+        '<meta name="viewport" content="width=device-width,initial-scale=1">'
+        f"<title>{escape(form['form_name'])}</title>{stylesheet}</head>"
+        f'<body><form class="fb-form" data-form-id="{form["form_id"]}">'
+        f"<h1>{escape(form['form_name'])}</h1>{description}{fields}"
+        '<button type="submit" class="fb-button">Submit</button></form>'
+        f'<script type="application/json" id="form-data">{embedded}</script>'
+        "</body></html>"
+    )
+    return page.encode("utf-8")
+
+def _bundle_name(form_id: int, content: bytes, extension: str) -> str:
+    return f"{form_id}-{hashlib.sha256(content).hexdigest()[:20]}.{extension}"
+
+class FormPublisher:
+    """Renders published forms to disk and serves them from memory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._manifest: Dict[str, Dict[str, Any]] = {}
+        self._manifest_mtime: Optional[int] = None
+        self._bundles: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    def _read_manifest(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("forms", {})
+        except FileNotFoundError:
+            return {}
+
+    def _refresh_manifest(self):
+        """Reload the manifest when another worker has changed it."""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._manifest_mtime:
+            self._manifest = self._read_manifest()
+            self._manifest_mtime = mtime
+
+    def _update_manifest(self, form_id: int, entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Set or remove one form's entry under an exclusive lock and return the previous entry."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".manifest.lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            manifest = self._read_manifest()
+            previous = manifest.pop(str(form_id), None)
+            if entry is not None:
+                manifest[str(form_id)] = entry
+
+            write_atomic(self.manifest_path, json.dumps({"forms": manifest}, indent=2).encode("utf-8"))
+            self._manifest = manifest
+            self._manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+            return previous
+
+    def _remember(self, name: str, content: bytes):
+        self._bundles[name] = content
+        self._bundles.move_to_end(name)
+        while len(self._bundles) > BUNDLE_CACHE_SIZE:
+            self._bundles.popitem(last=False)
+
+    def _remove_files(self, entry: Optional[Dict[str, Any]], keep: Tuple[str, ...] = ()):
+        if not entry:
+            return
+        for name in (entry["html"], entry["json"]):
+            if name in keep:
+                continue
+            self._bundles.pop(name, None)
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def is_published(self, form_id: int) -> bool:
+        with self._lock:
+            self._refresh_manifest()
+            return str(form_id) in self._manifest
+
+    def get_entry(self, form_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._refresh_manifest()
+            return self._manifest.get(str(form_id))
+
+    def publish(self, form: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Render a form (as returned by the formdata API) and make it the published version.
+        Returns the manifest entry describing the new bundles.
+        """
+        form_json = render_form_json(form)
+        html = render_form_html(form, form_json)
+        bundles = {
+            "json": (_bundle_name(form["form_id"], form_json, "json"), form_json),
+            "html": (_bundle_name(form["form_id"], html, "html"), html),
+        }
+
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            for name, content in bundles.values():
+                path = os.path.join(self.directory, name)
+                if not os.path.exists(path):
+                    write_atomic(path, content)
+                self._remember(name, content)
+
+            entry = {
+                "form_id": form["form_id"],
+                "source_id": form.get("id"),
+                "html": bundles["html"][0],
+                "json": bundles["json"][0],
+                "published_at": datetime.utcnow().isoformat(),
+            }
+            previous = self._update_manifest(form["form_id"], entry)
+            self._remove_files(previous, keep=(entry["html"], entry["json"]))
+            return entry
+
+    def republish_if_published(self, form: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Re-render a form after it was saved, if it is currently published."""
+        entry = self.get_entry(form["form_id"])
+        if entry is None:
+            return None
+        # Saving an older revision must not replace a newer published one
+        if entry.get("source_id") and form.get("id") and form["id"] < entry["source_id"]:
+            return None
+        return self.publish(form)
+
+    def unpublish(self, form_id: int) -> bool:
+        with self._lock:
+            previous = self._update_manifest(form_id, None)
+            self._remove_files(previous)
+            return previous is not None
+
+    def read_bundle(self, name: str) -> Optional[bytes]:
+        """Return a bundle's content from memory, loading it from disk on a miss."""
+        with self._lock:
+            content = self._bundles.get(name)
+            if content is not None:
+                self._bundles.move_to_end(name)
+                metrics.cache_hit("published_bundles")
+                return content
+        metrics.cache_miss("published_bundles")
+
+        if os.path.basename(name) != name or name == MANIFEST_NAME or name.startswith("."):
+            return None
+        try:
+            with open(os.path.join(self.directory, name), "rb") as f:
+                content = f.read()
+        except (FileNotFoundError, IsADirectoryError):
+            return None
+
+        with self._lock:
+            self._remember(name, content)
+        return content
+
+    def list_published(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._refresh_manifest()
+            return list(self._manifest.values())
+
+publisher = FormPublisher(settings.PUBLISH_DIR)
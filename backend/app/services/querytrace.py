@@ -0,0 +1,108 @@
+"""
+Per-request SQL instrumentation.
+
+The SQLAlchemy engine events in app.database and the raw connections of
+app.storage.raw both report to record_query(). Queries are attributed to
+the request being served through a context variable, which Starlette copies into
+the threadpool that runs sync handlers and dependencies.
+"""
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from ..config import settings
+from .metrics import metrics
+
+# Longest statement text written to the log
+MAX_LOGGED_STATEMENT = 500
+
+class RequestQueries:
+    """Queries issued while serving one request."""
+
+    __slots__ = ("method", "path", "count", "total_seconds", "statements")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.count = 0
+        self.total_seconds = 0.0
+        # Statement text -> executions; statements are parameterised, so repeats share a key
+        self.statements: Dict[str, int] = {}
+
+    def repeated_statements(self, threshold: int) -> Dict[str, int]:
+        return {statement: count for statement, count in self.statements.items() if count >= threshold}
+
+_current_request: ContextVar[Optional[RequestQueries]] = ContextVar("current_request_queries", default=None)
+
+def current_queries() -> Optional[RequestQueries]:
+    return _current_request.get()
+
+def _shorten(statement: str) -> str:
+    statement = " ".join(statement.split())
+    if len(statement) > MAX_LOGGED_STATEMENT:
+        return statement[:MAX_LOGGED_STATEMENT] + "..."
+    return statement
+
+def parameter_shape(parameters: Any) -> str:
+    """Describe bound parameters by type only, so logs never contain user data."""
+    if parameters is None:
+        return "()"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: one parameter set per row
+            return f"{len(parameters)} x {parameter_shape(parameters[0])}"
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return type(parameters).__name__
+
+def record_query(statement: str, parameters: Any, seconds: float):
+    """Attribute a finished query to the current request and log it if it was slow."""
+    queries = _current_request.get()
+    if queries is not None:
+        queries.count += 1
+        queries.total_seconds += seconds
+        queries.statements[statement] = queries.statements.get(statement, 0) + 1
+
+    if seconds * 1000 >= settings.SLOW_QUERY_MS:
+        where = f" during {queries.method} {queries.path}" if queries is not None else ""
+        print(f"Slow query ({seconds * 1000:.1f} ms){where}: {_shorten(statement)} params={parameter_shape(parameters)}")
+
+def server_timing_value(queries: RequestQueries) -> str:
+    return f'db;desc="{queries.count} queries";dur={queries.total_seconds * 1000:.1f}'
+
+class QueryTraceMiddleware:
+    """
+    Pure ASGI middleware collecting each request's queries.
+    Adds a Server-Timing header with their count and total time, and flags
+    statements repeated often enough to suggest an N+1 access pattern.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        queries = RequestQueries(scope["method"], scope["path"])
+        token = _current_request.set(queries)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and settings.SERVER_TIMING_ENABLED:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing_value(queries).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_request.reset(token)
+            metrics.observe_request_queries(queries.count)
+            route = scope.get("route")
+            for statement, count in queries.repeated_statements(settings.N_PLUS_ONE_THRESHOLD).items():
+                metrics.n_plus_one_detected += 1
+                print(
+                    f"Possible N+1: {count} executions of the same statement during "
+                    f"{queries.method} {route.path if route is not None else queries.path}: {_shorten(statement)}"
+                )
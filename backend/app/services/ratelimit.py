@@ -0,0 +1,194 @@
+"""
+Token-bucket rate limiting for expensive endpoints.
+
+Each rule names a route and the limits that apply to it per client IP and per
+user. Buckets refill continuously at `rate` tokens per second up to `burst`.
+State is kept in process memory by default; with RATE_LIMIT_BACKEND=redis the
+buckets are shared by every worker through an atomic Lua script. While Redis is
+unreachable, checks fall back to per-process buckets rather than failing requests.
+"""
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import asyncio
+import math
+import re
+import threading
+import time
+
+from fastapi import HTTPException, Request, status
+
+from ..config import settings
+from .metrics import metrics
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+class Limit:
+    """A refill rate in tokens per second and the bucket size."""
+
+    __slots__ = ("rate", "burst")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+
+    @classmethod
+    def parse(cls, spec: str) -> Optional["Limit"]:
+        """
+        Parse "COUNT/PERIOD[:BURST]", e.g. "60/minute:20": sixty requests a minute
+        sustained, up to twenty at once. An empty spec means no limit.
+        """
+        if not spec:
+            return None
+        match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*/\s*(second|minute|hour)\s*(?::\s*(\d+))?\s*", spec)
+        if not match:
+            raise ValueError(f"Invalid rate limit {spec!r}; expected COUNT/PERIOD[:BURST]")
+        count, period, burst = match.groups()
+        rate = float(count) / _PERIODS[period]
+        return cls(rate, float(burst) if burst else max(float(count), 1.0))
+
+class MemoryBackend:
+    """Buckets in this process. O(1) per check; least recently used keys are evicted past max_keys."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, limit: Limit, cost: float = 1) -> Tuple[bool, float]:
+        """Take cost tokens if available. Returns (allowed, seconds until it would be allowed)."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [limit.burst, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+
+            tokens = min(limit.burst, bucket[0] + (now - bucket[1]) * limit.rate)
+            bucket[1] = now
+            if tokens >= cost:
+                bucket[0] = tokens - cost
+                return True, 0.0
+            bucket[0] = tokens
+            return False, (cost - tokens) / limit.rate
+
+# KEYS[1] bucket; ARGV rate, burst, now, cost. Returns {allowed, retry_after}.
+_REDIS_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+class RedisBackend:
+    """
+    Buckets shared by all workers. Each check is one round trip running an atomic script.
+    When Redis is down or slow, checks use the fallback backend until it answers again.
+    """
+
+    def __init__(self, url: str, fallback: MemoryBackend):
+        import redis.asyncio
+        import redis.exceptions
+
+        timeout = settings.RATE_LIMIT_REDIS_TIMEOUT_SECONDS
+        self._client = redis.asyncio.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self._script = self._client.register_script(_REDIS_TAKE_SCRIPT)
+        self._errors = (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError, asyncio.TimeoutError, OSError)
+        self._fallback = fallback
+        self._failing = False
+
+    async def take(self, key: str, limit: Limit, cost: float = 1) -> Tuple[bool, float]:
+        try:
+            allowed, retry_after = await self._script(
+                keys=[f"ratelimit:{key}"],
+                args=[limit.rate, limit.burst, time.time(), cost]
+            )
+        except self._errors as e:
+            if not self._failing:
+                self._failing = True
+                print(f"Rate limiting: Redis is unavailable ({e}), using per-process limits until it recovers")
+            return await self._fallback.take(key, limit, cost)
+        if self._failing:
+            self._failing = False
+            print("Rate limiting: Redis is available again")
+        return bool(int(allowed)), float(retry_after)
+
+class RateLimiter:
+    def __init__(self):
+        self._backend = None
+        self._rules: Dict[str, Tuple[Optional[Limit], Optional[Limit]]] = {}
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = self._create_backend()
+        return self._backend
+
+    def _create_backend(self):
+        if settings.RATE_LIMIT_BACKEND == "redis":
+            try:
+                return RedisBackend(settings.RATE_LIMIT_REDIS_URL, MemoryBackend(settings.RATE_LIMIT_MAX_KEYS))
+            except ImportError:
+                print("Rate limiting: the redis package is not installed, falling back to per-process limits")
+        return MemoryBackend(settings.RATE_LIMIT_MAX_KEYS)
+
+    def configure(self, rule: str, per_ip: str, per_user: str):
+        """Set a rule's limits from COUNT/PERIOD[:BURST] specs; an empty spec disables that bucket."""
+        self._rules[rule] = (Limit.parse(per_ip), Limit.parse(per_user))
+
+    async def check(self, request: Request, rule: str, user: Optional[str] = None):
+        """Take a token from the rule's IP and user buckets, raising 429 if either is empty."""
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        ip_limit, user_limit = self._rules[rule]
+
+        retry_after = 0.0
+        if ip_limit is not None:
+            allowed, wait = await self.backend.take(f"{rule}:ip:{client_ip(request)}", ip_limit)
+            if not allowed:
+                retry_after = wait
+        if user_limit is not None and user is not None and not retry_after:
+            allowed, wait = await self.backend.take(f"{rule}:user:{user}", user_limit)
+            if not allowed:
+                retry_after = wait
+
+        if retry_after:
+            metrics.rate_limited[rule] = metrics.rate_limited.get(rule, 0) + 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please slow down",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+
+def client_ip(request: Request) -> str:
+    """
+    The peer address, or behind trusted proxies the address the outermost of them saw. Each proxy
+    appends to X-Forwarded-For, so only the rightmost RATE_LIMIT_TRUSTED_PROXIES entries are
+    trustworthy; anything left of them is whatever the client chose to send.
+    """
+    if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        hops = [hop.strip() for hop in ",".join(request.headers.getlist("x-forwarded-for")).split(",") if hop.strip()]
+        if hops:
+            return hops[-min(max(settings.RATE_LIMIT_TRUSTED_PROXIES, 1), len(hops))]
+    return request.client.host if request.client else "unknown"
+
+rate_limiter = RateLimiter()
+rate_limiter.configure("auto_save", settings.RATE_LIMIT_AUTO_SAVE_PER_IP, settings.RATE_LIMIT_AUTO_SAVE_PER_USER)
+rate_limiter.configure("login", settings.RATE_LIMIT_LOGIN_PER_IP, settings.RATE_LIMIT_LOGIN_PER_USER)
@@ -0,0 +1,162 @@
+"""
+Read replica routing with read-your-writes and replication lag checks.
+
+GET and HEAD requests read through a replica unless the client wrote recently:
+every successful write returns the time until which the client's reads stay on
+the primary, both as a short-lived cookie and in an X-Primary-Until header. Clients
+that cannot send cookies (cross-origin calls without credentials, server-side
+proxies) echo the header back instead, so users always see their own changes. A heartbeat row written to
+the primary and read back from each replica measures replication lag, with the
+probe interval as resolution. Replicas that lag more than REPLICA_MAX_LAG_SECONDS,
+or cannot be reached, leave the rotation until they catch up.
+
+Requests that write should not be routed here; they always use the primary.
+"""
+from typing import Optional
+import asyncio
+import time
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import cookie_parser
+
+from ..config import settings
+from ..database import get_engine, get_replicas, read_from_replica
+from ..models.replication_heartbeat import ReplicationHeartbeat
+from .metrics import metrics
+
+PIN_COOKIE = "db_primary_until"
+PIN_HEADER = "X-Primary-Until"
+_PIN_HEADER_KEY = PIN_HEADER.lower().encode("latin-1")
+_READ_METHODS = {"GET", "HEAD"}
+
+_heartbeat_table_ready = False
+
+def pin_seconds() -> float:
+    """
+    How long reads stay on the primary after a write. Never shorter than the time a
+    replica can lag before it leaves the rotation, or users could miss their own writes.
+    """
+    return max(settings.READ_YOUR_WRITES_SECONDS, settings.REPLICA_MAX_LAG_SECONDS + settings.REPLICA_CHECK_INTERVAL_SECONDS)
+
+def write_heartbeat() -> float:
+    global _heartbeat_table_ready
+    engine = get_engine()
+    if not _heartbeat_table_ready:
+        ReplicationHeartbeat.__table__.create(engine, checkfirst=True)
+        _heartbeat_table_ready = True
+
+    beat = time.time()
+    with engine.begin() as connection:
+        result = connection.execute(
+            update(ReplicationHeartbeat).where(ReplicationHeartbeat.id == 1).values(beat_at=beat)
+        )
+        if result.rowcount == 0:
+            try:
+                connection.execute(insert(ReplicationHeartbeat).values(id=1, beat_at=beat))
+            except IntegrityError:
+                pass  # Another worker inserted the row first
+    return beat
+
+def read_heartbeat(engine) -> Optional[float]:
+    with engine.connect() as connection:
+        return connection.execute(select(ReplicationHeartbeat.beat_at).where(ReplicationHeartbeat.id == 1)).scalar()
+
+def check_replicas(previous_beat: Optional[float]) -> Optional[float]:
+    """
+    Measure each replica against the beat written on the previous check, then write
+    a new one. Returns the new beat, or the previous one if the primary could not be written.
+    """
+    for replica in get_replicas():
+        try:
+            replica_beat = read_heartbeat(replica.engine)
+        except Exception as e:
+            if replica.in_rotation:
+                print(f"Read replica {replica.name} taken out of rotation: {e}")
+            replica.lag_seconds = None
+            replica.in_rotation = False
+            continue
+
+        if previous_beat is None or replica_beat is None:
+            continue
+        replica.lag_seconds = max(0.0, previous_beat - replica_beat)
+        in_rotation = replica.lag_seconds <= settings.REPLICA_MAX_LAG_SECONDS
+        if in_rotation != replica.in_rotation:
+            state = "back in rotation" if in_rotation else "taken out of rotation"
+            print(f"Read replica {replica.name} {state}, {replica.lag_seconds:.1f}s behind")
+        replica.in_rotation = in_rotation
+
+    try:
+        return write_heartbeat()
+    except Exception as e:
+        print(f"Error writing replication heartbeat: {e}")
+        return previous_beat
+
+async def probe_lag_periodically():
+    previous_beat = None
+    while True:
+        previous_beat = await run_in_threadpool(check_replicas, previous_beat)
+        await asyncio.sleep(settings.REPLICA_CHECK_INTERVAL_SECONDS)
+
+def _max_replica_lag() -> float:
+    lags = [replica.lag_seconds for replica in get_replicas() if replica.lag_seconds is not None]
+    return max(lags, default=0.0)
+
+metrics.register_gauge(
+    "db_replicas_in_rotation", "Read replicas currently serving reads.",
+    lambda: sum(replica.in_rotation for replica in get_replicas())
+)
+metrics.register_gauge("db_replica_max_lag_seconds", "Largest measured replication lag.", _max_replica_lag)
+
+def _pinned_until(value: Optional[str]) -> float:
+    try:
+        return float(value) if value is not None else 0.0
+    except ValueError:
+        return 0.0
+
+def _is_pinned(scope) -> bool:
+    pinned_until = 0.0
+    for key, value in scope["headers"]:
+        if key == b"cookie":
+            pinned_until = max(pinned_until, _pinned_until(cookie_parser(value.decode("latin-1")).get(PIN_COOKIE)))
+        elif key == _PIN_HEADER_KEY:
+            pinned_until = max(pinned_until, _pinned_until(value.decode("latin-1")))
+    now = time.time()
+    # A pin further ahead than any write could have set is not honoured
+    return now < pinned_until <= now + pin_seconds() + 1
+
+def _pin_headers() -> list:
+    seconds = pin_seconds()
+    until = f"{time.time() + seconds:.0f}"
+    cookie = f"{PIN_COOKIE}={until}; Max-Age={seconds:.0f}; Path=/; HttpOnly; SameSite=Lax"
+    return [(b"set-cookie", cookie.encode("latin-1")), (_PIN_HEADER_KEY, until.encode("latin-1"))]
+
+class ReadRoutingMiddleware:
+    """
+    Pure ASGI middleware letting reads use a replica and pinning clients that
+    wrote to the primary. Only installed when DB_REPLICA_URLS is set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        if scope["method"] in _READ_METHODS:
+            token = read_from_replica.set(not _is_pinned(scope))
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                read_from_replica.reset(token)
+
+        async def send_with_pin(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = list(message.get("headers", []))
+                headers.extend(_pin_headers())
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
@@ -0,0 +1,205 @@
+"""
+In-process full-text search over a user's forms.
+
+Each user gets an inverted index over the latest revision of every form they own,
+covering form_name, form_description and each element's label, placeholder and
+options. Indexes are built lazily on the first search, kept current by the
+formdata write paths, and rebuilt after SEARCH_INDEX_TTL_SECONDS so that writes
+handled by other worker processes are picked up.
+"""
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import math
+import re
+import threading
+import time
+
+from ..config import settings
+from .metrics import metrics
+
+# Relative weight of a term depending on where it appears
+FIELD_WEIGHTS = {
+    "form_name": 3.0,
+    "label": 2.0,
+    "form_description": 1.5,
+    "placeholder": 1.0,
+    "options": 1.0,
+}
+
+# Score multiplier for a query token that is only a prefix of the indexed term
+PREFIX_MATCH_FACTOR = 0.5
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into lowercase word tokens."""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+def _document_terms(form_name: str, form_description: Optional[str],
+                    elements: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Return term -> weight for one form, keeping the best weight per term."""
+    fields = [("form_name", form_name), ("form_description", form_description)]
+    for element in elements or []:
+        fields.append(("label", element.get("label")))
+        fields.append(("placeholder", element.get("placeholder")))
+        for option in element.get("options") or []:
+            if isinstance(option, str):
+                fields.append(("options", option))
+
+    terms: Dict[str, float] = {}
+    for field, text in fields:
+        weight = FIELD_WEIGHTS[field]
+        for term in tokenize(text if isinstance(text, str) else None):
+            if terms.get(term, 0.0) < weight:
+                terms[term] = weight
+    return terms
+
+class UserSearchIndex:
+    """Inverted index over one user's forms, keyed by form_id."""
+
+    def __init__(self):
+        self.documents: Dict[int, Dict[str, Any]] = {}
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.built_at = time.monotonic()
+        self._sorted_terms: Optional[List[str]] = None
+
+    def upsert(self, form_id: int, row_id: int, form_name: str, form_description: Optional[str],
+               elements: List[Dict[str, Any]], updated_at: Any = None):
+        self.remove(form_id)
+        terms = _document_terms(form_name, form_description, elements)
+
+        self.documents[form_id] = {
+            "id": row_id,
+            "form_id": form_id,
+            "form_name": form_name,
+            "form_description": form_description,
+            "updated_at": updated_at,
+            "terms": list(terms),
+        }
+        for term, weight in terms.items():
+            if term not in self.postings:
+                self.postings[term] = {}
+                self._sorted_terms = None
+            self.postings[term][form_id] = weight
+
+    def remove(self, form_id: int):
+        document = self.documents.pop(form_id, None)
+        if document is None:
+            return
+        for term in document["terms"]:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(form_id, None)
+            if not posting:
+                del self.postings[term]
+                self._sorted_terms = None
+
+    def _terms_with_prefix(self, prefix: str) -> List[str]:
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        terms = []
+        index = bisect_left(self._sorted_terms, prefix)
+        while index < len(self._sorted_terms) and self._sorted_terms[index].startswith(prefix):
+            terms.append(self._sorted_terms[index])
+            index += 1
+        return terms
+
+    def search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        Return the best matching forms.
+        Every query token must match a term exactly or as a prefix; rarer terms score higher.
+        """
+        tokens = tokenize(query)
+        if not tokens or not self.documents:
+            return []
+
+        total_documents = len(self.documents)
+        scores: Optional[Dict[int, float]] = None
+
+        for token in tokens:
+            token_scores: Dict[int, float] = {}
+            for term in self._terms_with_prefix(token):
+                posting = self.postings[term]
+                idf = math.log(1.0 + total_documents / len(posting))
+                factor = 1.0 if term == token else PREFIX_MATCH_FACTOR
+                for form_id, weight in posting.items():
+                    score = weight * idf * factor
+                    if token_scores.get(form_id, 0.0) < score:
+                        token_scores[form_id] = score
+
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {form_id: scores[form_id] + score for form_id, score in token_scores.items() if form_id in scores}
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        results = []
+        for form_id, score in ranked:
+            document = self.documents[form_id]
+            results.append({
+                "id": document["id"],
+                "form_id": form_id,
+                "form_name": document["form_name"],
+                "form_description": document["form_description"],
+                "updated_at": document["updated_at"],
+                "score": round(score, 4),
+            })
+        return results
+
+class SearchIndexRegistry:
+    """LRU map of user_id -> UserSearchIndex, bounded by SEARCH_MAX_CACHED_USERS."""
+
+    def __init__(self, max_users: int, ttl_seconds: int):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._indexes: "OrderedDict[int, UserSearchIndex]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, user_id: int) -> Optional[UserSearchIndex]:
+        """Return the user's index if it is loaded and fresh."""
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                return None
+            if time.monotonic() - index.built_at > self.ttl_seconds:
+                del self._indexes[user_id]
+                return None
+            self._indexes.move_to_end(user_id)
+            return index
+
+    def put(self, user_id: int, index: UserSearchIndex):
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._indexes.pop(user_id, None)
+
+    def index_form(self, user_id: int, form_id: int, row_id: int, form_name: str,
+                   form_description: Optional[str], elements: List[Dict[str, Any]], updated_at: Any = None):
+        """Update a loaded index after a write; unloaded users are indexed on their next search."""
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                index.upsert(form_id, row_id, form_name, form_description, elements, updated_at)
+
+    def search(self, user_id: int, query: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Search a loaded index, or return None when it has to be built first."""
+        with self._lock:
+            index = self.get(user_id)
+            if index is None:
+                metrics.cache_miss("search_index")
+                return None
+            metrics.cache_hit("search_index")
+            return index.search(query, limit)
+
+search_indexes = SearchIndexRegistry(settings.SEARCH_MAX_CACHED_USERS, settings.SEARCH_INDEX_TTL_SECONDS)
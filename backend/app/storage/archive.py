@@ -0,0 +1,217 @@
+"""
+Archive storage for cold form history.
+
+The archival job moves form data rows that a newer save of the same form has
+superseded, and revisions older than a form's newest cold snapshot, out of the
+hot formdata and form_revisions tables once they have been untouched for
+ARCHIVE_AFTER_DAYS. Rows are moved in batches of ARCHIVE_BATCH_SIZE, one
+transaction each, into zlib-compressed archive tables on the same database.
+
+The latest row of every form and every revision from a form's newest cold
+snapshot on stay hot, so saving, listing and rebuilding recent versions never
+touch the archive. Reads of older rows fall back to it.
+"""
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+import json
+import time
+import zlib
+
+import pydantic_core
+from sqlalchemy import exists, func
+from sqlalchemy.orm import Session, aliased
+
+from ..config import settings
+from ..models.archived_formdata import ArchivedFormData
+from ..models.archived_revision import ArchivedRevisionBatch
+from ..models.formdata import FormData
+from ..models.revision import FormRevision
+from .elements import load_element_lists
+
+class ArchivedRevision(NamedTuple):
+    version: int
+    kind: str
+    payload: Dict[str, Any]
+    user_id: int
+    created_at: Optional[datetime]
+
+def compress(value: Any) -> bytes:
+    return zlib.compress(pydantic_core.to_json(value), settings.ARCHIVE_COMPRESSION_LEVEL)
+
+def decompress(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob))
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+def archive_cutoff(days: Optional[float] = None) -> datetime:
+    """Rows last written before this are cold."""
+    return datetime.now() - timedelta(days=settings.ARCHIVE_AFTER_DAYS if days is None else days)
+
+def archive_formdata_batch(db: Session, cutoff: datetime, batch_size: int) -> int:
+    """
+    Move up to batch_size cold, superseded form data rows to the archive and commit.
+    Returns the number of rows moved; 0 once nothing is left to archive.
+    """
+    newer = aliased(FormData)
+    rows = db.query(FormData).filter(
+        func.coalesce(FormData.updated_at, FormData.created_at) < cutoff,
+        exists().where(newer.form_id == FormData.form_id, newer.id > FormData.id)
+    ).order_by(FormData.id).limit(batch_size).all()
+    if not rows:
+        return 0
+
+    # Elements are stored resolved, so archived rows never pin blobs in the element store
+    stored_elements = load_element_lists(db, [row.element_hashes for row in rows])
+    db.add_all([
+        ArchivedFormData(
+            id=row.id,
+            form_id=row.form_id,
+            user_id=row.user_id,
+            theme_hash=row.theme_hash,
+            created_at=row.created_at,
+            payload=compress({
+                "form_name": row.form_name,
+                "form_description": row.form_description,
+                "form_elements": row.form_elements if elements is None else elements,
+                "form_theme": row.form_theme,
+                "updated_at": row.updated_at,
+            })
+        )
+        for row, elements in zip(rows, stored_elements)
+    ])
+    db.query(FormData).filter(FormData.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+    db.commit()
+    return len(rows)
+
+def archive_revisions_batch(db: Session, cutoff: datetime, batch_size: int) -> int:
+    """
+    Move up to batch_size revisions that precede their form's newest snapshot taken
+    before cutoff to the archive and commit. Returns the number of revisions moved.
+    """
+    boundaries = db.query(
+        FormRevision.form_id,
+        func.max(FormRevision.version).label("version")
+    ).filter(
+        FormRevision.kind == "snapshot",
+        FormRevision.created_at < cutoff
+    ).group_by(FormRevision.form_id).subquery()
+
+    rows = db.query(FormRevision).join(boundaries, FormRevision.form_id == boundaries.c.form_id).filter(
+        FormRevision.version < boundaries.c.version
+    ).order_by(FormRevision.form_id, FormRevision.version).limit(batch_size).all()
+    if not rows:
+        return 0
+
+    for form_id, group in groupby(rows, key=lambda row: row.form_id):
+        revisions = list(group)
+        db.add(ArchivedRevisionBatch(
+            form_id=form_id,
+            first_version=revisions[0].version,
+            last_version=revisions[-1].version,
+            user_id=revisions[-1].user_id,
+            payload=compress([
+                {
+                    "version": revision.version,
+                    "kind": revision.kind,
+                    "payload": revision.payload,
+                    "user_id": revision.user_id,
+                    "created_at": revision.created_at,
+                }
+                for revision in revisions
+            ])
+        ))
+    db.query(FormRevision).filter(FormRevision.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+    db.commit()
+    return len(rows)
+
+def archive_cold_rows(
+    db: Session,
+    cutoff: datetime,
+    batch_size: int,
+    pause: float = 0.0,
+    on_batch: Optional[Callable[[Dict[str, int]], None]] = None
+) -> Dict[str, int]:
+    """Archive batch by batch until nothing cold is left; returns the rows moved per table, also passed to on_batch."""
+    moved = {"formdata": 0, "form_revisions": 0}
+    for table, archive_batch in (("formdata", archive_formdata_batch), ("form_revisions", archive_revisions_batch)):
+        while True:
+            count = archive_batch(db, cutoff, batch_size)
+            if count == 0:
+                break
+            moved[table] += count
+            if on_batch is not None:
+                on_batch(moved)
+            # Give live traffic room between transactions
+            time.sleep(pause)
+    return moved
+
+def load_archived_formdata(db: Session, user_id: int) -> List[ArchivedFormData]:
+    return db.query(ArchivedFormData).filter(ArchivedFormData.user_id == user_id).order_by(ArchivedFormData.id).all()
+
+def unpack_archived_formdata(record: ArchivedFormData) -> Dict[str, Any]:
+    """The archived row's columns, with its stored elements already resolved."""
+    data = decompress(record.payload)
+    return {
+        "id": record.id,
+        "form_id": record.form_id,
+        "form_name": data["form_name"],
+        "form_description": data["form_description"],
+        "form_elements": data["form_elements"],
+        "form_theme": data["form_theme"],
+        "theme_hash": record.theme_hash,
+        "user_id": record.user_id,
+        "created_at": record.created_at,
+        "updated_at": _parse_datetime(data["updated_at"]),
+    }
+
+def restore_formdata(db: Session, record: ArchivedFormData) -> FormData:
+    """Move an archived row back into formdata, within the caller's transaction."""
+    row = FormData(**unpack_archived_formdata(record))
+    db.delete(record)
+    db.add(row)
+    db.flush()
+    return row
+
+def restore_newest_formdata(db: Session, form_id: int):
+    """
+    After a form's latest row was deleted, bring back its newest archived row if that
+    is newer than what is left, so a form's latest row is always hot. Caller commits.
+    """
+    db.flush()
+    record = db.query(ArchivedFormData).filter(
+        ArchivedFormData.form_id == form_id
+    ).order_by(ArchivedFormData.id.desc()).first()
+    if record is None:
+        return
+    newest_hot = db.query(func.max(FormData.id)).filter(FormData.form_id == form_id).scalar()
+    if newest_hot is None or record.id > newest_hot:
+        restore_formdata(db, record)
+
+def _unpack_revisions(batch: ArchivedRevisionBatch) -> List[ArchivedRevision]:
+    return [
+        ArchivedRevision(item["version"], item["kind"], item["payload"], item["user_id"], _parse_datetime(item["created_at"]))
+        for item in decompress(batch.payload)
+    ]
+
+def load_archived_chain(db: Session, form_id: int, version: int) -> List[ArchivedRevision]:
+    """The archived snapshot at or before version plus the deltas after it, as _load_chain returns them."""
+    batches = db.query(ArchivedRevisionBatch).filter(
+        ArchivedRevisionBatch.form_id == form_id,
+        ArchivedRevisionBatch.first_version <= version
+    ).order_by(ArchivedRevisionBatch.first_version.desc())
+
+    chain: List[ArchivedRevision] = []
+    for batch in batches:
+        chain = [revision for revision in _unpack_revisions(batch) if revision.version <= version] + chain
+        snapshots = [index for index, revision in enumerate(chain) if revision.kind == "snapshot"]
+        if snapshots:
+            return chain[snapshots[-1]:]
+    return []
+
+def list_archived_revisions(db: Session, form_id: int) -> List[ArchivedRevision]:
+    batches = db.query(ArchivedRevisionBatch).filter(
+        ArchivedRevisionBatch.form_id == form_id
+    ).order_by(ArchivedRevisionBatch.first_version).all()
+    return [revision for batch in batches for revision in _unpack_revisions(batch)]
@@ -0,0 +1,158 @@
+"""
+Content-addressed storage for form elements.
+
+Each distinct element dict is canonicalised and stored once in form_element_blobs,
+keyed by its SHA-256 hash. A form revision is then just the ordered list of its
+element hashes, so saving a form where one element changed writes one new blob
+plus a short list of hashes instead of the whole form_elements array.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import hashlib
+import json
+import threading
+
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+
+from ..config import settings
+from ..models.element import FormElementBlob
+from ..services.metrics import metrics
+
+class MissingElementsError(RuntimeError):
+    """Stored element hashes that the element store cannot resolve; the form cannot be rebuilt."""
+
+class ElementCache:
+    """Thread-safe LRU map of content hash -> dict; holds elements here and themes in api/themes.py."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, element_hashes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        found = {}
+        with self._lock:
+            for element_hash in element_hashes:
+                element = self._items.get(element_hash)
+                if element is not None:
+                    self._items.move_to_end(element_hash)
+                    found[element_hash] = element
+        return found
+
+    def put_many(self, elements: Dict[str, Dict[str, Any]]):
+        with self._lock:
+            for element_hash, element in elements.items():
+                self._items[element_hash] = element
+                self._items.move_to_end(element_hash)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def __contains__(self, element_hash: str) -> bool:
+        with self._lock:
+            return element_hash in self._items
+
+# Only holds elements known to be committed, so a cache hit also means
+# the blob row exists and does not need to be written again
+element_cache = ElementCache(settings.ELEMENT_CACHE_SIZE)
+
+def canonical_element_json(element: Dict[str, Any]) -> str:
+    """Serialize an element so that equal elements always produce identical text."""
+    return json.dumps(element, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+def compute_element_hash(element: Dict[str, Any]) -> str:
+    """Return the content hash used as the element's key."""
+    return hashlib.sha256(canonical_element_json(element).encode("utf-8")).hexdigest()
+
+def _existing_hashes(db: Session, element_hashes: Sequence[str]) -> set:
+    if not element_hashes:
+        return set()
+    rows = db.query(FormElementBlob.element_hash).filter(
+        FormElementBlob.element_hash.in_(element_hashes)
+    ).all()
+    return {row[0] for row in rows}
+
+def store_elements(db: Session, elements: List[Dict[str, Any]]) -> List[str]:
+    """
+    Store any elements not already present and return the ordered list of their hashes.
+    Inserts are flushed but not committed, so they become part of the caller's transaction.
+    """
+    element_hashes = [compute_element_hash(element) for element in elements]
+    by_hash = dict(zip(element_hashes, elements))
+
+    # The cache is per worker, not per shard: with shards, elements cached from one shard
+    # may still be missing on the shard being written, so check that shard every time
+    if settings.shard_urls:
+        unknown = list(by_hash)
+    else:
+        unknown = [element_hash for element_hash in by_hash if element_hash not in element_cache]
+    missing = set(unknown) - _existing_hashes(db, unknown)
+
+    if missing:
+        try:
+            # Savepoint so a concurrent insert of the same element does not
+            # abort the caller's transaction
+            with db.begin_nested():
+                db.add_all(
+                    FormElementBlob(element_hash=element_hash, element_data=by_hash[element_hash])
+                    for element_hash in missing
+                )
+        except IntegrityError:
+            # Another writer stored some of them first; insert whatever is still missing
+            still_missing = missing - _existing_hashes(db, list(missing))
+            if still_missing:
+                with db.begin_nested():
+                    db.add_all(
+                        FormElementBlob(element_hash=element_hash, element_data=by_hash[element_hash])
+                        for element_hash in still_missing
+                    )
+
+    return element_hashes
+
+def pack_elements(db: Session, elements: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[List[str]]]:
+    """
+    Return the (inline elements, element hashes) pair to write for a revision.
+    With the element store disabled the elements stay inline and no hashes are stored.
+    """
+    if not settings.ELEMENT_STORE_ENABLED:
+        return elements, None
+    return [], store_elements(db, elements)
+
+def remember_elements(element_hashes: Optional[List[str]], elements: List[Dict[str, Any]]):
+    """Cache elements after the transaction that stored them has committed."""
+    if element_hashes is not None:
+        element_cache.put_many(dict(zip(element_hashes, elements)))
+
+def load_element_lists(db: Session, hash_lists: Sequence[Optional[List[str]]]) -> List[Optional[List[Dict[str, Any]]]]:
+    """
+    Reassemble several revisions at once.
+    All hashes not already cached are fetched with a single query. Raises MissingElementsError
+    rather than returning a form with elements left out.
+    """
+    wanted = {element_hash for hashes in hash_lists if hashes for element_hash in hashes}
+    found = element_cache.get_many(wanted)
+
+    missing = list(wanted - found.keys())
+    metrics.cache_hit("elements", len(found))
+    metrics.cache_miss("elements", len(missing))
+    if missing:
+        fetched = {
+            blob.element_hash: blob.element_data
+            for blob in db.query(FormElementBlob).filter(FormElementBlob.element_hash.in_(missing)).all()
+        }
+        element_cache.put_many(fetched)
+        found.update(fetched)
+
+    unresolved = wanted - found.keys()
+    if unresolved:
+        print(f"Error loading form elements: {len(unresolved)} element hashes are missing, e.g. {min(unresolved)}")
+        raise MissingElementsError(f"{len(unresolved)} form elements are missing from the element store")
+
+    return [
+        None if hashes is None else [found[element_hash] for element_hash in hashes]
+        for hashes in hash_lists
+    ]
+
+def load_elements(db: Session, element_hashes: Optional[List[str]]) -> Optional[List[Dict[str, Any]]]:
+    """Reassemble a single revision."""
+    return load_element_lists(db, [element_hashes])[0]
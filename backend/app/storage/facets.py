@@ -0,0 +1,187 @@
+"""
+Indexed element facets of each form's current version.
+
+Questions such as "forms with a file upload field", "forms with at least N
+required fields" or "forms offering option X" would otherwise mean loading and
+parsing every form's JSON. Every save instead rewrites the form's rows in two
+side tables within the same transaction:
+
+- form_element_facets: per element type, how many elements and how many of
+  them are required, plus a "*" row with the totals;
+- form_element_options: the distinct choice options, lowercased.
+
+Both are keyed by source ("formdata" for the latest row of each form_id in
+formdata, "forms" for the builder's forms table) and form_id. The queries read
+only these indexed rows. Element types and options are matched case-insensitively.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, exists, func, insert, select
+from sqlalchemy.orm import Session, aliased
+
+from ..models.element_facet import FormElementFacet
+from ..models.element_option import FormElementOption
+from ..models.form import Form
+from ..models.formdata import FormData
+from .elements import load_element_lists
+
+TOTAL = "*"
+SOURCES = ("formdata", "forms")
+
+def normalize_type(element_type: Any) -> str:
+    return str(element_type or "unknown").strip().lower()[:64]
+
+def normalize_option(option: str) -> str:
+    return option.strip().lower()[:255]
+
+def extract_facets(elements: Iterable[Dict[str, Any]]) -> Tuple[Dict[str, List[int]], Set[str]]:
+    """Return ({element type or "*": [elements, required elements]}, distinct options)."""
+    counts = {TOTAL: [0, 0]}
+    options = set()
+    for element in elements:
+        if not isinstance(element, dict):
+            continue
+        required = 1 if element.get("required") else 0
+        for key in (TOTAL, normalize_type(element.get("type"))):
+            count = counts.setdefault(key, [0, 0])
+            count[0] += 1
+            count[1] += required
+        for option in element.get("options") or []:
+            if isinstance(option, str) and option.strip():
+                options.add(normalize_option(option))
+    return counts, options
+
+def drop_form_facets(db: Session, source: str, form_id: int):
+    for model in (FormElementFacet, FormElementOption):
+        db.execute(delete(model).where(model.source == source, model.form_id == form_id))
+
+def index_form_elements(db: Session, source: str, form_id: int, user_id: int, elements: List[Dict[str, Any]]):
+    """Replace a form's facet rows, within the caller's transaction."""
+    drop_form_facets(db, source, form_id)
+    counts, options = extract_facets(elements)
+    db.execute(insert(FormElementFacet), [
+        {
+            "source": source,
+            "form_id": form_id,
+            "element_type": element_type,
+            "user_id": user_id,
+            "element_count": element_count,
+            "required_count": required_count,
+        }
+        for element_type, (element_count, required_count) in counts.items()
+    ])
+    if options:
+        # Options that only differ in accents collide under MySQL's default collation; one row is enough
+        db.execute(
+            insert(FormElementOption).prefix_with("IGNORE", dialect="mysql").prefix_with("OR IGNORE", dialect="sqlite"),
+            [{"source": source, "form_id": form_id, "option_value": option, "user_id": user_id} for option in sorted(options)]
+        )
+
+def is_latest_formdata(db: Session, row: FormData) -> bool:
+    """Whether a formdata row is the one GET /formdata/{form_id} returns for its form: the one with the highest id."""
+    newer = db.query(exists().where(FormData.form_id == row.form_id, FormData.id > row.id)).scalar()
+    return not newer
+
+def reindex_latest_formdata(db: Session, form_id: int):
+    """Index whichever formdata row is now the form's latest, after a delete. Caller commits."""
+    db.flush()
+    row = db.query(FormData).filter(FormData.form_id == form_id).order_by(FormData.id.desc()).first()
+    if row is None:
+        drop_form_facets(db, "formdata", form_id)
+        return
+    elements = load_element_lists(db, [row.element_hashes])[0]
+    index_form_elements(db, "formdata", form_id, row.user_id, row.form_elements if elements is None else elements)
+
+def rebuild_facets(db: Session, source: str, batch_size: int, on_batch: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Index every current form of a source, batch_size forms per transaction; returns the number
+    of forms, which is also passed to on_batch after every batch.
+    """
+    indexed, last_form_id = 0, None
+    while True:
+        if source == "formdata":
+            latest = db.query(func.max(FormData.id)).group_by(FormData.form_id)
+            if last_form_id is not None:
+                latest = latest.filter(FormData.form_id > last_form_id)
+            latest_ids = [row_id for (row_id,) in latest.order_by(FormData.form_id).limit(batch_size)]
+            rows = db.query(FormData).filter(FormData.id.in_(latest_ids)).order_by(FormData.form_id).all()
+            documents = [(row.form_id, row.user_id, row.form_elements, row.element_hashes) for row in rows]
+        else:
+            query = db.query(Form)
+            if last_form_id is not None:
+                query = query.filter(Form.form_id > last_form_id)
+            rows = query.order_by(Form.form_id).limit(batch_size).all()
+            documents = [(row.form_id, row.user_id, row.form_data, row.element_hashes) for row in rows]
+        if not documents:
+            return indexed
+
+        stored_elements = load_element_lists(db, [element_hashes for _, _, _, element_hashes in documents])
+        for (form_id, user_id, inline, _), elements in zip(documents, stored_elements):
+            index_form_elements(db, source, form_id, user_id, (inline or []) if elements is None else elements)
+        db.commit()
+        indexed += len(documents)
+        last_form_id = documents[-1][0]
+        if on_batch is not None:
+            on_batch(indexed)
+
+def find_forms(
+    db: Session,
+    source: str,
+    element_type: Optional[str] = None,
+    min_count: int = 1,
+    max_count: Optional[int] = None,
+    min_required: Optional[int] = None,
+    option: Optional[str] = None,
+    user_id: Optional[int] = None,
+    limit: int = 100
+) -> List[FormElementFacet]:
+    """The "*" rows of the forms matching every given condition, by form_id."""
+    totals = aliased(FormElementFacet)
+    query = db.query(totals).filter(totals.source == source, totals.element_type == TOTAL)
+    if user_id is not None:
+        query = query.filter(totals.user_id == user_id)
+    if min_required is not None:
+        query = query.filter(totals.required_count >= min_required)
+    if element_type is not None:
+        by_type = select(FormElementFacet.form_id).where(
+            FormElementFacet.source == source,
+            FormElementFacet.element_type == normalize_type(element_type),
+            FormElementFacet.element_count >= min_count
+        )
+        if max_count is not None:
+            by_type = by_type.where(FormElementFacet.element_count <= max_count)
+        query = query.filter(totals.form_id.in_(by_type))
+    if option is not None:
+        query = query.filter(totals.form_id.in_(
+            select(FormElementOption.form_id).where(
+                FormElementOption.source == source,
+                FormElementOption.option_value == normalize_option(option)
+            )
+        ))
+    return query.order_by(totals.form_id).limit(limit).all()
+
+def element_types_of(db: Session, source: str, form_ids: List[int]) -> Dict[int, Dict[str, Dict[str, int]]]:
+    """{form_id: {element type: {"elements": n, "required": n}}} for the given forms."""
+    if not form_ids:
+        return {}
+    rows = db.query(FormElementFacet).filter(
+        FormElementFacet.source == source,
+        FormElementFacet.form_id.in_(form_ids),
+        FormElementFacet.element_type != TOTAL
+    ).all()
+    types: Dict[int, Dict[str, Dict[str, int]]] = {form_id: {} for form_id in form_ids}
+    for row in rows:
+        types[row.form_id][row.element_type] = {"elements": row.element_count, "required": row.required_count}
+    return types
+
+def summarize_element_types(db: Session, source: str, user_id: Optional[int] = None) -> List[Tuple[str, int, int, int]]:
+    """(element type, forms using it, elements, required elements) across forms."""
+    query = db.query(
+        FormElementFacet.element_type,
+        func.count(),
+        func.sum(FormElementFacet.element_count),
+        func.sum(FormElementFacet.required_count)
+    ).filter(FormElementFacet.source == source, FormElementFacet.element_type != TOTAL)
+    if user_id is not None:
+        query = query.filter(FormElementFacet.user_id == user_id)
+    return [tuple(row) for row in query.group_by(FormElementFacet.element_type).all()]
@@ -0,0 +1,8 @@
+import os
+
+def write_atomic(path: str, data: bytes):
+    """Write a file so that readers never observe a partially written file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
@@ -0,0 +1,206 @@
+"""
+DB-API connections for the routers that use raw SQL, on either storage backend.
+
+Queries are written once in pymysql's format paramstyle (%s placeholders) and
+translated to SQLite's qmark style when needed. Rows are always dicts. The few
+statements that differ between MySQL and SQLite live behind the helper methods
+of RawConnection.
+"""
+from typing import Any, Dict, List, Optional
+import sqlite3
+import time
+
+from ..config import settings
+from ..services.querytrace import record_query
+
+def apply_sqlite_pragmas(connection):
+    """
+    Tune a new SQLite connection. WAL lets readers run alongside the single writer,
+    and synchronous=NORMAL is durable across application crashes in WAL mode.
+    """
+    cursor = connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute(f"PRAGMA cache_size={-int(settings.SQLITE_CACHE_SIZE_KB)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE_BYTES)}")
+    cursor.close()
+
+def _to_qmark(query: str) -> str:
+    return query.replace("%s", "?").replace("%%", "%")
+
+# Statements that need the write lock, or (SAVEPOINT) are about to
+_WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE", "SAVEPOINT")
+
+def is_write_statement(statement: str) -> bool:
+    return statement.lstrip()[:9].upper().startswith(_WRITE_PREFIXES)
+
+def sqlite_begin_statement(first_statement: str) -> str:
+    """
+    Transactions that start by writing take the write lock up front with BEGIN IMMEDIATE,
+    so concurrent writers queue on busy_timeout. Transactions that start by reading stay
+    deferred and, in WAL mode, never wait for writers.
+    """
+    return "BEGIN IMMEDIATE" if is_write_statement(first_statement) else "BEGIN"
+
+class RawCursor:
+    """Cursor returning dict rows, reporting each statement to the request's query trace."""
+
+    def __init__(self, cursor, dialect: str, connection=None):
+        self._cursor = cursor
+        self._dialect = dialect
+        self._connection = connection
+        if dialect == "sqlite":
+            cursor.row_factory = sqlite3.Row
+
+    def _statement(self, query: str, args: Any) -> str:
+        # Like pymysql, placeholders are only interpreted when arguments are given
+        if self._dialect == "sqlite" and args is not None:
+            return _to_qmark(query)
+        return query
+
+    def _begin_if_writing(self, query: str):
+        # Reads outside a transaction run in autocommit mode, as with pymysql
+        if self._dialect == "sqlite" and not self._connection.in_transaction and is_write_statement(query):
+            self._cursor.execute("BEGIN IMMEDIATE")
+
+    def execute(self, query: str, args: Any = None):
+        self._begin_if_writing(query)
+        start = time.perf_counter()
+        try:
+            if args is None:
+                return self._cursor.execute(self._statement(query, args))
+            return self._cursor.execute(self._statement(query, args), args)
+        finally:
+            record_query(query, args, time.perf_counter() - start)
+
+    def executemany(self, query: str, args: Any):
+        self._begin_if_writing(query)
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(self._statement(query, args), args)
+        finally:
+            record_query(query, args, time.perf_counter() - start)
+
+    def _as_dict(self, row) -> Optional[Dict[str, Any]]:
+        if row is None or isinstance(row, dict):
+            return row
+        return dict(row)
+
+    def fetchone(self) -> Optional[Dict[str, Any]]:
+        return self._as_dict(self._cursor.fetchone())
+
+    def fetchall(self) -> List[Dict[str, Any]]:
+        return [self._as_dict(row) for row in self._cursor.fetchall()]
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class RawConnection:
+    """
+    A pymysql or sqlite3 connection behind one interface.
+    SQLite connections are borrowed from the engine's pool and returned to it on close.
+    """
+
+    def __init__(self, connection, dialect: str):
+        self._connection = connection
+        self.dialect = dialect
+        self._closed = False
+        # DB-API connections expose their module's exception classes
+        self.Error = connection.Error
+        self.IntegrityError = connection.IntegrityError
+
+    def cursor(self) -> RawCursor:
+        return RawCursor(self._connection.cursor(), self.dialect, self._connection)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    @property
+    def open(self) -> bool:
+        if self.dialect == "mysql":
+            return self._connection.open
+        return not self._closed
+
+    def close(self):
+        self._closed = True
+        self._connection.close()
+
+    def table_exists(self, table: str) -> bool:
+        with self.cursor() as cursor:
+            if self.dialect == "sqlite":
+                cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = %s", (table,))
+            else:
+                cursor.execute("SHOW TABLES LIKE %s", (table,))
+            return cursor.fetchone() is not None
+
+    def describe_table(self, table: str) -> List[Dict[str, Any]]:
+        """Column name, type, nullability, key, default and extra, as MySQL's DESCRIBE reports them."""
+        if not table.replace("_", "").isalnum():
+            raise ValueError(f"Invalid table name: {table}")
+
+        with self.cursor() as cursor:
+            if self.dialect == "sqlite":
+                cursor.execute(f"PRAGMA table_info({table})")
+                return [
+                    {
+                        "name": column["name"],
+                        "type": column["type"],
+                        "null": "NO" if column["notnull"] else "YES",
+                        "key": "PRI" if column["pk"] else "",
+                        "default": column["dflt_value"],
+                        "extra": "",
+                    }
+                    for column in cursor.fetchall()
+                ]
+
+            cursor.execute(f"DESCRIBE {table}")
+            return [
+                {
+                    "name": column["Field"],
+                    "type": column["Type"],
+                    "null": column["Null"],
+                    "key": column["Key"],
+                    "default": column["Default"],
+                    "extra": column["Extra"],
+                }
+                for column in cursor.fetchall()
+            ]
+
+    def cast_integer(self, expression: str) -> str:
+        """SQL casting expression to an integer, for numeric ordering of string ids."""
+        if self.dialect == "sqlite":
+            return f"CAST({expression} AS INTEGER)"
+        return f"CAST({expression} AS UNSIGNED)"
+
+def connect_mysql() -> RawConnection:
+    import pymysql
+
+    connection = pymysql.connect(
+        host=settings.DB_HOST,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        port=settings.DB_PORT,
+        database=settings.DB_NAME,
+        cursorclass=pymysql.cursors.DictCursor
+    )
+    return RawConnection(connection, "mysql")
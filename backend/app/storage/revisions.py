@@ -0,0 +1,216 @@
+"""
+Delta-compressed version history for forms.
+
+A revision's state is the form's name, description, theme hash and ordered elements.
+Consecutive revisions are stored as structural diffs keyed by element id, with a full
+snapshot at least every REVISION_SNAPSHOT_INTERVAL revisions, so rebuilding any
+version reads one snapshot plus a bounded number of deltas.
+"""
+from typing import Any, Dict, List, Optional
+import json
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+
+from ..config import settings
+from ..models.revision import FormRevision
+from .archive import list_archived_revisions, load_archived_chain
+
+META_FIELDS = ("form_name", "form_description", "theme_hash")
+
+# Attempts at claiming the next version number when writers race on the same form
+MAX_RECORD_ATTEMPTS = 3
+
+def build_state(form_name: str, form_description: Optional[str], theme_hash: Optional[str],
+                elements: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the revision state stored for a form."""
+    return {
+        "form_name": form_name,
+        "form_description": form_description,
+        "theme_hash": theme_hash,
+        "elements": elements,
+    }
+
+def _keyed_by_id(elements: List[Dict[str, Any]]) -> bool:
+    """Deltas need every element to carry a unique id."""
+    ids = [element.get("id") for element in elements]
+    return all(isinstance(element_id, str) for element_id in ids) and len(set(ids)) == len(ids)
+
+def diff_states(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return the structural diff that turns old into new.
+    Keys are only present when something changed: meta, upserts, removed and order.
+    """
+    delta: Dict[str, Any] = {}
+
+    meta = {field: new.get(field) for field in META_FIELDS if old.get(field) != new.get(field)}
+    if meta:
+        delta["meta"] = meta
+
+    old_by_id = {element["id"]: element for element in old["elements"]}
+    new_by_id = {element["id"]: element for element in new["elements"]}
+
+    upserts = [element for element in new["elements"] if old_by_id.get(element["id"]) != element]
+    if upserts:
+        delta["upserts"] = upserts
+
+    removed = [element_id for element_id in old_by_id if element_id not in new_by_id]
+    if removed:
+        delta["removed"] = removed
+
+    # Only record the order when it differs from what apply_delta infers
+    # (surviving elements keep their place, new ones are appended)
+    new_order = [element["id"] for element in new["elements"]]
+    inferred_order = [element_id for element_id in old_by_id if element_id in new_by_id]
+    inferred_order += [element_id for element_id in new_order if element_id not in old_by_id]
+    if inferred_order != new_order:
+        delta["order"] = new_order
+
+    return delta
+
+def apply_delta(state: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the state produced by applying delta to state."""
+    new_state = dict(state)
+    new_state.update(delta.get("meta", {}))
+
+    by_id = {element["id"]: element for element in state["elements"]}
+    order = list(by_id)
+
+    for element_id in delta.get("removed", []):
+        by_id.pop(element_id, None)
+    for element in delta.get("upserts", []):
+        if element["id"] not in by_id:
+            order.append(element["id"])
+        by_id[element["id"]] = element
+
+    if "order" in delta:
+        order = delta["order"]
+
+    new_state["elements"] = [by_id[element_id] for element_id in order if element_id in by_id]
+    return new_state
+
+def _load_chain(db: Session, form_id: int, version: int) -> List[FormRevision]:
+    """Load the nearest snapshot at or before version plus the deltas after it."""
+    checkpoint = db.query(func.max(FormRevision.version)).filter(
+        FormRevision.form_id == form_id,
+        FormRevision.kind == "snapshot",
+        FormRevision.version <= version
+    ).scalar()
+
+    if checkpoint is None:
+        # Versions before the oldest hot snapshot have been moved to the archive
+        return load_archived_chain(db, form_id, version)
+
+    return db.query(FormRevision).filter(
+        FormRevision.form_id == form_id,
+        FormRevision.version >= checkpoint,
+        FormRevision.version <= version
+    ).order_by(FormRevision.version).all()
+
+def _replay(chain: List[FormRevision]) -> Optional[Dict[str, Any]]:
+    if not chain:
+        return None
+    state = chain[0].payload
+    for revision in chain[1:]:
+        state = apply_delta(state, revision.payload)
+    return state
+
+def get_revision_state(db: Session, form_id: int, version: int) -> Optional[Dict[str, Any]]:
+    """
+    Rebuild the form as of version, or None if that version does not exist.
+    Reads at most REVISION_SNAPSHOT_INTERVAL rows.
+    """
+    chain = _load_chain(db, form_id, version)
+    if not chain or chain[-1].version != version:
+        return None
+    return _replay(chain)
+
+def latest_version(db: Session, form_id: int, lock: bool = False) -> Optional[int]:
+    """
+    Return the newest version number of a form, or None when it has no history.
+    With lock, the newest revision is read with SELECT ... FOR UPDATE, which sees rows committed
+    after the transaction's snapshot (MySQL REPEATABLE READ) and holds off other writers of the form.
+    """
+    if not lock:
+        return db.query(func.max(FormRevision.version)).filter(FormRevision.form_id == form_id).scalar()
+    return db.query(FormRevision.version).filter(
+        FormRevision.form_id == form_id
+    ).order_by(FormRevision.version.desc()).limit(1).with_for_update().scalar()
+
+def _payload_size(payload: Dict[str, Any]) -> int:
+    return len(json.dumps(payload, separators=(",", ":")))
+
+def record_revision(db: Session, form_id: int, user_id: int, state: Dict[str, Any]) -> int:
+    """
+    Append state to the form's history and return its version.
+    Saves that change nothing do not create a revision. The insert is flushed but not
+    committed, so it becomes part of the caller's transaction.
+    """
+    for attempt in range(MAX_RECORD_ATTEMPTS):
+        # After losing a race, plain reads in this transaction may still miss the winner's revision.
+        # The retry finds the version with a locking read and stores a snapshot, which needs no chain.
+        retrying = attempt > 0
+        previous_version = latest_version(db, form_id, lock=retrying)
+        version = 1 if previous_version is None else previous_version + 1
+
+        kind, payload = "snapshot", state
+        if previous_version is not None and not retrying:
+            chain = _load_chain(db, form_id, previous_version)
+            previous_state = _replay(chain)
+            if previous_state == state:
+                return previous_version
+
+            since_snapshot = version - chain[0].version
+            if (
+                since_snapshot < settings.REVISION_SNAPSHOT_INTERVAL
+                and _keyed_by_id(previous_state["elements"])
+                and _keyed_by_id(state["elements"])
+            ):
+                delta = diff_states(previous_state, state)
+                # A delta that is no smaller than the snapshot buys nothing
+                if _payload_size(delta) < _payload_size(state):
+                    kind, payload = "delta", delta
+
+        try:
+            # Savepoint so losing a race for the version number only retries this insert
+            with db.begin_nested():
+                db.add(FormRevision(
+                    form_id=form_id,
+                    version=version,
+                    kind=kind,
+                    payload=payload,
+                    user_id=user_id
+                ))
+            return version
+        except IntegrityError:
+            if attempt == MAX_RECORD_ATTEMPTS - 1:
+                raise
+
+def list_revisions(db: Session, form_id: int) -> List[Dict[str, Any]]:
+    """List a form's revisions without loading the payloads of those that are still hot."""
+    rows = db.query(
+        FormRevision.version,
+        FormRevision.kind,
+        FormRevision.user_id,
+        FormRevision.created_at
+    ).filter(FormRevision.form_id == form_id).order_by(FormRevision.version).all()
+
+    return [
+        {"version": row.version, "kind": row.kind, "user_id": row.user_id, "created_at": row.created_at}
+        for row in list_archived_revisions(db, form_id) + rows
+    ]
+
+def describe_diff(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a readable diff between two states, splitting upserts into added and changed elements."""
+    old_ids = {element["id"] for element in old["elements"]}
+    delta = diff_states(old, new)
+    upserts = delta.get("upserts", [])
+
+    return {
+        "meta": delta.get("meta", {}),
+        "added": [element for element in upserts if element["id"] not in old_ids],
+        "changed": [element for element in upserts if element["id"] in old_ids],
+        "removed": delta.get("removed", []),
+        "order": delta.get("order"),
+    }
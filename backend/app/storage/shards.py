@@ -0,0 +1,284 @@
+"""
+Horizontal sharding of form storage by user_id.
+
+forms, formdata, form_revisions, their archived history and element facets,
+and the theme and element stores their rows reference live on the shard that
+owns the user. The owner comes from the
+shard_assignments table on the primary database. It is recorded at the user's
+first write (user_id modulo the number of shards) and only changed by
+reshard_user.py, so adding shards never moves existing users.
+
+Lookups by form or row id do not carry the user. They try the shard that
+answered last time and fan out to the others on a miss. New rows take their
+ids from a per-shard sequence starting at the shard's own block
+(SHARD_ID_BLOCK), so ids stay unique when a user's rows move between shards.
+
+Without SHARD_URLS there is a single shard: the primary database, with read
+replica routing as configured.
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import threading
+import time
+
+from fastapi import HTTPException, status
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..config import settings
+from ..database import Base, create_engine_for_url, get_engine, open_session
+from ..models.archived_formdata import ArchivedFormData
+from ..models.archived_revision import ArchivedRevisionBatch
+from ..models.element import FormElementBlob
+from ..models.element_facet import FormElementFacet
+from ..models.element_option import FormElementOption
+from ..models.form import Form
+from ..models.formdata import FormData
+from ..models.revision import FormRevision
+from ..models.shard_assignment import ShardAssignment
+from ..models.shard_id_sequence import ShardIdSequence
+from ..models.theme import Theme
+
+# Tables whose rows belong to one user, and the shared content-addressed stores they reference
+USER_TABLES = (Form.__table__, FormData.__table__, FormRevision.__table__)
+CONTENT_TABLES = (Theme.__table__, FormElementBlob.__table__)
+# Archived history of a user's rows, keyed by the ids the rows had in USER_TABLES
+ARCHIVE_TABLES = (ArchivedFormData.__table__, ArchivedRevisionBatch.__table__)
+# Element facets of a user's forms, derived from USER_TABLES on every save
+FACET_TABLES = (FormElementFacet.__table__, FormElementOption.__table__)
+# Every table holding a user's rows, moved together by reshard_user.py
+MOVED_TABLES = USER_TABLES + ARCHIVE_TABLES + FACET_TABLES
+
+class ShardRouter:
+    def __init__(self):
+        self._engines = None
+        self._sessionmakers: List[sessionmaker] = []
+        self._lock = threading.Lock()
+        self._directory_ready = False
+        # user_id -> (expires at, shard, shard being moved to, whether the directory has a row)
+        self._assignments: "OrderedDict[int, Tuple[float, int, Optional[int], bool]]" = OrderedDict()
+        # Lookup key -> shard that last answered it
+        self._located: "OrderedDict[Hashable, int]" = OrderedDict()
+
+    @property
+    def sharded(self) -> bool:
+        return bool(settings.shard_urls)
+
+    @property
+    def count(self) -> int:
+        return len(settings.shard_urls) or 1
+
+    def engines(self) -> list:
+        """The shard engines, created on first use."""
+        if not self.sharded:
+            return [get_engine()]
+        if self._engines is None:
+            with self._lock:
+                if self._engines is None:
+                    engines = [create_engine_for_url(url) for url in settings.shard_urls]
+                    self._sessionmakers = [sessionmaker(bind=engine, autocommit=False, autoflush=False) for engine in engines]
+                    self._engines = engines
+        return self._engines
+
+    def open_session(self, shard: int) -> Session:
+        if not self.sharded:
+            return open_session()
+        self.engines()
+        return self._sessionmakers[shard]()
+
+    def dispose(self):
+        if self._engines is not None:
+            for engine in self._engines:
+                engine.dispose()
+
+    def _ensure_directory(self):
+        if not self._directory_ready:
+            ShardAssignment.__table__.create(get_engine(), checkfirst=True)
+            self._directory_ready = True
+
+    def _lookup(self, user_id: int) -> Tuple[float, int, Optional[int], bool]:
+        cached = self._assignments.get(user_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached
+
+        self._ensure_directory()
+        with get_engine().connect() as connection:
+            row = connection.execute(
+                select(ShardAssignment.shard, ShardAssignment.moving_to).where(ShardAssignment.user_id == user_id)
+            ).first()
+        shard, moving_to = (row.shard, row.moving_to) if row else (user_id % self.count, None)
+        entry = (time.monotonic() + settings.SHARD_MAP_TTL_SECONDS, shard, moving_to, row is not None)
+        self._cache_assignment(user_id, entry)
+        return entry
+
+    def _cache_assignment(self, user_id: int, entry: Tuple[float, int, Optional[int], bool]):
+        with self._lock:
+            self._assignments[user_id] = entry
+            self._assignments.move_to_end(user_id)
+            if len(self._assignments) > settings.SHARD_MAP_CACHE_SIZE:
+                self._assignments.popitem(last=False)
+
+    def assignment(self, user_id: int) -> Tuple[int, Optional[int]]:
+        """(shard, shard being moved to) for a user, cached for SHARD_MAP_TTL_SECONDS."""
+        if not self.sharded:
+            return 0, None
+        _, shard, moving_to, _ = self._lookup(user_id)
+        return shard, moving_to
+
+    def forget(self, user_id: int):
+        with self._lock:
+            self._assignments.pop(user_id, None)
+
+    def shard_for_user(self, user_id: int) -> int:
+        return self.assignment(user_id)[0]
+
+    def shard_for_write(self, user_id: int) -> int:
+        """
+        The user's shard, recording the assignment if this is the user's first write.
+        Raises 503 while the user is being moved to another shard.
+        """
+        if not self.sharded:
+            return 0
+        expires, shard, moving_to, recorded = self._lookup(user_id)
+        if moving_to is not None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Your forms are being moved, please retry shortly",
+                headers={"Retry-After": str(max(1, int(settings.SHARD_MAP_TTL_SECONDS)))}
+            )
+        if not recorded:
+            try:
+                with get_engine().begin() as connection:
+                    connection.execute(insert(ShardAssignment).values(user_id=user_id, shard=shard))
+            except IntegrityError:
+                # Assigned meanwhile by another worker, possibly elsewhere
+                self.forget(user_id)
+                return self.shard_for_write(user_id)
+            self._cache_assignment(user_id, (expires, shard, moving_to, True))
+        return shard
+
+    def search_order(self, key: Hashable) -> List[int]:
+        """Shards to try for a lookup by id: the one that answered last time first."""
+        shards = list(range(self.count))
+        known = self._located.get(key)
+        if known is not None and known < self.count:
+            shards.remove(known)
+            shards.insert(0, known)
+        return shards
+
+    def remember(self, key: Hashable, shard: int):
+        if not self.sharded:
+            return
+        with self._lock:
+            self._located[key] = shard
+            self._located.move_to_end(key)
+            if len(self._located) > settings.SHARD_LOCATOR_CACHE_SIZE:
+                self._located.popitem(last=False)
+
+shard_router = ShardRouter()
+
+class ShardSessions:
+    """The shard sessions opened for one request, closed together when it ends."""
+
+    def __init__(self, router: ShardRouter = shard_router):
+        self.router = router
+        self._sessions: Dict[int, Session] = {}
+
+    def shard(self, index: int) -> Session:
+        if index not in self._sessions:
+            self._sessions[index] = self.router.open_session(index)
+        return self._sessions[index]
+
+    def for_user(self, user_id: int, writing: bool = False) -> Session:
+        index = self.router.shard_for_write(user_id) if writing else self.router.shard_for_user(user_id)
+        return self.shard(index)
+
+    def owns(self, index: int, user_id: int) -> bool:
+        """Whether a shard owns a user's rows, as opposed to holding a copy left by a move."""
+        return not self.router.sharded or self.router.shard_for_user(user_id) == index
+
+    def all(self) -> List[Session]:
+        """A session on every shard, for listings across all users."""
+        return [self.shard(index) for index in range(self.router.count)]
+
+    def find(self, key: Hashable, lookup: Callable[[Session], Any]) -> Tuple[Session, Any]:
+        """
+        Run a lookup for a row owned by a user on the shards until one returns it.
+        Rows found on a shard that no longer owns their user, left behind by a move
+        that is finishing, are skipped. Returns (session of that shard, row), or
+        (first shard's session, None) when no shard has it.
+        """
+        for index in self.router.search_order(key):
+            db = self.shard(index)
+            row = lookup(db)
+            if row is None:
+                continue
+            if not self.owns(index, row.user_id):
+                continue
+            self.router.remember(key, index)
+            return db, row
+        return self.shard(0), None
+
+    def first(self, lookup: Callable[[Session], Any]) -> Any:
+        """The first non-empty result of a lookup across shards, for content-addressed data."""
+        for db in self.all():
+            result = lookup(db)
+            if result:
+                return result
+        return None
+
+    def close(self):
+        for db in self._sessions.values():
+            db.close()
+        self._sessions.clear()
+
+# Dependency giving an endpoint the sessions for the shards it touches
+def get_shards():
+    shards = ShardSessions()
+    try:
+        yield shards
+    finally:
+        shards.close()
+
+def allocate_id(connection, table_name: str) -> int:
+    """Take a shard's next id for one of its tables, within the caller's transaction."""
+    sequences = ShardIdSequence.__table__
+    connection.execute(
+        update(sequences).where(sequences.c.table_name == table_name).values(last_id=sequences.c.last_id + 1)
+    )
+    allocated = connection.execute(select(sequences.c.last_id).where(sequences.c.table_name == table_name)).scalar()
+    if allocated is None:
+        raise RuntimeError(f"Shard has no id sequence for {table_name}; run python -m app.init_db")
+    return allocated
+
+def _assign_shard_id(mapper, connection, target):
+    if not shard_router.sharded:
+        return
+    key = mapper.primary_key[0].key
+    if getattr(target, key) is None:
+        setattr(target, key, allocate_id(connection, mapper.local_table.name))
+
+for _model in (Form, FormData, FormRevision):
+    event.listen(_model, "before_insert", _assign_shard_id)
+
+def init_shards():
+    """Create the form tables on every shard and start each shard's ids at its own block."""
+    if not shard_router.sharded:
+        return
+    ShardAssignment.__table__.create(get_engine(), checkfirst=True)
+    sequences = ShardIdSequence.__table__
+    for index, engine in enumerate(shard_router.engines()):
+        Base.metadata.create_all(engine, tables=list(MOVED_TABLES + CONTENT_TABLES) + [sequences])
+        start = index * settings.SHARD_ID_BLOCK
+        with engine.begin() as connection:
+            for table in USER_TABLES:
+                if connection.execute(select(sequences.c.last_id).where(sequences.c.table_name == table.name)).first():
+                    continue
+                # A shard that already holds rows, such as the former single database, continues after them
+                key = list(table.primary_key.columns)[0]
+                last_id = connection.execute(
+                    select(func.max(key)).where(key > start, key <= start + settings.SHARD_ID_BLOCK)
+                ).scalar() or start
+                connection.execute(insert(sequences).values(table_name=table.name, last_id=last_id))
+        print(f"Shard {index} ready, ids from {start + 1} to {start + settings.SHARD_ID_BLOCK}")
@@ -0,0 +1,282 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import warnings
+from datetime import timedelta
+
+# Payload sizes, in form elements, for the size-dependent benchmarks
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+
+# Relative slowdown of the median that counts as a regression
+DEFAULT_THRESHOLD = float(os.getenv("BENCHMARK_REGRESSION_THRESHOLD", "0.10"))
+
+def make_elements(count):
+    """Form elements shaped like the ones the builder sends."""
+    types = ["text", "email", "url", "select", "checkbox", "textarea"]
+    return [
+        {
+            "id": f"field-{index}",
+            "type": types[index % len(types)],
+            "label": f"Question {index}",
+            "placeholder": "Type your answer",
+            "options": [f"Option {option}" for option in range(4)] if index % len(types) == 3 else [],
+            "required": index % 2 == 0,
+            "validation": {"required": index % 2 == 0},
+            "value": "",
+            "size": "normal",
+        }
+        for index in range(count)
+    ]
+
+def make_form_data_payload(count):
+    return {
+        "form_id": 1,
+        "form_name": "Benchmark form",
+        "form_description": "Generated for benchmarking",
+        "form_elements": make_elements(count),
+        "form_theme": {
+            "primaryColor": "#3B82F6",
+            "backgroundColor": "#FFFFFF",
+            "textColor": "#1F2937",
+            "borderRadius": "0.375rem",
+            "fontFamily": "Inter, sans-serif",
+            "layout": "default",
+            "style": "flat",
+        },
+        "user_id": 1,
+    }
+
+def make_form_create_payload(count):
+    fields = [
+        {key: element[key] for key in ("id", "type", "label", "required", "placeholder", "options", "value")}
+        for element in make_elements(count)
+    ]
+    return {"form_name": "Benchmark form", "fields": fields, "user_id": 1}
+
+# Each benchmark takes a payload size (or None) and returns the callable to time
+
+def bench_validate_form_data_create(size):
+    from app.routers.formdata import FormDataCreate
+
+    payload = make_form_data_payload(size)
+    return lambda: FormDataCreate(**payload)
+
+def bench_validate_form_create_request(size):
+    from app.routers.forms import FormCreateRequest
+
+    payload = make_form_create_payload(size)
+    return lambda: FormCreateRequest(**payload)
+
+def bench_element_dict(size):
+    from app.routers.formdata import FormDataCreate
+
+    form_data = FormDataCreate(**make_form_data_payload(size))
+    return lambda: [element.dict() for element in form_data.form_elements]
+
+def bench_json_encoded_dict_round_trip(size):
+    from app.models.form import JSONEncodedDict
+
+    column_type = JSONEncodedDict()
+    elements = make_elements(size)
+    return lambda: column_type.process_result_value(column_type.process_bind_param(elements, None), None)
+
+def make_response_rows(size):
+    """Twenty serialized form data rows, as the user listing endpoint returns them."""
+    from datetime import datetime
+
+    payload = make_form_data_payload(size)
+    return [
+        {
+            "id": index,
+            "form_id": index,
+            "form_name": payload["form_name"],
+            "form_description": payload["form_description"],
+            "form_elements": payload["form_elements"],
+            "form_theme": payload["form_theme"],
+            "theme_hash": None,
+            "theme_css_url": None,
+            "user_id": 1,
+            "created_at": datetime(2024, 1, 1),
+            "updated_at": None,
+        }
+        for index in range(20)
+    ]
+
+def bench_compressed_json_round_trip(size):
+    from app.models.custom_types import decode_json, encode_json
+
+    elements = make_elements(size)
+    return lambda: decode_json(encode_json(elements))
+
+def bench_response_validated(size):
+    from typing import List
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from app.routers.formdata import FormDataResponse
+
+    # What FastAPI does with a response_model: validate, dump, then encode
+    adapter = TypeAdapter(List[FormDataResponse])
+    rows = make_response_rows(size)
+    return lambda: json.dumps(jsonable_encoder(adapter.dump_python(adapter.validate_python(rows), mode="json"))).encode("utf-8")
+
+def bench_response_trusted(size):
+    from app.responses import TrustedJSONResponse
+
+    rows = make_response_rows(size)
+    return lambda: TrustedJSONResponse(rows).body
+
+def bench_create_access_token(size):
+    from app.security import create_access_token
+
+    return lambda: create_access_token({"sub": "1"}, timedelta(minutes=30))
+
+def bench_decode_access_token(size):
+    from app.security import create_access_token, decode_access_token
+
+    token = create_access_token({"sub": "1"}, timedelta(minutes=30))
+    return lambda: decode_access_token(token)
+
+def bench_bcrypt_hash(size):
+    from app.security import hash_password
+
+    return lambda: hash_password("correct horse battery staple")
+
+def bench_bcrypt_verify(size):
+    from app.security import hash_password, verify_password
+
+    hashed = hash_password("correct horse battery staple")
+    return lambda: verify_password("correct horse battery staple", hashed)
+
+# name -> (setup function, whether it runs once per payload size)
+BENCHMARKS = {
+    "validate.FormDataCreate": (bench_validate_form_data_create, True),
+    "validate.FormCreateRequest": (bench_validate_form_create_request, True),
+    "element.dict": (bench_element_dict, True),
+    "JSONEncodedDict.round_trip": (bench_json_encoded_dict_round_trip, True),
+    "CompressedJSON.round_trip": (bench_compressed_json_round_trip, True),
+    "response.validated": (bench_response_validated, True),
+    "response.trusted": (bench_response_trusted, True),
+    "jwt.create_access_token": (bench_create_access_token, False),
+    "jwt.decode": (bench_decode_access_token, False),
+    "bcrypt.hash": (bench_bcrypt_hash, False),
+    "bcrypt.verify": (bench_bcrypt_verify, False),
+}
+
+def measure(func, repeats, min_time):
+    """
+    Time func like timeit: pick a loop count so one repeat lasts at least min_time,
+    warm up, then return the per-call time of each of the repeats.
+    """
+    func()  # First call pays for lazy imports and caches
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - start) / loops)
+    return samples, loops
+
+def summarize(samples, loops):
+    quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else [samples[0]] * 3
+    return {
+        "median_us": statistics.median(samples) * 1e6,
+        "mean_us": statistics.fmean(samples) * 1e6,
+        "stdev_us": (statistics.stdev(samples) if len(samples) > 1 else 0.0) * 1e6,
+        "q1_us": quartiles[0] * 1e6,
+        "q3_us": quartiles[2] * 1e6,
+        "min_us": min(samples) * 1e6,
+        "repeats": len(samples),
+        "loops": loops,
+    }
+
+def run_benchmarks(names, sizes, repeats, min_time):
+    results = {}
+    for name in names:
+        setup, sized = BENCHMARKS[name]
+        for size in sizes if sized else [None]:
+            key = f"{name}[{size}]" if sized else name
+            samples, loops = measure(setup(size), repeats, min_time)
+            results[key] = summarize(samples, loops)
+            print(f"{key:<40} {results[key]['median_us']:>14.2f} us  (IQR {results[key]['q1_us']:.2f}-{results[key]['q3_us']:.2f}, {loops} loops x {repeats})")
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Compare medians against the baseline. A change only counts when it exceeds the
+    threshold and the interquartile ranges do not overlap, so ordinary noise is not reported.
+    """
+    regressions = []
+    print(f"\n{'benchmark':<40} {'baseline us':>14} {'current us':>14} {'change':>9}")
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            print(f"{key:<40} {'-':>14} {current['median_us']:>14.2f} {'new':>9}")
+            continue
+        change = current["median_us"] / previous["median_us"] - 1
+        separated = current["q1_us"] > previous["q3_us"] or current["q3_us"] < previous["q1_us"]
+        marker = ""
+        if separated and change > threshold:
+            marker = "  ❌ slower"
+            regressions.append(key)
+        elif separated and change < -threshold:
+            marker = "  ✅ faster"
+        print(f"{key:<40} {previous['median_us']:>14.2f} {current['median_us']:>14.2f} {change * 100:>8.1f}%{marker}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the CPU-bound hot paths.")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Form element counts to test")
+    parser.add_argument("--repeats", type=int, default=15, help="Timed repetitions per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Minimum seconds per repetition")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a results file saved earlier")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Median slowdown that fails the run")
+    args = parser.parse_args()
+
+    # The routers still use the pydantic v1 style API; its deprecation warnings would drown the report
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+    names = [name for name in BENCHMARKS if args.filter in name]
+    if not names:
+        raise SystemExit(f"❌ No benchmark matches {args.filter!r}")
+
+    print(f"=== Running {len(names)} benchmarks on Python {platform.python_version()} ===")
+    results = run_benchmarks(names, args.sizes, args.repeats, args.min_time)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "results": results,
+            }, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Module whose import cost is measured
+TARGET_MODULE = "app.main"
+
+# Default budget for importing TARGET_MODULE, in milliseconds
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "2000"))
+
+# Heavy subsystems that must be initialised lazily or in the lifespan hook,
+# never as a side effect of importing the app
+LAZY_MODULES = ["pymysql", "passlib", "bcrypt", "jose", "cryptography"]
+
+def measure_import_time(module):
+    """
+    Import module in a fresh interpreter with -X importtime.
+    Returns a dict of imported module name -> (self microseconds, cumulative microseconds).
+    """
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=backend_dir,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        raise SystemExit(f"❌ Importing {module} failed")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Check the import time of {TARGET_MODULE} against a budget.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Maximum allowed import time")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to measure; the fastest run counts")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to report")
+    args = parser.parse_args()
+
+    # The first run also pays for compiling .pyc files, so take the best of several
+    runs = [measure_import_time(TARGET_MODULE) for _ in range(args.runs)]
+    timings = min(runs, key=lambda run: run[TARGET_MODULE][1])
+    total_ms = timings[TARGET_MODULE][1] / 1000
+
+    print(f"\n=== Import time report for {TARGET_MODULE} ===")
+    print(f"{'cumulative ms':>14} {'self ms':>10}  module")
+    slowest = sorted(timings.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:10.1f}  {name}")
+
+    failed = False
+
+    eager = [module for module in LAZY_MODULES if module in timings]
+    if eager:
+        print(f"\n❌ Imported eagerly but should be lazy: {', '.join(eager)}")
+        failed = True
+    else:
+        print(f"\n✅ None of {', '.join(LAZY_MODULES)} are imported at startup")
+
+    if total_ms > args.budget_ms:
+        print(f"❌ {TARGET_MODULE} took {total_ms:.1f} ms to import, over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    else:
+        print(f"✅ {TARGET_MODULE} took {total_ms:.1f} ms to import, within the {args.budget_ms:.0f} ms budget")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import argparse
+import json
+import time
+
+from sqlalchemy import bindparam, select, text, update
+
+from app.config import settings
+from app.models.custom_types import MAGIC, decode_json, encode_json
+from app.models.form import Form
+from app.models.formdata import FormData
+from app.storage.shards import shard_router
+
+# Compressed columns per table, with the table's primary key
+COMPRESSED_COLUMNS = [
+    (Form.__table__, "form_id", ["form_data"]),
+    (FormData.__table__, "id", ["form_elements", "form_theme"]),
+]
+
+def prepare(engine):
+    """Change the columns to LONGBLOB on MySQL; the running app keeps reading and writing JSON text in them."""
+    if engine.dialect.name != "mysql":
+        print(f"   {engine.url.database}: nothing to change, {engine.dialect.name} stores binary in the existing columns")
+        return
+    with engine.begin() as connection:
+        for table, _, columns in COMPRESSED_COLUMNS:
+            changes = ", ".join(
+                f"MODIFY {column} LONGBLOB {'NULL' if table.c[column].nullable else 'NOT NULL'}" for column in columns
+            )
+            connection.execute(text(f"ALTER TABLE {table.name} {changes}"))
+            print(f"   {engine.url.database}.{table.name}: {', '.join(columns)} are now LONGBLOB")
+
+def convert(engine, batch_size, recompress, decompress):
+    """Rewrite every stored document in batches of batch_size rows, one transaction each."""
+    for table, key, columns in COMPRESSED_COLUMNS:
+        primary_key = table.c[key]
+        converted, saved_bytes, last = 0, 0, None
+        start = time.perf_counter()
+        while True:
+            query = select(primary_key, *[table.c[column] for column in columns]).order_by(primary_key).limit(batch_size)
+            if last is not None:
+                query = query.where(primary_key > last)
+            with engine.begin() as connection:
+                rows = connection.execute(query).all()
+                if not rows:
+                    break
+                last = rows[-1][0]
+
+                changes = []
+                for row in rows:
+                    values = {}
+                    for column, stored in zip(columns, row[1:]):
+                        if stored is None:
+                            continue
+                        stored = bytes(stored) if not isinstance(stored, str) else stored.encode("utf-8")
+                        compressed = stored.startswith(MAGIC)
+                        if decompress:
+                            if not compressed:
+                                continue
+                            new = json.dumps(decode_json(stored), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+                        else:
+                            if compressed and not recompress:
+                                continue
+                            new = encode_json(decode_json(stored))
+                        values[column] = new
+                        saved_bytes += len(stored) - len(new)
+                    if values:
+                        changes.append({"_key": row[0], **dict(zip(columns, row[1:])), **values})
+                if changes:
+                    connection.execute(
+                        update(table).where(primary_key == bindparam("_key")).values(
+                            {column: bindparam(column) for column in columns}
+                        ),
+                        changes
+                    )
+                converted += len(changes)
+        print(f"   {engine.url.database}.{table.name}: {converted} rows rewritten in {time.perf_counter() - start:.2f}s, "
+              f"stored size {-saved_bytes / 1024 / 1024:+.1f} MB")
+
+def train(engine, output, samples, size):
+    """Train a zstd dictionary on stored elements and themes; requires the zstandard package."""
+    import zstandard
+
+    documents = []
+    with engine.connect() as connection:
+        for table, key, columns in COMPRESSED_COLUMNS:
+            rows = connection.execute(
+                select(*[table.c[column] for column in columns]).order_by(table.c[key].desc()).limit(samples)
+            ).all()
+            for stored in (stored for row in rows for stored in row if stored is not None):
+                value = decode_json(stored)
+                for element in value if isinstance(value, list) else [value]:
+                    documents.append(json.dumps(element, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+    dictionary = zstandard.train_dictionary(size, documents)
+    with open(output, "wb") as f:
+        f.write(dictionary.as_bytes())
+    print(f"✅ Wrote a {size // 1024} KB dictionary trained on {len(documents)} elements and themes to {output}")
+    print("   Put it first in JSON_COMPRESSION_DICTIONARY, keep the previous entries, then run compress_json.py --recompress")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert the stored form documents to and from compressed binary (JSON_COMPRESSION_ENABLED). "
+                    "Rows are rewritten in batches while the API keeps serving."
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--prepare", action="store_true", help="Change the columns to binary on MySQL; run before enabling")
+    mode.add_argument("--recompress", action="store_true",
+                      help="Also rewrite compressed rows, after changing the codec, level or dictionary")
+    mode.add_argument("--decompress", action="store_true", help="Store plain JSON again; run before disabling")
+    mode.add_argument("--train", metavar="FILE", help="Train a zstd dictionary on stored forms and write it to FILE")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows rewritten per transaction")
+    parser.add_argument("--samples", type=int, default=2000, help="Rows per table sampled by --train")
+    parser.add_argument("--dictionary-size", type=int, default=16 * 1024, help="Dictionary size in bytes for --train")
+    args = parser.parse_args()
+
+    engines = shard_router.engines()
+    if args.prepare:
+        for engine in engines:
+            prepare(engine)
+        print("✅ Done; now set JSON_COMPRESSION_ENABLED=true, restart the API and run compress_json.py")
+        return
+    if not settings.JSON_COMPRESSION_ENABLED:
+        raise SystemExit("❌ Set JSON_COMPRESSION_ENABLED=true first, so that this tool and the API read both formats")
+    if args.train:
+        train(engines[0], args.train, args.samples, args.dictionary_size)
+        return
+
+    for engine in engines:
+        convert(engine, args.batch_size, args.recompress, args.decompress)
+    print("✅ Done")
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ import os
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
 from app.models.form import Base
+# Import the remaining models so their tables are registered on Base.metadata
+from app.models import formdata, theme, element, revision, archived_formdata, archived_revision, element_facet, element_option  # noqa: F401
 
 # Load environment variables
 load_dotenv()
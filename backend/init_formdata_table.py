@@ -35,6 +35,96 @@ engine = create_engine(
     pool_pre_ping=True
 )
 
+# Columns added after a table was first created: table -> {name -> column definition}
+LATE_COLUMNS = {
+    "formdata": {
+        "theme_hash": "VARCHAR(64) NULL AFTER form_theme, ADD INDEX (theme_hash)",
+        "element_hashes": "JSON NULL AFTER form_elements",
+    },
+    "forms": {
+        "element_hashes": "JSON NULL AFTER form_data",
+    },
+}
+
+def add_missing_columns(connection, table_name="formdata"):
+    """Add columns introduced after the table was first created."""
+    for column_name, definition in LATE_COLUMNS[table_name].items():
+        result = connection.execute(text(
+            "SELECT COUNT(*) FROM information_schema.columns "
+            "WHERE table_schema = :db_name AND table_name = :table_name AND column_name = :column_name"
+        ), {"db_name": DB_NAME, "table_name": table_name, "column_name": column_name})
+
+        if result.scalar() == 0:
+            connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {definition}"))
+            print(f"✅ Added {column_name} column to {table_name} table.")
+
+def upgrade_forms_table():
+    """Add late columns to an existing forms table; init_db creates new ones complete."""
+    with engine.connect() as connection:
+        result = connection.execute(text(
+            "SELECT COUNT(*) FROM information_schema.tables "
+            "WHERE table_schema = :db_name AND table_name = 'forms'"
+        ), {"db_name": DB_NAME})
+        if result.scalar() == 0:
+            print("ℹ️ forms table does not exist yet; python -m app.init_db creates it.")
+            return
+        add_missing_columns(connection, "forms")
+        print("✅ forms table is up to date.")
+
+def create_themes_table():
+    """Create the themes table if it doesn't exist."""
+    with engine.connect() as connection:
+        connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS themes (
+            theme_hash VARCHAR(64) PRIMARY KEY,
+            theme_data JSON NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+        """))
+        print("✅ themes table is ready.")
+
+def create_element_blobs_table():
+    """Create the content-addressed form element table if it doesn't exist."""
+    with engine.connect() as connection:
+        connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS form_element_blobs (
+            element_hash VARCHAR(64) PRIMARY KEY,
+            element_data JSON NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+        """))
+        print("✅ form_element_blobs table is ready.")
+
+def create_revisions_table():
+    """Create the form revision history table if it doesn't exist."""
+    with engine.connect() as connection:
+        connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS form_revisions (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            form_id INT NOT NULL,
+            version INT NOT NULL,
+            kind VARCHAR(16) NOT NULL,
+            payload JSON NOT NULL,
+            user_id INT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE KEY uq_form_revisions_form_version (form_id, version)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+        """))
+        print("✅ form_revisions table is ready.")
+
+def create_archive_and_facet_tables():
+    """Create the archive and element facet tables from their models if they don't exist."""
+    from app.database import Base
+    from app.models.archived_formdata import ArchivedFormData
+    from app.models.archived_revision import ArchivedRevisionBatch
+    from app.models.element_facet import FormElementFacet
+    from app.models.element_option import FormElementOption
+
+    tables = [ArchivedFormData.__table__, ArchivedRevisionBatch.__table__, FormElementFacet.__table__, FormElementOption.__table__]
+    Base.metadata.create_all(engine, tables=tables, checkfirst=True)
+    for table in tables:
+        print(f"✅ {table.name} table is ready.")
+
 def create_formdata_table():
     """Create the formdata table if it doesn't exist."""
     try:
@@ -54,17 +144,21 @@ def create_formdata_table():
                     form_name VARCHAR(255) NOT NULL,
                     form_description TEXT,
                     form_elements JSON NOT NULL,
+                    element_hashes JSON NULL,
                     form_theme JSON,
+                    theme_hash VARCHAR(64) NULL,
                     user_id INT NOT NULL,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP NULL ON UPDATE CURRENT_TIMESTAMP,
                     INDEX (form_id),
-                    INDEX (user_id)
+                    INDEX (user_id),
+                    INDEX (theme_hash)
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
                 """))
                 print("✅ formdata table created successfully!")
             else:
                 print("ℹ️ formdata table already exists.")
+                add_missing_columns(connection)
                 
             # Verify the table structure
             print("\nTable structure:")
@@ -77,4 +171,9 @@ def create_formdata_table():
         raise
 
 if __name__ == "__main__":
-    create_formdata_table() 
\ No newline at end of file
+    create_themes_table()
+    create_element_blobs_table()
+    create_revisions_table()
+    create_formdata_table()
+    create_archive_and_facet_tables()
+    upgrade_forms_table() 
\ No newline at end of file
@@ -0,0 +1,30 @@
+import argparse
+import time
+
+from app.database import Base
+from app.storage.facets import SOURCES, rebuild_facets
+from app.storage.shards import FACET_TABLES, shard_router
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the element facet tables from the forms already stored, e.g. after upgrading. "
+                    "Saves keep them current afterwards; rerunning is harmless."
+    )
+    parser.add_argument("--source", choices=SOURCES, nargs="+", default=list(SOURCES))
+    parser.add_argument("--batch-size", type=int, default=500, help="Forms indexed per transaction")
+    args = parser.parse_args()
+
+    for index, engine in enumerate(shard_router.engines()):
+        Base.metadata.create_all(engine, tables=list(FACET_TABLES), checkfirst=True)
+        db = shard_router.open_session(index)
+        try:
+            for source in args.source:
+                start = time.perf_counter()
+                count = rebuild_facets(db, source, args.batch_size)
+                print(f"   Shard {index}: indexed {count} {source} forms in {time.perf_counter() - start:.2f}s")
+        finally:
+            db.close()
+    print("✅ Done")
+
+if __name__ == "__main__":
+    main()
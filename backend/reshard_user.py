@@ -0,0 +1,137 @@
+import argparse
+import sys
+import time
+
+from sqlalchemy import delete, insert, select, update
+
+from app.config import settings
+from app.database import get_engine
+from app.models.shard_assignment import ShardAssignment
+from app.storage.shards import CONTENT_TABLES, MOVED_TABLES, shard_router
+
+# Rows inserted per statement while copying
+BATCH_SIZE = 500
+
+def wait_for_workers(reason):
+    """Sleep until every worker's cached shard assignment has expired."""
+    seconds = settings.SHARD_MAP_TTL_SECONDS + 1
+    print(f"   Waiting {seconds:.0f}s for workers to {reason}...")
+    time.sleep(seconds)
+
+def set_assignment(user_id, shard, moving_to):
+    with get_engine().begin() as connection:
+        updated = connection.execute(
+            update(ShardAssignment).where(ShardAssignment.user_id == user_id).values(shard=shard, moving_to=moving_to)
+        )
+        if updated.rowcount == 0:
+            connection.execute(insert(ShardAssignment).values(user_id=user_id, shard=shard, moving_to=moving_to))
+
+def referenced_content(rows_by_table):
+    """Theme and element hashes referenced by a user's rows."""
+    theme_hashes, element_hashes = set(), set()
+    for row in rows_by_table["formdata"] + rows_by_table["archived_formdata"]:
+        if row["theme_hash"]:
+            theme_hashes.add(row["theme_hash"])
+    for row in rows_by_table["form_revisions"]:
+        payload = row["payload"] or {}
+        theme_hash = payload.get("theme_hash") or payload.get("meta", {}).get("theme_hash")
+        if theme_hash:
+            theme_hashes.add(theme_hash)
+    for table in ("forms", "formdata"):
+        for row in rows_by_table[table]:
+            element_hashes.update(row["element_hashes"] or [])
+    return {"themes": theme_hashes, "form_element_blobs": element_hashes}
+
+def copy_user(user_id, source_engine, target_engine):
+    """Copy a user's rows and the content they reference; returns the row count per table."""
+    with source_engine.connect() as source:
+        rows_by_table = {
+            table.name: [dict(row) for row in source.execute(select(table).where(table.c.user_id == user_id)).mappings()]
+            for table in MOVED_TABLES
+        }
+        content = referenced_content(rows_by_table)
+        content_rows = {}
+        for table in CONTENT_TABLES:
+            key = list(table.primary_key.columns)[0]
+            wanted = sorted(content[table.name])
+            content_rows[table.name] = [
+                dict(row)
+                for start in range(0, len(wanted), BATCH_SIZE)
+                for row in source.execute(select(table).where(key.in_(wanted[start:start + BATCH_SIZE]))).mappings()
+            ]
+
+    with target_engine.begin() as target:
+        # Leftovers of an interrupted move are replaced, so the tool can simply be rerun
+        for table in MOVED_TABLES:
+            target.execute(delete(table).where(table.c.user_id == user_id))
+        for table in CONTENT_TABLES:
+            key = list(table.primary_key.columns)[0]
+            rows = content_rows[table.name]
+            existing = set()
+            for start in range(0, len(rows), BATCH_SIZE):
+                hashes = [row[key.name] for row in rows[start:start + BATCH_SIZE]]
+                existing.update(target.execute(select(key).where(key.in_(hashes))).scalars())
+            missing = [row for row in rows if row[key.name] not in existing]
+            for start in range(0, len(missing), BATCH_SIZE):
+                target.execute(insert(table), missing[start:start + BATCH_SIZE])
+        for table in MOVED_TABLES:
+            rows = rows_by_table[table.name]
+            for start in range(0, len(rows), BATCH_SIZE):
+                target.execute(insert(table), rows[start:start + BATCH_SIZE])
+
+    return {name: len(rows) for name, rows in {**rows_by_table, **content_rows}.items()}
+
+def delete_user(user_id, engine):
+    with engine.begin() as connection:
+        for table in MOVED_TABLES:
+            connection.execute(delete(table).where(table.c.user_id == user_id))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Move one user's forms to another shard while the API keeps serving. "
+                    "The user's writes get 503 (with Retry-After) for the duration of the move; reads continue."
+    )
+    parser.add_argument("user_id", type=int)
+    parser.add_argument("target_shard", type=int)
+    parser.add_argument("--keep-source", action="store_true", help="Leave the copied rows on the old shard")
+    args = parser.parse_args()
+
+    if not shard_router.sharded:
+        raise SystemExit("❌ SHARD_URLS is not set; there is nothing to reshard")
+    engines = shard_router.engines()
+    if not 0 <= args.target_shard < len(engines):
+        raise SystemExit(f"❌ Shard {args.target_shard} does not exist; SHARD_URLS lists {len(engines)}")
+
+    shard_router.forget(args.user_id)
+    source_shard, moving_to = shard_router.assignment(args.user_id)
+    if moving_to is not None:
+        print(f"⚠️  A previous move of user {args.user_id} to shard {moving_to} did not finish; starting over")
+    if source_shard == args.target_shard:
+        set_assignment(args.user_id, source_shard, None)
+        print(f"✅ User {args.user_id} is already on shard {source_shard}")
+        return
+
+    print(f"=== Moving user {args.user_id} from shard {source_shard} to shard {args.target_shard} ===")
+    set_assignment(args.user_id, source_shard, args.target_shard)
+    try:
+        wait_for_workers("pause the user's writes")
+        start = time.perf_counter()
+        counts = copy_user(args.user_id, engines[source_shard], engines[args.target_shard])
+        print(f"   Copied in {time.perf_counter() - start:.2f}s: " + ", ".join(f"{name} {count}" for name, count in counts.items()))
+    except Exception as e:
+        set_assignment(args.user_id, source_shard, None)
+        print(f"❌ Copy failed, user {args.user_id} stays on shard {source_shard}: {e}")
+        sys.exit(1)
+
+    set_assignment(args.user_id, args.target_shard, None)
+    print(f"   User {args.user_id} now reads and writes shard {args.target_shard}")
+
+    if args.keep_source:
+        print("✅ Done; the old rows were kept on the source shard")
+        return
+    wait_for_workers("stop reading the old shard")
+    delete_user(args.user_id, engines[source_shard])
+    print(f"✅ Done; removed the user's rows from shard {source_shard}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import importlib.util
+import multiprocessing
+import sys
+from app.config import settings
+
+# Production entry point. run.py and run_server.py remain the single-process,
+# auto-reloading development servers.
+
+APP = "app.main:app"
+
+def has_module(name):
+    return importlib.util.find_spec(name) is not None
+
+def default_workers():
+    return settings.WEB_CONCURRENCY or multiprocessing.cpu_count()
+
+def run_gunicorn(args):
+    """
+    Run under gunicorn with uvicorn workers. The app is imported once in the master
+    (preload) and forked, so workers share its memory and start faster.
+    """
+    from gunicorn.app.base import BaseApplication
+
+    class FormBuilderApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{args.host}:{args.port}")
+            self.cfg.set("workers", args.workers)
+            # UvicornWorker picks uvloop and httptools automatically when they are installed
+            self.cfg.set("worker_class", "uvicorn.workers.UvicornWorker")
+            self.cfg.set("preload_app", True)
+            self.cfg.set("keepalive", settings.KEEP_ALIVE_SECONDS)
+            self.cfg.set("backlog", settings.BACKLOG)
+            # SIGTERM: stop accepting, let in-flight requests finish, then run the lifespan shutdown
+            self.cfg.set("graceful_timeout", settings.GRACEFUL_TIMEOUT_SECONDS)
+            self.cfg.set("timeout", settings.GRACEFUL_TIMEOUT_SECONDS * 2)
+            self.cfg.set("accesslog", "-" if args.access_log else None)
+
+        def load(self):
+            from app.main import app
+            return app
+
+    FormBuilderApplication().run()
+
+def run_uvicorn(args):
+    """Run uvicorn's own process manager; each worker imports the app itself."""
+    import uvicorn
+
+    uvicorn.run(
+        APP,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="uvloop" if has_module("uvloop") else "asyncio",
+        http="httptools" if has_module("httptools") else "h11",
+        timeout_keep_alive=settings.KEEP_ALIVE_SECONDS,
+        backlog=settings.BACKLOG,
+        timeout_graceful_shutdown=settings.GRACEFUL_TIMEOUT_SECONDS,
+        access_log=args.access_log,
+        log_level="info",
+        reload=False,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Form Builder API in production mode.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    parser.add_argument("--workers", type=int, default=default_workers(), help="Worker processes (default: CPU cores)")
+    parser.add_argument("--server", choices=["auto", "gunicorn", "uvicorn"], default="auto",
+                        help="gunicorn (preloaded app) when installed, otherwise uvicorn")
+    parser.add_argument("--access-log", action="store_true", help="Log every request (costs throughput)")
+    args = parser.parse_args()
+
+    use_gunicorn = args.server == "gunicorn" or (
+        args.server == "auto" and has_module("gunicorn") and sys.platform != "win32"
+    )
+
+    print(
+        f"Starting {args.workers} worker(s) on {args.host}:{args.port} with "
+        f"{'gunicorn (preload)' if use_gunicorn else 'uvicorn'}, "
+        f"loop={'uvloop' if has_module('uvloop') else 'asyncio'}, "
+        f"http={'httptools' if has_module('httptools') else 'h11'}"
+    )
+
+    if use_gunicorn:
+        run_gunicorn(args)
+    else:
+        run_uvicorn(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,14 @@
 import requests
+import argparse
+import asyncio
+import copy
 import json
+import math
 import os
+import random
+import sys
+import time
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -155,7 +163,241 @@ def test_delete_form_data(form_data_id):
         print(f"❌ Error: {str(e)}")
         return False
 
-if __name__ == "__main__":
+# ---------------------------------------------------------------------------
+# Load testing
+#
+# python test_formdata_api.py load --scenario builder dashboard --users 50 --duration 60 --ramp-up 10 --json run.json
+#
+# Each virtual user runs one scenario in a loop until the duration is up. Users
+# start evenly spread over the ramp-up period and are assigned scenarios round-robin.
+# ---------------------------------------------------------------------------
+
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1", "0.0.0.0"}
+
+class LoadStats:
+    """Latencies and outcomes of every request, grouped by request name."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+
+    def record(self, name, seconds, status_code=None, ok=True):
+        self.latencies.setdefault(name, []).append(seconds)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        status_key = str(status_code) if status_code is not None else "connection_error"
+        statuses = self.statuses.setdefault(name, {})
+        statuses[status_key] = statuses.get(status_key, 0) + 1
+
+    @staticmethod
+    def percentile(sorted_values, fraction):
+        """Nearest-rank percentile of an already sorted list."""
+        if not sorted_values:
+            return 0.0
+        rank = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+        return sorted_values[rank]
+
+    def summarize(self, latencies, errors, elapsed):
+        latencies = sorted(latencies)
+        count = len(latencies)
+        return {
+            "requests": count,
+            "errors": errors,
+            "error_rate": round(errors / count, 4) if count else 0.0,
+            "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(self.percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(self.percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(self.percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        }
+
+    def report(self, elapsed):
+        endpoints = {
+            name: dict(self.summarize(latencies, self.errors.get(name, 0), elapsed), statuses=self.statuses[name])
+            for name, latencies in sorted(self.latencies.items())
+        }
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        return {
+            "total": self.summarize(everything, sum(self.errors.values()), elapsed),
+            "endpoints": endpoints,
+        }
+
+class VirtualUser:
+    """One simulated client, sharing the connection pool of the run."""
+
+    def __init__(self, client, stats, user_id, think_seconds):
+        self.client = client
+        self.stats = stats
+        self.user_id = user_id
+        self.think_seconds = think_seconds
+
+    async def request(self, name, method, path, expected=(200, 201, 204), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except Exception:
+            self.stats.record(name, time.perf_counter() - start, ok=False)
+            return None
+        self.stats.record(name, time.perf_counter() - start, response.status_code, response.status_code in expected)
+        return response
+
+    async def think(self, scale=1.0):
+        if self.think_seconds:
+            # Jitter keeps users from moving in lockstep
+            await asyncio.sleep(self.think_seconds * scale * random.uniform(0.5, 1.5))
+
+def builder_fields(revision):
+    """Form fields as the builder sends them, changing a little on every save."""
+    fields = [
+        {
+            "id": element["id"],
+            "type": element["type"],
+            "label": element["label"],
+            "required": element["required"],
+            "placeholder": element["placeholder"],
+            "options": element["options"],
+        }
+        for element in sample_form_data["form_elements"]
+    ]
+    fields.append({
+        "id": f"text-{revision % 5}",
+        "type": "text",
+        "label": f"Question {revision}",
+        "required": revision % 2 == 0,
+        "placeholder": "Type here",
+        "options": [],
+    })
+    return fields
+
+async def scenario_builder(user, deadline, burst_size=5):
+    """Editing a form in the builder: one auto-save to create it, then bursts of updates as the user types."""
+    response = await user.request("forms.auto_save", "POST", "/api/forms/auto-save", json={
+        "form_name": f"Load test form {user.user_id}",
+        "fields": builder_fields(0),
+        "user_id": user.user_id,
+    })
+    if response is None or response.status_code != 201:
+        return
+    form_id = response.json()["form_id"]
+
+    revision = 0
+    while time.monotonic() < deadline:
+        for _ in range(burst_size):
+            revision += 1
+            await user.request("forms.update", "PUT", "/api/forms/update", json={
+                "form_id": form_id,
+                "form_name": f"Load test form {user.user_id}",
+                "fields": builder_fields(revision),
+                "user_id": user.user_id,
+                "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            })
+            await user.think(0.1)
+        await user.request("forms.get", "GET", f"/api/forms/{form_id}")
+        await user.think()
+
+async def scenario_dashboard(user, deadline):
+    """Landing on the dashboard: list the user's forms, search them and open one."""
+    while time.monotonic() < deadline:
+        response = await user.request("formdata.list", "GET", f"/api/formdata/formdata/user/{user.user_id}")
+        await user.request("formdata.search", "GET", f"/api/formdata/formdata/user/{user.user_id}/search",
+                           params={"q": random.choice(["form", "email", "url", "test"])})
+        if response is not None and response.status_code == 200 and response.json():
+            form_id = random.choice(response.json())["form_id"]
+            await user.request("formdata.get", "GET", f"/api/formdata/formdata/{form_id}")
+        await user.think()
+
+async def scenario_login(user, deadline, username="admin", password="admin123"):
+    """Many users logging in at once; every request pays for a bcrypt verification."""
+    while time.monotonic() < deadline:
+        await user.request("auth_db.login", "POST", "/api/auth_db/login",
+                           json={"username": username, "password": password})
+        await user.think()
+
+async def scenario_submission(user, deadline):
+    """A flood of new form records, as when many respondents submit at once."""
+    while time.monotonic() < deadline:
+        submission = copy.deepcopy(sample_form_data)
+        submission["form_id"] = random.randrange(1, 2 ** 31)
+        submission["user_id"] = user.user_id
+        submission["form_elements"][0]["value"] = f"user{random.randrange(10 ** 6)}@example.com"
+        await user.request("formdata.create", "POST", "/api/formdata/formdata", json=submission)
+        await user.think()
+
+SCENARIOS = {
+    "builder": (scenario_builder, 2.0),
+    "dashboard": (scenario_dashboard, 1.0),
+    "login": (scenario_login, 0.0),
+    "submission": (scenario_submission, 0.0),
+}
+
+async def run_load(base_url, scenarios, users, duration, ramp_up, think_scale, first_user_id, timeout):
+    import httpx
+
+    stats = LoadStats()
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        started = time.monotonic()
+        deadline = started + ramp_up + duration
+
+        async def start_user(index):
+            await asyncio.sleep(ramp_up * index / users)
+            scenario, think_seconds = SCENARIOS[scenarios[index % len(scenarios)]]
+            user = VirtualUser(client, stats, first_user_id + index, think_seconds * think_scale)
+            await scenario(user, deadline)
+
+        await asyncio.gather(*(start_user(index) for index in range(users)))
+        elapsed = time.monotonic() - started
+
+    return stats.report(elapsed), elapsed
+
+def print_report(report):
+    print(f"\n{'request':<20} {'count':>8} {'rps':>8} {'err %':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for name, row in rows:
+        print(f"{name:<20} {row['requests']:>8} {row['throughput_rps']:>8} {row['error_rate'] * 100:>7.2f} "
+              f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} {row['max_ms']:>9}")
+
+def load_main(argv):
+    parser = argparse.ArgumentParser(prog="test_formdata_api.py load", description="Run a load test against a local server.")
+    parser.add_argument("--url", default=API_URL, help="Base URL of the server")
+    parser.add_argument("--scenario", nargs="+", choices=sorted(SCENARIOS), default=["dashboard"],
+                        help="Scenarios to run; virtual users are assigned to them round-robin")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run at full load, after ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=5, help="Seconds over which users are started")
+    parser.add_argument("--think-scale", type=float, default=1.0, help="Multiplier for scenario think times; 0 for none")
+    parser.add_argument("--first-user-id", type=int, default=1, help="user_id of the first virtual user")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this file")
+    parser.add_argument("--allow-remote", action="store_true", help="Allow a server that is not on this machine")
+    args = parser.parse_args(argv)
+
+    if urlparse(args.url).hostname not in LOCAL_HOSTS and not args.allow_remote:
+        raise SystemExit(f"❌ {args.url} is not a local server; pass --allow-remote to load test it anyway")
+
+    print(f"=== Load test: {', '.join(args.scenario)} with {args.users} users against {args.url} ===")
+    print(f"Ramp-up {args.ramp_up}s, then {args.duration}s at full load")
+    report, elapsed = asyncio.run(run_load(
+        args.url, args.scenario, args.users, args.duration, args.ramp_up,
+        args.think_scale, args.first_user_id, args.timeout
+    ))
+    print_report(report)
+
+    if args.json_path:
+        result = {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(time.time() - elapsed)),
+            "elapsed_seconds": round(elapsed, 2),
+            "config": {key: value for key, value in vars(args).items() if key != "json_path"},
+            **report,
+        }
+        with open(args.json_path, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\n✅ Results written to {args.json_path}")
+
+if __name__ == "__main__" and sys.argv[1:2] == ["load"]:
+    load_main(sys.argv[2:])
+elif __name__ == "__main__":
     # Run tests
     created_data = test_create_form_data()
     
@@ -0,0 +1,35 @@
+"""
+The suite runs on throwaway SQLite files, so it needs neither MySQL nor a running server.
+Settings are read once at import, so the environment is set before the app is imported.
+"""
+import os
+import tempfile
+
+_DATA_DIR = tempfile.mkdtemp(prefix="formbuilder-tests-")
+
+os.environ.update(
+    DB_BACKEND="sqlite",
+    SQLITE_PATH=os.path.join(_DATA_DIR, "primary.db"),
+    SHARD_URLS="",
+    DB_REPLICA_URLS="",
+    JOBS_ENABLED="false",
+    JOBS_DB_PATH=os.path.join(_DATA_DIR, "jobs.db"),
+    EVENTS_DB_PATH=os.path.join(_DATA_DIR, "events.db"),
+    PUBLISH_DIR=os.path.join(_DATA_DIR, "published"),
+    THEME_CSS_DIR=os.path.join(_DATA_DIR, "themes"),
+    WARM_POOL_ON_STARTUP="false",
+    RATE_LIMIT_ENABLED="false",
+)
+
+import pytest
+
+@pytest.fixture(scope="session")
+def client():
+    """A client for the app on the primary SQLite database, with every table created."""
+    from fastapi.testclient import TestClient
+
+    from app.init_db import create_sqlite_tables
+    from app.main import app
+
+    create_sqlite_tables()
+    return TestClient(app)
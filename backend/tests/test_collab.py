@@ -0,0 +1,63 @@
+import pytest
+
+from app.services.collab import OperationRejected, apply_operation
+
+def make_fields():
+    return [
+        {"id": "a", "type": "text", "label": "Name"},
+        {"id": "b", "type": "email", "label": "Email"},
+        {"id": "c", "type": "number", "label": "Age"},
+    ]
+
+def ids(fields):
+    return [field["id"] for field in fields]
+
+def test_add_appends_or_inserts_at_index():
+    fields = make_fields()
+    apply_operation(fields, {"op": "add", "field": {"id": "d", "type": "text", "label": "City"}})
+    apply_operation(fields, {"op": "add", "field": {"id": "e", "type": "text", "label": "Zip"}, "index": 1})
+    assert ids(fields) == ["a", "e", "b", "c", "d"]
+
+def test_update_and_style_merge_changes():
+    fields = make_fields()
+    apply_operation(fields, {"op": "update", "id": "b", "changes": {"label": "Work email", "required": True}})
+    apply_operation(fields, {"op": "style", "id": "b", "changes": {"size": "large"}})
+    assert fields[1] == {"id": "b", "type": "email", "label": "Work email", "required": True, "size": "large"}
+
+def test_delete_removes_the_field():
+    fields = make_fields()
+    apply_operation(fields, {"op": "delete", "id": "b"})
+    assert ids(fields) == ["a", "c"]
+
+def test_reorder_moves_the_field_and_clamps_the_index():
+    fields = make_fields()
+    apply_operation(fields, {"op": "reorder", "id": "a", "index": 1})
+    assert ids(fields) == ["b", "a", "c"]
+    apply_operation(fields, {"op": "reorder", "id": "c", "index": -5})
+    assert ids(fields) == ["c", "b", "a"]
+    apply_operation(fields, {"op": "reorder", "id": "c", "index": 99})
+    assert ids(fields) == ["b", "a", "c"]
+
+@pytest.mark.parametrize("operation", [
+    {"op": "add", "field": {"id": "a", "type": "text", "label": "Duplicate"}},
+    {"op": "add", "field": {"id": "d", "type": "text"}},
+    {"op": "update", "id": "missing", "changes": {"label": "x"}},
+    {"op": "update", "id": "a", "changes": {"id": "z"}},
+    {"op": "update", "id": "a", "changes": {"label": None}},
+    {"op": "style", "id": "a", "changes": {"label": "x"}},
+    {"op": "style", "id": "a", "changes": {"size": "huge"}},
+    {"op": "delete", "id": "missing"},
+    {"op": "reorder", "id": "a"},
+    {"op": "rename", "id": "a"},
+])
+def test_rejected_operations_leave_fields_unchanged(operation):
+    fields = make_fields()
+    with pytest.raises(OperationRejected):
+        apply_operation(fields, operation)
+    assert fields == make_fields()
+
+def test_last_field_cannot_be_deleted():
+    fields = [{"id": "a", "type": "text", "label": "Name"}]
+    with pytest.raises(OperationRejected):
+        apply_operation(fields, {"op": "delete", "id": "a"})
+    assert ids(fields) == ["a"]
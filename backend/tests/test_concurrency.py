@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services.concurrency import INTROSPECTION, LISTING, SAVE, AdaptiveLimiter, classify
+
+@pytest.mark.parametrize("method, path, priority", [
+    ("POST", "/api/forms/save", SAVE),
+    ("GET", "/api/forms/user/1", LISTING),
+    ("DELETE", "/api/formdata/formdata/3", SAVE),
+    ("GET", "/api/formdata/formdata/3", LISTING),
+    ("POST", "/api/auth/login", SAVE),
+    ("POST", "/api/query/explain", INTROSPECTION),
+    ("GET", "/api/facets/types", LISTING),
+    ("GET", "/health", None),
+    ("GET", "/metrics", None),
+])
+def test_classify(method, path, priority):
+    assert classify(method, path) == priority
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def make_limiter(limit=2, max_queue=10, timeouts=(1.0, 1.0, 1.0)):
+    return AdaptiveLimiter(limit, 1, 100, timeouts, max_queue)
+
+def test_requests_under_the_limit_start_immediately():
+    async def scenario():
+        limiter = make_limiter(limit=2)
+        assert await limiter.acquire(SAVE)
+        assert await limiter.acquire(LISTING)
+        assert limiter.in_flight == 2
+    asyncio.run(scenario())
+
+def test_released_slots_go_to_the_highest_priority_waiter():
+    async def scenario():
+        limiter = make_limiter(limit=1)
+        await limiter.acquire(SAVE)
+        started = []
+
+        async def wait(priority):
+            assert await limiter.acquire(priority)
+            started.append(priority)
+
+        tasks = [asyncio.create_task(wait(INTROSPECTION)), asyncio.create_task(wait(SAVE))]
+        await asyncio.sleep(0)
+        assert limiter.queued == 2
+
+        limiter.release(None)
+        await settle()
+        assert started == [SAVE]
+        limiter.release(None)
+        await asyncio.gather(*tasks)
+        assert started == [SAVE, INTROSPECTION]
+        assert limiter.queued == 0
+    asyncio.run(scenario())
+
+def test_full_queue_sheds_immediately():
+    async def scenario():
+        limiter = make_limiter(limit=1, max_queue=1)
+        await limiter.acquire(SAVE)
+        waiter = asyncio.create_task(limiter.acquire(LISTING))
+        await asyncio.sleep(0)
+        assert not await limiter.acquire(LISTING)
+        limiter.release(None)
+        assert await waiter
+    asyncio.run(scenario())
+
+def test_waiting_past_the_timeout_sheds():
+    async def scenario():
+        limiter = make_limiter(limit=1, timeouts=(1.0, 0.01, 1.0))
+        await limiter.acquire(SAVE)
+        assert not await limiter.acquire(LISTING)
+        assert limiter.queued == 0
+        assert limiter.in_flight == 1
+    asyncio.run(scenario())
+
+def test_limit_shrinks_when_latency_rises_and_stays_in_bounds(monkeypatch):
+    monkeypatch.setattr(settings, "CONCURRENCY_TOLERANCE", 1.0)
+    limiter = AdaptiveLimiter(20, 4, 40, (1.0, 1.0, 1.0), 10)
+    limiter.in_flight = 20
+    limiter._update_limit(0.01)
+    limits = []
+    for _ in range(30):
+        limiter._update_limit(0.5)
+        limits.append(limiter.limit)
+    assert limits[-1] < limits[0] < 20
+    assert min(limits) >= 4
+
+def test_limit_only_grows_while_it_is_being_used(monkeypatch):
+    monkeypatch.setattr(settings, "CONCURRENCY_TOLERANCE", 1.5)
+    limiter = AdaptiveLimiter(10, 1, 40, (1.0, 1.0, 1.0), 10)
+    for _ in range(50):
+        limiter._update_limit(0.05)
+    assert limiter.limit == 10
+
+    limiter.in_flight = 10
+    for _ in range(50):
+        limiter._update_limit(0.05)
+    assert 10 < limiter.limit <= 40
@@ -0,0 +1,42 @@
+import pytest
+
+from app.config import settings
+from app.models.custom_types import CODEC_RAW, CODEC_ZLIB, HEADER, MAGIC, decode_json, encode_json
+
+SMALL = {"theme": "modern"}
+LARGE = {
+    "form_name": "Événement — inscription",
+    "elements": [
+        {"id": f"field-{i}", "type": "text", "label": f"Question {i}", "required": i % 2 == 0,
+         "options": ["Oui", "Non"], "value": None}
+        for i in range(50)
+    ],
+}
+
+def codec(encoded):
+    assert encoded.startswith(MAGIC)
+    return HEADER.unpack_from(encoded, 1)[0]
+
+@pytest.fixture(autouse=True)
+def zlib_codec(monkeypatch):
+    monkeypatch.setattr(settings, "JSON_COMPRESSION_CODEC", "zlib")
+    monkeypatch.setattr(settings, "JSON_COMPRESSION_MIN_BYTES", 128)
+
+def test_small_values_are_stored_raw():
+    encoded = encode_json(SMALL)
+    assert codec(encoded) == CODEC_RAW
+    assert decode_json(encoded) == SMALL
+
+def test_large_values_are_compressed():
+    encoded = encode_json(LARGE)
+    assert codec(encoded) == CODEC_ZLIB
+    assert len(encoded) < len(str(LARGE))
+    assert decode_json(encoded) == LARGE
+
+def test_missing_zstandard_falls_back_to_a_readable_value(monkeypatch):
+    monkeypatch.setattr(settings, "JSON_COMPRESSION_CODEC", "zstd")
+    assert decode_json(encode_json(LARGE)) == LARGE
+
+@pytest.mark.parametrize("stored", ['{"a": [1, 2]}', b'{"a": [1, 2]}', memoryview(b'{"a": [1, 2]}'), {"a": [1, 2]}])
+def test_values_written_before_compression_still_decode(stored):
+    assert decode_json(stored) == {"a": [1, 2]}
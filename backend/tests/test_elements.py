@@ -0,0 +1,29 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.element import FormElementBlob
+from app.storage import elements
+from app.storage.elements import ElementCache, MissingElementsError, load_element_lists, store_elements
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(elements, "element_cache", ElementCache(100))
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[FormElementBlob.__table__])
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def test_stored_elements_are_reassembled_in_order(db):
+    form = [{"id": "b", "type": "text"}, {"id": "a", "type": "email"}, {"id": "b", "type": "text"}]
+    hashes = store_elements(db, form)
+    db.commit()
+    assert load_element_lists(db, [hashes, None]) == [form, None]
+
+def test_missing_element_is_an_error_not_a_shorter_form(db):
+    hashes = store_elements(db, [{"id": "a", "type": "text"}])
+    db.commit()
+    with pytest.raises(MissingElementsError):
+        load_element_lists(db, [hashes + ["0" * 64]])
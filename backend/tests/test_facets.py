@@ -0,0 +1,15 @@
+from app.storage.facets import TOTAL, extract_facets
+
+def test_counts_elements_and_required_elements_by_type():
+    counts, options = extract_facets([
+        {"type": "text", "required": True},
+        {"type": " Text "},
+        {"type": "select", "required": True, "options": ["Red", " red ", "Blue", "", 3]},
+        {"label": "untyped"},
+        "not an element",
+    ])
+    assert counts == {TOTAL: [4, 2], "text": [2, 1], "select": [1, 1], "unknown": [1, 0]}
+    assert options == {"red", "blue"}
+
+def test_no_elements():
+    assert extract_facets([]) == ({TOTAL: [0, 0]}, set())
@@ -0,0 +1,42 @@
+THEME = {
+    "primaryColor": "#3b82f6",
+    "backgroundColor": "white",
+    "textColor": "#111827",
+    "borderRadius": "0.5rem",
+    "fontFamily": "Inter, sans-serif",
+    "layout": "default",
+    "style": "shadow",
+}
+
+def _save(client, form_id, form_name):
+    response = client.post("/api/formdata/formdata", json={
+        "form_id": form_id,
+        "form_name": form_name,
+        "form_elements": [{"id": "name-1", "type": "text", "label": "Name"}],
+        "form_theme": THEME,
+        "user_id": 1,
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def test_deleting_the_latest_row_publishes_the_previous_one(client):
+    _save(client, 501, "First")
+    latest = _save(client, 501, "Second")
+    assert client.post("/api/publish/forms/501").status_code == 201
+    assert client.get("/api/published/forms/501/data").json()["form_name"] == "Second"
+
+    assert client.delete(f"/api/formdata/formdata/{latest}").status_code == 204
+    assert client.get("/api/published/forms/501/data").json()["form_name"] == "First"
+
+def test_deleting_the_last_row_unpublishes_the_form(client):
+    only = _save(client, 502, "Only")
+    assert client.post("/api/publish/forms/502").status_code == 201
+
+    assert client.delete(f"/api/formdata/formdata/{only}").status_code == 204
+    assert client.get("/api/published/forms/502").status_code == 404
+
+def test_publishing_picks_the_row_with_the_highest_id(client):
+    _save(client, 503, "Older")
+    _save(client, 503, "Newer")  # Same second, so created_at cannot tell them apart
+    client.post("/api/publish/forms/503")
+    assert client.get("/api/published/forms/503/data").json()["form_name"] == "Newer"
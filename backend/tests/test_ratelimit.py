@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from app.services import ratelimit
+from app.services.ratelimit import Limit, MemoryBackend
+
+def test_parse_limit_specs():
+    limit = Limit.parse("60/minute:20")
+    assert (limit.rate, limit.burst) == (1.0, 20.0)
+    limit = Limit.parse(" 3600 / hour ")
+    assert (limit.rate, limit.burst) == (1.0, 3600.0)
+    limit = Limit.parse("0.5/second")
+    assert (limit.rate, limit.burst) == (0.5, 1.0)
+
+def test_empty_spec_means_no_limit():
+    assert Limit.parse("") is None
+
+@pytest.mark.parametrize("spec", ["60", "60/day", "ten/minute", "60/minute:", "60/minute:2.5"])
+def test_invalid_spec_is_rejected(spec):
+    with pytest.raises(ValueError):
+        Limit.parse(spec)
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    return now
+
+def take(backend, key, limit, cost=1):
+    return asyncio.run(backend.take(key, limit, cost))
+
+def test_burst_then_refill(clock):
+    backend = MemoryBackend(10)
+    limit = Limit(rate=2.0, burst=3.0)
+    assert [take(backend, "k", limit)[0] for _ in range(3)] == [True, True, True]
+    assert take(backend, "k", limit) == (False, 0.5)
+
+    clock[0] += 0.5
+    assert take(backend, "k", limit) == (True, 0.0)
+    # The bucket never refills past the burst
+    clock[0] += 60
+    assert [take(backend, "k", limit)[0] for _ in range(4)] == [True, True, True, False]
+
+def test_cost_larger_than_tokens_reports_the_wait(clock):
+    backend = MemoryBackend(10)
+    limit = Limit(rate=1.0, burst=5.0)
+    assert take(backend, "k", limit, cost=4) == (True, 0.0)
+    assert take(backend, "k", limit, cost=3) == (False, 2.0)
+
+def test_keys_are_independent_and_least_recently_used_is_evicted(clock):
+    backend = MemoryBackend(2)
+    limit = Limit(rate=1.0, burst=1.0)
+    assert take(backend, "a", limit)[0]
+    assert take(backend, "b", limit)[0]
+    assert not take(backend, "a", limit)[0]
+    # "b" is now the least recently used key and makes room for "c"
+    assert take(backend, "c", limit)[0]
+    assert not take(backend, "a", limit)[0]
+    assert take(backend, "b", limit)[0]
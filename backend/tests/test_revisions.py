@@ -0,0 +1,42 @@
+from app.storage.revisions import apply_delta, build_state, diff_states
+
+def field(field_id, label, **extra):
+    return {"id": field_id, "type": "text", "label": label, **extra}
+
+HISTORY = [
+    build_state("Survey", None, "t1", [field("a", "Name"), field("b", "Email")]),
+    # Edit one element and append another
+    build_state("Survey", None, "t1", [field("a", "Full name"), field("b", "Email"), field("c", "Age")]),
+    # Move an element
+    build_state("Survey", None, "t1", [field("c", "Age"), field("a", "Full name"), field("b", "Email")]),
+    # Remove an element and change the meta fields
+    build_state("Survey 2024", "Yearly", "t2", [field("c", "Age"), field("b", "Email")]),
+    # Remove everything
+    build_state("Survey 2024", "Yearly", "t2", []),
+    build_state("Survey 2024", None, None, [field("d", "Comments", required=True)]),
+]
+
+def test_replaying_deltas_rebuilds_every_state():
+    state = HISTORY[0]
+    for old, new in zip(HISTORY, HISTORY[1:]):
+        state = apply_delta(state, diff_states(old, new))
+        assert state == new
+
+def test_unchanged_state_has_an_empty_delta():
+    assert diff_states(HISTORY[1], HISTORY[1]) == {}
+
+def test_delta_only_holds_what_changed():
+    delta = diff_states(HISTORY[0], HISTORY[1])
+    assert delta == {"upserts": [field("a", "Full name"), field("c", "Age")]}
+
+    delta = diff_states(HISTORY[2], HISTORY[3])
+    assert delta == {"meta": {"form_name": "Survey 2024", "form_description": "Yearly", "theme_hash": "t2"},
+                     "removed": ["a"]}
+
+def test_order_is_recorded_only_when_it_cannot_be_inferred():
+    assert diff_states(HISTORY[1], HISTORY[2]) == {"order": ["c", "a", "b"]}
+
+def test_apply_delta_leaves_the_input_state_alone():
+    before = build_state("Survey", None, "t1", [field("a", "Name")])
+    apply_delta(before, {"meta": {"form_name": "Renamed"}, "removed": ["a"]})
+    assert before == build_state("Survey", None, "t1", [field("a", "Name")])
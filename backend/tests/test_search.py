@@ -0,0 +1,21 @@
+def _form(form_id, form_name):
+    return {
+        "form_id": form_id,
+        "form_name": form_name,
+        "form_elements": [{"id": "name-1", "type": "text", "label": "Name"}],
+        "user_id": 7,
+    }
+
+def _search(client, query):
+    response = client.get("/api/formdata/formdata/user/7/search", params={"q": query})
+    assert response.status_code == 200, response.text
+    return [result["form_name"] for result in response.json()["results"]]
+
+def test_editing_an_older_row_leaves_the_search_index_alone(client):
+    older = client.post("/api/formdata/formdata", json=_form(601, "Quarterly survey")).json()["id"]
+    client.post("/api/formdata/formdata", json=_form(601, "Annual survey"))
+    assert _search(client, "annual") == ["Annual survey"]
+
+    assert client.put(f"/api/formdata/formdata/{older}", json=_form(601, "Stale draft")).status_code == 200
+    assert _search(client, "stale") == []
+    assert _search(client, "annual") == ["Annual survey"]
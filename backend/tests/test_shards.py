@@ -0,0 +1,82 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import themes
+from app.config import settings
+from app.main import app
+from app.models.element import FormElementBlob
+from app.models.theme import Theme
+from app.storage import elements
+from app.storage.elements import ElementCache
+from app.storage.shards import init_shards, shard_router
+
+THEME = {
+    "primaryColor": "#3b82f6",
+    "backgroundColor": "white",
+    "textColor": "#111827",
+    "borderRadius": "0.5rem",
+    "fontFamily": "Inter, sans-serif",
+    "layout": "default",
+    "style": "shadow",
+}
+ELEMENTS = [
+    {"id": "email-1", "type": "email", "label": "Email", "placeholder": "you@example.com"},
+    {"id": "plan-1", "type": "dropdown", "label": "Plan", "options": ["Free", "Pro"]},
+]
+
+def _reset_router():
+    shard_router.dispose()
+    shard_router._engines = None
+    shard_router._sessionmakers = []
+    shard_router._assignments.clear()
+    shard_router._located.clear()
+
+def _clear_caches():
+    themes._theme_cache = ElementCache(settings.THEME_CACHE_SIZE)
+    elements.element_cache = ElementCache(settings.ELEMENT_CACHE_SIZE)
+
+@pytest.fixture
+def two_shards(tmp_path, monkeypatch):
+    urls = [f"sqlite:///{os.path.join(tmp_path, f'shard{index}.db')}" for index in range(2)]
+    monkeypatch.setattr(settings, "SHARD_URLS", ",".join(urls))
+    monkeypatch.setattr(settings, "ELEMENT_STORE_ENABLED", True)
+    _reset_router()
+    _clear_caches()
+    init_shards()
+    yield TestClient(app)
+    _reset_router()
+    _clear_caches()
+
+def _save(client, user_id, form_id):
+    response = client.post("/api/formdata/formdata", json={
+        "form_id": form_id,
+        "form_name": f"Form {form_id}",
+        "form_elements": ELEMENTS,
+        "form_theme": THEME,
+        "user_id": user_id,
+    })
+    assert response.status_code == 201, response.text
+
+def _count(shard, model):
+    db = shard_router.open_session(shard)
+    try:
+        return db.query(model).count()
+    finally:
+        db.close()
+
+def test_content_is_stored_on_every_shard_that_references_it(two_shards):
+    # user_id modulo the shard count puts these users on different shards
+    _save(two_shards, user_id=2, form_id=20)
+    # The first save's response cached its theme and elements in this worker
+    _save(two_shards, user_id=3, form_id=30)
+
+    assert _count(1, Theme) == 1
+    assert _count(1, FormElementBlob) == len(ELEMENTS)
+
+    # Another worker, or an evicted cache, only has the shard to go by
+    _clear_caches()
+    row = two_shards.get("/api/formdata/formdata/30").json()
+    assert row["form_theme"] == THEME
+    assert [element["id"] for element in row["form_elements"]] == [element["id"] for element in ELEMENTS]